@@ -1,13 +1,18 @@
 #!env/bin/python3
 
 """
-ncurses client for budget app
+ncurses client for budget app; "python . export" exports the data instead
 """
 
+import sys
 import curses
 
+if sys.argv[1:2] == ['export']:
+    from app.export import main
+
+    sys.exit(main(sys.argv[2:]))
+
 from app.main import BudgetClient
 
 APP = BudgetClient()
 curses.wrapper(APP.start)
-
@@ -2,52 +2,414 @@
 Reads and writes data on the server, through the budget API
 """
 
-import requests
+import threading
+from time import perf_counter
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
 
-from app.const import API_URL
-
-class BudgetClientAPIError(Exception):
-    pass
+from app.const import API_URL, API_WORKERS, STREAM_CHUNK_BYTES, PREFETCH_WORKERS, \
+        CONNECTION_WARM_INTERVAL, CONNECTION_WARM_LIMIT
+from app.cache import ResponseCache
+from app.encoding import decode
+from app.sync import TableSync
+from app.errors import BudgetClientAPIError, BudgetClientAPIOffline, \
+        BudgetClientAPIUnauthorized
+from app.mirror import LocalMirror
+from app.flight import SingleFlight, RouteLimits, request_key
+from app.edit_queue import EditQueue
+from app.events import EventBus
+from app.metrics import Metrics
 
 class BudgetClientAPI(object):
     """ the reason this is in a class is so that the user token can be passed more easily """
 
     def __init__(self):
-        self.session = requests.Session()
+        self.metrics = Metrics()
+
+        # created by connect(), the first time they're needed
+        self.session = None
+        self.negotiator = None
+        self.session_lock = threading.Lock()
+
+        self.cache = ResponseCache()
+        self.sync = TableSync()
+        self.mirror = LocalMirror()
+        self.user = None
+
+        # whether the last request failed to reach the server
+        self.offline = False
+
+        # whether the server refused our api key (so we need to log in again)
+        self.unauthorized = False
+
+        # requests made with req_async run on this pool, and their callbacks are
+        # queued up until the ui thread calls poll()
+        self.pool = ThreadPoolExecutor(max_workers=API_WORKERS)
+        self.completed = Queue()
+
+        # identical GETs made at the same time share one request
+        self.flights = SingleFlight()
+        self.limits = RouteLimits()
+
+        self.edits = EditQueue(self)
+
+        # changes made by one page which others show (e.g. edited costs)
+        self.events = EventBus()
+
+    def connect(self):
+        """ creates the http session (this loads requests, so it's done off the ui thread) """
+        with self.session_lock:
+            if self.session is None:
+                from app.session import new_session
+                from app.encoding import Negotiator
+
+                self.negotiator = Negotiator()
+
+                self.session = new_session(self.metrics)
+                self.session.headers.update(self.negotiator.headers())
+
+        return self.session
 
-    def set_token(self, token=''):
+    def set_token(self, token='', user=None):
         """ set authorization header for requests """
-        self.session.headers.update({'Authorization': token})
+        self.connect().headers.update({'Authorization': token})
+        self.unauthorized = False
+
+        # cached responses are only shared between sessions of the same user
+        self.user = user
+        self.sync.reset()
+        self.mirror.open(user)
 
     def req(self, task, method='get', query=None, form=None):
-        """ makes a request to the api """
+        """ makes a request to the api, falling back to the local mirror when offline """
         if query is None:
             query = {}
 
+        if method != 'get':
+            return self.req_once(task, method, query, form)
+
+        return self.coalesce(request_key(self.user, 'req', task, query), task, \
+                lambda: self.req_once(task, method, query, form))
+
+    def coalesce(self, key, task, func):
+        """ calls func, unless an identical request is running already """
+        start = perf_counter()
+
+        res, shared = self.flights.run(key, func)
+
+        if shared:
+            self.metrics.record('api.coalesced', perf_counter() - start, route='/'.join(task))
+
+        return res
+
+    def req_once(self, task, method, query, form):
+        try:
+            with self.metrics.timer('api.req', route='/'.join(task), method=method):
+                res = self.req_remote(task, method, query, form)
+        except BudgetClientAPIOffline:
+            self.offline = True
+
+            mirrored = self.mirror.load(task, query) if method == 'get' else None
+
+            if mirrored is None:
+                raise
+
+            return {'error': False, 'data': mirrored}
+
+        self.offline = False
+
+        if method == 'get' and task[0] == 'data' and isinstance(res, dict) and 'data' in res:
+            self.mirror.save(task, query, res['data'])
+
+        return res
+
+    def req_local(self, task, query=None):
+        """ returns the mirrored copy of a response, or None if we don't have one """
+        mirrored = self.mirror.load(task, query or {})
+
+        return None if mirrored is None else {'error': False, 'data': mirrored}
+
+    def req_remote(self, task, method, query, form):
+        """ makes a request to the server """
         route = '/'.join(task)
 
         url = "{}/{}".format(API_URL, route)
 
-        if method == 'get':
-            res = self.session.get(url, params=query)
+        self.connect()
+
+        from requests import ConnectionError as RequestsConnectionError, Timeout, \
+                RequestException
+
+        with self.limits.route(route):
+            start = perf_counter()
+
+            try:
+                if method == 'get':
+                    return self.req_cached(url, route, query)
+
+                elif method == 'post':
+                    res = self.session.post(url, params=query, json=form)
+
+                elif method == 'put':
+                    res = self.session.put(url, params=query, json=form)
+
+                elif method == 'delete':
+                    res = self.session.delete(url, params=query, json=form)
+
+                elif method == 'patch':
+                    res = self.session.patch(url, params=query, json=form)
+
+                else:
+                    raise BudgetClientAPIError
+
+            except (RequestsConnectionError, Timeout) as err:
+                raise BudgetClientAPIOffline(err)
+
+            except RequestException as err:
+                # e.g. too many redirects, or the connection broke off mid-response
+                raise BudgetClientAPIError(err)
+
+        self.timed_response(route, res, start)
+
+        self.check_status(res)
+
+        return self.decode(route, self.body(res), res.headers.get('Content-Type'))
+
+    def req_decoded(self, task, decoder, query=None):
+        """
+        like req (for GETs), but the response is decoded by decoder (a StreamDecoder)
+        as it downloads, instead of being read and decoded all at once
+        """
+        if query is None:
+            query = {}
+
+        # (two decoders with the same path and decode_item give the same document)
+        key = request_key(self.user, ('decoded', tuple(decoder.path), decoder.decode_item), \
+                task, query)
+
+        return self.coalesce(key, task, lambda: self.req_decoded_once(task, decoder, query))
+
+    def req_decoded_once(self, task, decoder, query):
+        try:
+            with self.metrics.timer('api.req', route='/'.join(task), method='get'):
+                data = decoder.document(list(self.req_stream(task, decoder, query, True)))
+        except BudgetClientAPIOffline:
+            self.offline = True
+
+            mirrored = self.mirror.load(task, query)
+
+            if mirrored is None:
+                raise
+
+            return {'error': False, 'data': mirrored}
 
-        elif method == 'post':
-            res = self.session.post(url, params=query, json=form)
+        self.offline = False
 
-        elif method == 'put':
-            res = self.session.put(url, params=query, json=form)
+        if task[0] == 'data' and isinstance(data, dict) and 'data' in data:
+            self.mirror.save(task, query, data['data'])
 
-        elif method == 'delete':
-            res = self.session.delete(url, params=query, json=form)
+        return data
 
-        elif method == 'patch':
-            res = self.session.patch(url, params=query, json=form)
+    def req_stream(self, task, decoder, query=None, cached=False):
+        """
+        makes a GET request, yielding the items decoded by decoder (a StreamDecoder)
+        as the response downloads, so the whole body is never in memory; if cached,
+        the response is revalidated and kept in the cache, like req_cached
+        """
+        route = '/'.join(task)
+        url = "{}/{}".format(API_URL, route)
+
+        query = query or {}
+
+        self.connect()
+
+        from requests import ConnectionError as RequestsConnectionError, Timeout, \
+                RequestException
+
+        # the decoder only reads JSON, though it can still be compressed
+        json_headers = self.negotiator.headers(binary=False)
+
+        key = self.cache.key(self.user, route, query, json_headers['Accept'])
+
+        # (held until the response has been read, since the connection is in use until then)
+        with self.limits.route(route):
+            start = perf_counter()
+            size = 0
+
+            try:
+                # if the cached body was evicted since we sent the validators, get it again
+                for validators in ([self.cache.validators(key), {}] if cached else [{}]):
+                    with self.session.get(url, params=query, \
+                            headers=dict(json_headers, **validators), stream=True) as res:
+                        elapsed = res.elapsed.total_seconds()
+                        ttfb = elapsed - getattr(res, 'connection_setup', 0)
+
+                        self.metrics.record('api.ttfb', ttfb, route=route, status=res.status_code)
+
+                        if res.status_code == 304:
+                            chunks = self.cache.load_chunks(key)
+
+                            if chunks is None:
+                                continue
+
+                        else:
+                            self.check_status(res)
 
-        else:
-            raise BudgetClientAPIError
+                            chunks = self.negotiator.decompress( \
+                                    res.iter_content(STREAM_CHUNK_BYTES), \
+                                    res.headers.get('Content-Encoding'))
+
+                            if cached:
+                                chunks = self.cache.store_chunks(key, chunks, \
+                                        res.headers.get('ETag'), res.headers.get('Last-Modified'))
+
+                        for item in decoder.decode(chunks):
+                            yield item
+
+                        size = res.raw.tell()
+
+                        break
+
+            except (RequestsConnectionError, Timeout) as err:
+                raise BudgetClientAPIOffline(err)
+
+            except (RequestException, ValueError) as err:
+                raise BudgetClientAPIError(err)
+
+        self.metrics.record('api.download', max(0, perf_counter() - start - elapsed), route=route)
+        self.metrics.record('api.size', size, unit='B', route=route)
+
+    def check_status(self, res):
+        if res.status_code == 401:
+            # we need to log in again, unless the key was changed since this was sent
+            if res.request.headers.get('Authorization') == \
+                    self.session.headers.get('Authorization'):
+                self.unauthorized = True
+
+            raise BudgetClientAPIUnauthorized(res.status_code)
 
         if res.status_code != 200:
             raise BudgetClientAPIError(res.status_code)
 
-        return res.json()
+    def warm(self, until=None, connections=PREFETCH_WORKERS, \
+            interval=CONNECTION_WARM_INTERVAL, limit=CONNECTION_WARM_LIMIT):
+        """
+        opens connections to the server (dns, tcp and tls) before the first requests
+        need them, one for each page which is fetched at the same time; if until (an
+        event) is given, they're kept open by a request every interval, as servers
+        close idle ones, until it's set (or limit seconds pass)
+        """
+        from requests import RequestException
+
+        session = self.connect()
+        end = perf_counter() + limit
+
+        def head(_):
+            try:
+                session.head(API_URL, timeout=interval)
+            except RequestException:
+                pass # if we're offline, the login will say so
+
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            while True:
+                with self.metrics.timer('api.warm'):
+                    list(pool.map(head, range(connections)))
+
+                if until is None or perf_counter() > end or until.wait(interval):
+                    return
+
+    def timed_response(self, route, res, start):
+        """
+        records the time to the response headers, the rest of the download, and its
+        size (as it was sent, i.e. compressed)
+        """
+        elapsed = res.elapsed.total_seconds()
+
+        # (making a new connection is recorded as api.connect and api.tls)
+        ttfb = elapsed - getattr(res, 'connection_setup', 0)
+
+        self.metrics.record('api.ttfb', ttfb, route=route, status=res.status_code)
+        self.metrics.record('api.download', max(0, perf_counter() - start - elapsed), route=route)
+        self.metrics.record('api.size', res.raw.tell(), unit='B', route=route)
+
+    def body(self, res):
+        """ the content of a response, decompressed """
+        try:
+            return self.negotiator.decompress_body(res.content, \
+                    res.headers.get('Content-Encoding'))
+        except ValueError as err:
+            raise BudgetClientAPIError(err)
+
+    def decode(self, route, body, content_type=None):
+        with self.metrics.timer('api.decode', route=route):
+            try:
+                return decode(body, content_type)
+            except ValueError as err:
+                raise BudgetClientAPIError(err)
+
+    def req_cached(self, url, route, query):
+        """ makes a GET request, revalidating the response we have on disk (if any) """
+        key = self.cache.key(self.user, route, query, self.session.headers.get('Accept'))
+
+        start = perf_counter()
+
+        res = self.session.get(url, params=query, headers=self.cache.validators(key))
+
+        self.timed_response(route, res, start)
+
+        if res.status_code == 304:
+            body = self.cache.load(key)
+
+            if body is not None:
+                return self.decode(route, body, self.cache.content_type(key))
+
+            # the entry was evicted since we sent the validators
+            start = perf_counter()
+
+            res = self.session.get(url, params=query)
+
+            self.timed_response(route, res, start)
+
+        self.check_status(res)
+
+        body = self.body(res)
+        content_type = res.headers.get('Content-Type')
+
+        self.cache.store(key, body, \
+                res.headers.get('ETag'), res.headers.get('Last-Modified'), content_type)
+
+        return self.decode(route, body, content_type)
+
+    def req_async(self, task, method='get', query=None, form=None, callback=None):
+        """
+        makes a request to the api in the background, returning a future;
+        callback(res, err) is called from poll() once the request has finished
+        """
+        return self.run_async(self.req, task, method, query, form, callback=callback)
+
+    def run_async(self, func, *args, callback=None):
+        """ runs func on the worker pool, like req_async """
+        future = self.pool.submit(func, *args)
+
+        if callback is not None:
+            future.add_done_callback(lambda done: self.completed.put((done, callback)))
+
+        return future
+
+    def poll(self):
+        """ runs the callbacks of finished requests (call this from the ui thread) """
+        while True:
+            try:
+                future, callback = self.completed.get_nowait()
+            except Empty:
+                break
+
+            try:
+                res, err = future.result(), None
+            except Exception as error:
+                # e.g. a page's own calculation, which shouldn't take down the app
+                res, err = None, error
+
+            callback(res, err)
 
+        self.edits.poll()
@@ -0,0 +1,214 @@
+"""
+Keeps API responses on disk, so that they can be revalidated instead of downloaded again
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+from app.const import CACHE_DIR, CACHE_MAX_BYTES, STREAM_CHUNK_BYTES
+
+class ResponseCache(object):
+    """ size-bounded LRU store of response bodies, along with their ETag / Last-Modified """
+    def __init__(self, path=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self.lock = threading.Lock()
+
+        try:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            self.enabled = True
+        except OSError:
+            self.enabled = False
+
+    def key(self, user, route, query, accept=None):
+        """ cache entries are keyed by user, route, query and the encodings we accept """
+        ident = json.dumps([user, route, sorted((str(k), str(v)) for k, v in query.items())] \
+                + ([] if accept is None else [accept]))
+
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def file(self, key, ext):
+        return os.path.join(self.path, "{}.{}".format(key, ext))
+
+    def meta(self, key):
+        """ returns the validators (and content type) of an entry, or an empty dict """
+        if not self.enabled:
+            return {}
+
+        try:
+            with open(self.file(key, 'meta'), 'r') as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return {}
+
+    def content_type(self, key):
+        return self.meta(key).get('content_type')
+
+    def validators(self, key):
+        """ returns the headers for a conditional request for the entry, if we have it """
+        meta = self.meta(key)
+
+        headers = {}
+
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        return headers
+
+    def load(self, key):
+        """ returns the cached body of an entry, marking it as recently used """
+        try:
+            body_path = self.file(key, 'body')
+
+            with open(body_path, 'rb') as body_file:
+                body = body_file.read()
+
+            os.utime(body_path)
+
+            return body
+        except OSError:
+            return None
+
+    def load_chunks(self, key, size=STREAM_CHUNK_BYTES):
+        """ like load, but returns an iterator over chunks of the body """
+        try:
+            body_path = self.file(key, 'body')
+
+            body_file = open(body_path, 'rb')
+
+            os.utime(body_path)
+        except OSError:
+            return None
+
+        return self.read_chunks(body_file, size)
+
+    def read_chunks(self, body_file, size):
+        with body_file:
+            while True:
+                chunk = body_file.read(size)
+
+                if len(chunk) == 0:
+                    break
+
+                yield chunk
+
+    def store_chunks(self, key, chunks, etag=None, last_modified=None):
+        """ like store, but passes the chunks of a body on while they're written to disk """
+        tmp_file = None
+        tmp_path = "{}.{}.tmp".format(self.file(key, 'body'), threading.get_ident())
+
+        if self.enabled and (etag is not None or last_modified is not None):
+            try:
+                tmp_file = open(tmp_path, 'wb')
+            except OSError:
+                pass
+
+        size = 0
+        complete = False
+
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+
+                if tmp_file is not None:
+                    try:
+                        tmp_file.write(chunk)
+                    except OSError:
+                        tmp_file.close()
+                        tmp_file = None
+
+                yield chunk
+
+            complete = True
+        finally:
+            if tmp_file is not None:
+                tmp_file.close()
+
+                if complete and size <= self.max_bytes:
+                    self.stored(key, tmp_path, etag, last_modified)
+                else:
+                    self.remove_file(tmp_path)
+
+    def stored(self, key, tmp_path, etag, last_modified):
+        """ moves a body which was written to a temporary file into the cache """
+        try:
+            os.replace(tmp_path, self.file(key, 'body'))
+            self.write(self.file(key, 'meta'), json.dumps({ \
+                    'etag': etag, 'last_modified': last_modified}).encode('utf-8'))
+        except OSError:
+            self.remove_file(tmp_path)
+            return
+
+        self.evict()
+
+    def store(self, key, body, etag=None, last_modified=None, content_type=None):
+        """ saves a response body, if the server gave us something to revalidate it with """
+        if not self.enabled or (etag is None and last_modified is None) \
+                or len(body) > self.max_bytes:
+            return
+
+        meta = json.dumps({
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': content_type
+        })
+
+        try:
+            # write the body first, so that validators are never sent for a missing body
+            self.write(self.file(key, 'body'), body)
+            self.write(self.file(key, 'meta'), meta.encode('utf-8'))
+        except OSError:
+            return
+
+        self.evict()
+
+    def write(self, path, content):
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(content)
+
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """ removes the least recently used entries until we are within the size limit """
+        with self.lock:
+            entries = []
+            total = 0
+
+            for name in os.listdir(self.path):
+                if not name.endswith('.body'):
+                    continue
+
+                try:
+                    stat = os.stat(os.path.join(self.path, name))
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, name[:-len('.body')]))
+                total += stat.st_size
+
+            entries.sort()
+
+            for (_, size, key) in entries:
+                if total <= self.max_bytes:
+                    break
+
+                self.remove(key)
+                total -= size
+
+    def remove(self, key):
+        for ext in ['meta', 'body']:
+            self.remove_file(self.file(key, ext))
+
+    def remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,54 @@
+"""
+Puts everything drawn while handling an input event on the screen at once
+"""
+
+import curses
+import threading
+
+class Compositor(object):
+    """
+    windows are marked as changed instead of each being refreshed (and written to the
+    terminal) straight away; update() copies them to curses' virtual screen in the order
+    they were marked, so later ones are on top, then writes only what changed on the
+    screen with a single doupdate
+    """
+    def __init__(self):
+        self.dirty = []
+        self.lock = threading.Lock()
+
+        # number of times the terminal was written to
+        self.frames = 0
+
+    def refresh(self, win):
+        with self.lock:
+            if win in self.dirty:
+                self.dirty.remove(win)
+
+            self.dirty.append(win)
+
+    def update(self):
+        """ returns whether anything was drawn """
+        with self.lock:
+            dirty, self.dirty = self.dirty, []
+
+        if len(dirty) == 0:
+            return False
+
+        for win in dirty:
+            win.noutrefresh()
+
+        curses.doupdate()
+
+        self.frames += 1
+
+        return True
+
+# there's only one terminal
+COMPOSITOR = Compositor()
+
+def refresh(win):
+    """ use this instead of win.refresh() """
+    COMPOSITOR.refresh(win)
+
+def update():
+    return COMPOSITOR.update()
@@ -5,7 +5,7 @@ Constant values
 import curses
 
 from os import environ
-from os.path import join, dirname
+from os.path import join, dirname, expanduser
 from dotenv import load_dotenv
 
 dotenv_path = join(dirname(__file__), '../.env');
@@ -15,6 +15,83 @@ SERVER = environ.get('WEB_URL')
 
 API_URL = SERVER + "/api/v3"
 
+""" GET responses are kept here, and revalidated with the server on the next request """
+CACHE_DIR = environ.get('CACHE_DIR') or \
+        join(environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'), 'budget-cli')
+CACHE_MAX_BYTES = int(environ.get('CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+
+""" the api key is kept here (only readable by the user), so the PIN isn't needed every time """
+LOGIN_FILE = environ.get('LOGIN_FILE') or join(CACHE_DIR, 'login.json')
+LOGIN_MAX_AGE = float(environ.get('LOGIN_MAX_AGE') or 7 * 86400)
+
+""" binary encodings to ask the server for, in order of preference (JSON is the fallback) """
+API_FORMATS = [name for name in (environ.get('API_FORMATS') or 'msgpack').split(',') if name]
+
+""" if set, every timing (e.g. of requests and drawing) is appended to this file as JSON """
+METRICS_FILE = environ.get('METRICS_FILE')
+
+""" number of pages which are fetched at the same time after logging in """
+PREFETCH_WORKERS = 8
+
+""" size of the chunks in which large responses are read and decoded """
+STREAM_CHUNK_BYTES = 64 * 1024
+
+""" number of rows written at a time to parquet exports """
+EXPORT_BATCH_ROWS = 10000
+
+""" number of background requests (e.g. logins and edits) which can run at once """
+API_WORKERS = 4
+
+""" longest a request waits to connect, or for the server to send anything (s) """
+API_TIMEOUT = float(environ.get('API_TIMEOUT') or 30)
+
+""" number of requests to the same route (e.g. data/funds) which can run at once """
+API_ROUTE_CONCURRENCY = int(environ.get('API_ROUTE_CONCURRENCY') or 2)
+
+""" while the PIN is typed, a request is made this often to keep a connection open (s) """
+CONNECTION_WARM_INTERVAL = 4.0
+CONNECTION_WARM_LIMIT = 120.0
+
+""" how long the main loop waits for a key press before checking on requests (ms) """
+INPUT_POLL_MS = 50
+
+""" edits are sent together, once none have been made for this long (s) """
+EDIT_FLUSH_DELAY = 1.0
+
+""" how often edits made while offline are retried (s) """
+JOURNAL_RETRY_DELAY = 30.0
+
+""" longest quitting (or logging out) waits for edits to be sent; any which
+weren't are sent next time (s) """
+EDIT_CLOSE_TIMEOUT = 10.0
+
+""" tables which are mirrored row by row in the local database """
+MIRROR_TABLES = ['funds', 'income', 'bills', 'food', 'general', 'holiday', 'social']
+
+""" pages which haven't been shown for a while are compressed to fit in this much memory """
+PAGE_MEMORY_BYTES = int(environ.get('PAGE_MEMORY_BYTES') or 32 * 1024 * 1024)
+
+""" number of formatted list rows kept in memory by each list page """
+ROW_CACHE_SIZE = 2000
+
+""" number of past months averaged by the "rolling" forecast model """
+FORECAST_ROLLING_MONTHS = 6
+
+""" number of recent samples kept of each metric """
+METRICS_WINDOW = 500
+
+""" how often the metrics and memory overlays are redrawn while they're open (s) """
+METRICS_REDRAW = 1.0
+
+""" length of the substrings indexed for searching list pages """
+SEARCH_NGRAM = 3
+
+""" time ranges (name, seconds) which the funds graph can show """
+GRAPH_RANGES = [["1M", 30 * 86400], ["1Y", 365 * 86400], ["all", None]]
+
+""" ways to fit a long history into the width of the funds graph """
+GRAPH_SAMPLING = ['lttb', 'minmax']
+
 LOGIN_FORM_TITLE = "Enter your PIN to log in: "
 LOGIN_FORM_WIDTH = 42
 LOGIN_FORM_HEIGHT = 7
@@ -38,13 +115,27 @@ BTN_SUBMIT_TEXT = "Do it."
 KEY_QUIT = 'q'
 KEY_LOGOUT = 'L'
 KEY_EDIT = 'e'
+KEY_REFRESH = 'r'
+KEY_SEARCH = '/'
+KEY_SORT = 'o'
+KEY_SORT_REVERSE = 'O'
+KEY_GROUP = 'v'
+KEY_METRICS = 'M'
+KEY_MEMORY = 'U'
 
 KEY_GRAPH = 'g'
+KEY_GRAPH_RANGE = 't'
+KEY_GRAPH_SAMPLING = 'm'
+KEY_FORECAST = 'f'
+KEY_PIVOT_DIMENSION = 'd'
+KEY_PIVOT_PERIOD = 'p'
 
 """ ascii definitions """
 KEYCODE_TAB = 9
 KEYCODE_NEWLINE = 10
 KEYCODE_RETURN = 13
+KEYCODE_ESCAPE = 27
+KEYCODES_BACKSPACE = [8, 127, curses.KEY_BACKSPACE]
 
 """ navigation sections """
 NAV_SECT_TABS = 0
@@ -52,6 +143,13 @@ NAV_SECT_PAGE = 1
 
 SYMBOL_CURRENCY = u'\xA3'
 
+""" shown next to the heading of the column a list is sorted by """
+SYMBOL_SORT_ASC = u'\u25b4'
+SYMBOL_SORT_DESC = u'\u25be'
+
+""" bars of increasing height, for histograms """
+SPARK_BARS = u' \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
+
 """ unicode characters for graphs """
 CORNER_BOTTOM_LEFT = u'\u2570'
 CORNER_TOP_LEFT = u'\u256d'
@@ -60,3 +158,5 @@ CORNER_BOTTOM_RIGHT = u'\u256f'
 
 LINE_HORIZONTAL = u'\u2500'
 LINE_VERTICAL = u'\u2502'
+
+SHADE_LIGHT = u'\u2591'
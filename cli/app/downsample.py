@@ -0,0 +1,62 @@
+"""
+Reduces long series to a fixed number of points (e.g. the width of a graph)
+"""
+
+import numpy as np
+
+def lttb(values, num_out):
+    """
+    largest-triangle-three-buckets downsampling; returns the indices of the points to keep
+    (the first and last points are always kept)
+    """
+    num = len(values)
+
+    if num_out >= num or num_out < 3:
+        return np.arange(num)
+
+    values = np.asarray(values, dtype=np.float64)
+    x_values = np.arange(num, dtype=np.float64)
+
+    # the points between the first and last are split into num_out - 2 buckets
+    edges = np.linspace(1, num - 1, num_out - 1).astype(np.int64)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+
+    # the average point of each bucket, followed by the last point
+    avg_x = np.append(np.add.reduceat(x_values[1:num - 1], starts - 1) / sizes, num - 1)
+    avg_y = np.append(np.add.reduceat(values[1:num - 1], starts - 1) / sizes, values[-1])
+
+    keep = np.empty(num_out, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = num - 1
+
+    prev = 0
+    for bucket in range(num_out - 2):
+        x_b = x_values[edges[bucket]:edges[bucket + 1]]
+        y_b = values[edges[bucket]:edges[bucket + 1]]
+
+        # area of the triangle made with the last kept point and the next bucket's average
+        area = np.abs((x_values[prev] - avg_x[bucket + 1]) * (y_b - values[prev]) - \
+                (x_values[prev] - x_b) * (avg_y[bucket + 1] - values[prev]))
+
+        prev = edges[bucket] + int(np.argmax(area))
+        keep[bucket + 1] = prev
+
+    return keep
+
+def minmax(values, num_out):
+    """
+    splits the values into num_out buckets; returns the last, lowest and highest
+    value of each bucket
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num = len(values)
+
+    if num_out >= num:
+        return values, values, values
+
+    edges = np.linspace(0, num, num_out + 1).astype(np.int64)
+
+    return values[edges[1:] - 1], \
+            np.minimum.reduceat(values, edges[:-1]), \
+            np.maximum.reduceat(values, edges[:-1])
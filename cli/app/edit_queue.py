@@ -0,0 +1,280 @@
+"""
+Queues up edits which have been applied locally, and sends them to the server in batches
+"""
+
+import time
+from collections import OrderedDict
+from concurrent.futures import wait
+
+from app.const import EDIT_FLUSH_DELAY, JOURNAL_RETRY_DELAY, EDIT_CLOSE_TIMEOUT
+from app.errors import BudgetClientAPIOffline
+
+def batch_form(edits):
+    return {
+        'list': [
+            {'route': edit['table'], 'method': 'put', 'query': {}, 'body': edit['data']}
+            for edit in edits
+        ]
+    }
+
+def batch_failed(edits, res, err):
+    """ returns the edits which the server didn't accept """
+    if err is not None or not res or res.get('error') is not False:
+        return edits
+
+    results = res.get('data', [])
+
+    return [
+        edit for (i, edit) in enumerate(edits)
+        if i >= len(results) or not results[i] or results[i].get('error') is not False
+    ]
+
+def edit_conflicts(entry, row):
+    """
+    whether a journalled edit would overwrite changes made on the server since; only
+    the edited fields are compared, as the other fields depend on what the row was
+    fetched with (e.g. the funds' price histories)
+    """
+    if row is None:
+        return True # deleted
+
+    if entry['base'] is None:
+        return False
+
+    return any(row.get(key) != entry['base'].get(key) for key in entry['fields'])
+
+class EditQueue(object):
+    """
+    edits to the same row are coalesced, and the queue is flushed as a single request
+    once no edits have been made for a while; failed edits are rolled back, unless the
+    server couldn't be reached, in which case they are journalled to be sent later
+    """
+    def __init__(self, api, delay=EDIT_FLUSH_DELAY):
+        self.api = api
+        self.delay = delay
+
+        # (table, row id) -> edit
+        self.pending = OrderedDict()
+        self.last_push = 0
+
+        # edits which have been sent, and their request
+        self.in_flight = []
+        self.future = None
+
+        # rollbacks of journalled edits made in this session, by journal sequence number
+        self.journalled = {}
+        self.last_replay = 0
+        self.conflicts = []
+
+    def push(self, table, row_id, data, rollback, fields=None):
+        """
+        queues an edit; data is the full set of fields to send, rollback restores the
+        row to how it was before the edit, and fields are the edited api row keys
+        """
+        key = (table, row_id)
+
+        if key in self.pending:
+            # the latest edit wins, but rolling back goes to before the first one
+            self.pending[key]['data'] = data
+            self.pending[key]['fields'].update(fields or {})
+        else:
+            self.pending[key] = {
+                'table': table,
+                'id': row_id,
+                'data': data,
+                'fields': dict(fields or {}),
+                'rollback': rollback
+            }
+
+        self.last_push = time.time()
+
+    def size(self):
+        return len(self.pending) + len(self.in_flight)
+
+    def poll(self):
+        """ sends the queue if it has settled (call this from the main loop) """
+        if self.future is not None:
+            return
+
+        if len(self.pending) > 0 and time.time() - self.last_push >= self.delay:
+            self.flush()
+
+        elif time.time() - self.last_replay >= JOURNAL_RETRY_DELAY:
+            self.replay()
+
+    def flush(self):
+        edits = list(self.pending.values())
+        self.pending.clear()
+
+        self.in_flight = edits
+
+        future = self.api.req_async(['data', 'multiple'], method='patch', \
+                form=batch_form(edits), callback=lambda res, err: self.flushed(future, res, err))
+
+        self.future = future
+
+    def flushed(self, future, res, err):
+        if future is not self.future:
+            return # given up on when closing (the edits were journalled)
+
+        edits = self.in_flight
+
+        self.in_flight = []
+        self.future = None
+
+        if isinstance(err, BudgetClientAPIOffline):
+            # keep the edits, and send them when we're back online
+            self.journal(edits)
+            return
+
+        failed = batch_failed(edits, res, err)
+
+        for edit in edits:
+            if edit not in failed:
+                self.api.mirror.apply_edit(edit['table'], edit['id'], edit['fields'])
+
+        for edit in failed:
+            key = (edit['table'], edit['id'])
+
+            if key in self.pending:
+                # the row was edited again while this was being sent; the newer edit
+                # carries all of its fields, so only the rollback needs to be kept
+                self.pending[key]['rollback'] = edit['rollback']
+            else:
+                edit['rollback']()
+
+    def journal(self, edits):
+        for edit in edits:
+            seq = self.api.mirror.journal(edit['table'], edit['id'], edit['data'], edit['fields'])
+
+            if seq is None:
+                edit['rollback']()
+            else:
+                self.journalled[seq] = edit['rollback']
+
+    def replay(self):
+        """ tries to send edits which were made while offline """
+        self.last_replay = time.time()
+
+        entries = self.api.mirror.journal_entries()
+
+        if len(entries) == 0:
+            return
+
+        future = self.api.run_async(self.replay_journal, entries, \
+                callback=lambda result, err: self.replayed(future, result, err))
+
+        self.future = future
+
+    def replay_journal(self, entries):
+        """
+        (runs on the worker pool) sends journalled edits, unless the row changed on the
+        server since the edit was made, or was deleted; returns (sent, conflicts, result)
+        """
+        current = {}
+        for table in set(entry['table'] for entry in entries):
+            res = self.api.req_remote(['data', table], 'get', {}, None)
+
+            current[table] = {row['I']: row for row in res['data']['data']}
+
+        sent = []
+        conflicts = []
+        for entry in entries:
+            row = current[entry['table']].get(entry['id'])
+
+            if edit_conflicts(entry, row):
+                # (with the server's version of the row, which replaces the edit)
+                conflicts.append(dict(entry, row=row))
+            else:
+                sent.append(entry)
+
+        res = None
+        if len(sent) > 0:
+            res = self.api.req_remote(['data', 'multiple'], 'patch', {}, batch_form(sent))
+
+        return sent, conflicts, res
+
+    def replayed(self, future, result, err):
+        if future is not self.future:
+            return # given up on when closing; the entries are still journalled
+
+        self.future = None
+
+        if err is not None:
+            return # still offline (or the server is unhappy); try again later
+
+        sent, conflicts, res = result
+
+        failed = batch_failed(sent, res, None) if len(sent) > 0 else []
+
+        for entry in sent:
+            if entry not in failed:
+                self.api.mirror.apply_edit(entry['table'], entry['id'], entry['fields'])
+
+        for entry in failed:
+            rollback = self.journalled.pop(entry['seq'], None)
+
+            if rollback is not None:
+                rollback()
+
+        # the server's version of conflicting rows wins
+        self.conflicts += conflicts
+
+        for entry in conflicts:
+            self.journalled.pop(entry['seq'], None)
+
+            if entry['row'] is None:
+                self.api.mirror.remove_row(entry['table'], entry['id'])
+            else:
+                self.api.mirror.apply_edit(entry['table'], entry['id'], {
+                    key: entry['row'][key] for key in entry['fields'] if key in entry['row']
+                })
+
+        self.api.mirror.journal_remove([entry['seq'] for entry in sent + conflicts])
+
+        for entry in conflicts:
+            self.api.events.publish('row_replaced', table=entry['table'], \
+                    row_id=entry['id'], row=entry['row'])
+
+    def close(self, timeout=EDIT_CLOSE_TIMEOUT):
+        """
+        sends anything which is still queued, and waits for it; if the server doesn't
+        answer in time, the edits are journalled to be sent next time instead
+        """
+        end = time.time() + timeout
+
+        if len(self.in_flight) == 0:
+            # a replay of the journal is left to finish by itself (and isn't started
+            # here); anything it doesn't send stays journalled
+            self.future = None
+
+        while self.future is not None or len(self.pending) > 0:
+            if self.future is None:
+                self.flush()
+
+            future = self.future
+
+            done, _ = wait([future], timeout=max(0, end - time.time()))
+
+            if len(done) == 0:
+                # (an edit which reached the server is a conflict when it's replayed,
+                # and is dropped then)
+                edits = self.in_flight + list(self.pending.values())
+
+                self.in_flight = []
+                self.future = None
+                self.pending.clear()
+
+                self.journal(edits)
+                break
+
+            try:
+                res, err = future.result(), None
+            except Exception as error:
+                res, err = None, error
+
+            # (its callback is ignored when the api is next polled, as it's no longer current)
+            self.flushed(future, res, err)
+
+        # the pages which journalled edits would be rolled back on are going
+        self.journalled = {}
@@ -0,0 +1,79 @@
+"""
+Content negotiation: responses are asked for in a compact binary encoding, and
+compressed, when the modules needed to decode them are installed; otherwise as JSON
+"""
+
+import json
+from importlib import import_module
+
+from app.const import API_FORMATS
+
+JSON = 'application/json'
+
+# content type of each binary encoding, and the module which decodes it
+FORMATS = {
+    'msgpack': ['application/msgpack', 'msgpack']
+}
+
+def installed(module):
+    try:
+        import_module(module)
+    except ImportError:
+        return False
+
+    return True
+
+class Negotiator(object):
+    """ works out which encodings we can ask for (once, since this imports them) """
+    def __init__(self, formats=API_FORMATS):
+        from urllib3.util.request import ACCEPT_ENCODING
+
+        self.types = [FORMATS[name][0] for name in formats \
+                if name in FORMATS and installed(FORMATS[name][1])]
+
+        # urllib3 decompresses these itself; zstd is done here if urllib3 can't
+        self.native = [encoding.strip() for encoding in ACCEPT_ENCODING.split(',')]
+        self.zstd = 'zstd' not in self.native and installed('zstandard')
+
+    def headers(self, binary=True):
+        """ the Accept and Accept-Encoding headers of a request """
+        types = (self.types if binary else []) + [JSON]
+
+        accept = [types[0]] + ["{};q=0.{}".format(content_type, 9 - index) \
+                for (index, content_type) in enumerate(types[1:])]
+
+        return {
+            'Accept': ', '.join(accept),
+            'Accept-Encoding': ', '.join((['zstd'] if self.zstd else []) + self.native)
+        }
+
+    def decompress(self, chunks, content_encoding):
+        """ decompresses the chunks of a body which urllib3 couldn't """
+        if content_encoding != 'zstd' or not self.zstd:
+            return chunks
+
+        import zstandard
+
+        def decompressed():
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+            for chunk in chunks:
+                try:
+                    yield decompressor.decompress(chunk)
+                except zstandard.ZstdError as err:
+                    # (like the other decoding errors)
+                    raise ValueError(err)
+
+        return decompressed()
+
+    def decompress_body(self, body, content_encoding):
+        return b''.join(self.decompress([body], content_encoding))
+
+def decode(body, content_type=None):
+    """ decodes a (decompressed) response body according to its content type """
+    if content_type is not None and content_type.startswith(FORMATS['msgpack'][0]):
+        import msgpack
+
+        return msgpack.unpackb(body, raw=False)
+
+    return json.loads(body.decode('utf-8'))
@@ -0,0 +1,14 @@
+"""
+Errors raised when talking to the budget API
+"""
+
+class BudgetClientAPIError(Exception):
+    pass
+
+class BudgetClientAPIOffline(BudgetClientAPIError):
+    """ the server couldn't be reached """
+    pass
+
+class BudgetClientAPIUnauthorized(BudgetClientAPIError):
+    """ the api key wasn't accepted (e.g. it expired) """
+    pass
@@ -0,0 +1,27 @@
+"""
+Lets pages tell each other about changes to their data, without a refetch
+"""
+
+import weakref
+
+class EventBus(object):
+    """
+    handlers are bound methods of pages, which are held weakly so that pages which
+    are dropped (e.g. on logout) stop being called without having to unsubscribe;
+    events are published and handled on the ui thread
+    """
+    def __init__(self):
+        # event name -> weak references to handlers
+        self.subscribers = {}
+
+    def subscribe(self, event, handler):
+        self.subscribers.setdefault(event, []).append(weakref.WeakMethod(handler))
+
+    def publish(self, event, **kwargs):
+        for ref in list(self.subscribers.get(event, [])):
+            handler = ref()
+
+            if handler is None:
+                self.subscribers[event].remove(ref)
+            else:
+                handler(**kwargs)
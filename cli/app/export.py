@@ -0,0 +1,280 @@
+"""
+Exports every table (and fund price histories) to files, without the curses ui:
+
+    python . export [--format csv|jsonl|parquet] [--out DIR] [--tables TABLE ...]
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+import tempfile
+from getpass import getpass
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from app.const import MIRROR_TABLES, PREFETCH_WORKERS, EXPORT_BATCH_ROWS
+from app.api import BudgetClientAPI, BudgetClientAPIError
+from app.stream import StreamDecoder
+from app.page_list import list_columns, fund_columns
+
+FORMATS = ['csv', 'jsonl', 'parquet']
+
+class CsvWriter(object):
+    def __init__(self, path, fields):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fields)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+class JsonlWriter(object):
+    def __init__(self, path, fields):
+        self.file = open(path, 'w')
+        self.fields = fields
+
+    def write(self, row):
+        self.file.write(json.dumps(dict(zip(self.fields, row))) + "\n")
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter(object):
+    """ writes a row group every EXPORT_BATCH_ROWS rows (this needs pyarrow) """
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = fields
+
+        self.batch = []
+        self.writer = None
+
+    def write(self, row):
+        self.batch.append(row)
+
+        if len(self.batch) >= EXPORT_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        table = pyarrow.table({
+            field: [row[index] for row in self.batch]
+            for (index, field) in enumerate(self.fields)
+        })
+
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+
+        self.writer.write_table(table.cast(self.writer.schema))
+        self.batch = []
+
+    def close(self):
+        if len(self.batch) > 0 or self.writer is None:
+            self.flush()
+
+        self.writer.close()
+
+WRITERS = {
+    'csv': CsvWriter,
+    'jsonl': JsonlWriter,
+    'parquet': ParquetWriter
+}
+
+def format_date(ymd):
+    return "{:04d}-{:02d}-{:02d}".format(*ymd)
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+def fund_value(fund, field, key):
+    if field == 'date':
+        return format_date(fund[key])
+
+    if field == 'units':
+        return sum([transaction['u'] for transaction in fund.get('tr', [])])
+
+    return fund[key]
+
+class Exporter(object):
+    """ downloads tables in parallel, writing each row as soon as it has been decoded """
+    def __init__(self, api, out, file_format):
+        self.api = api
+        self.out = out
+        self.format = file_format
+
+    def writer(self, name, fields):
+        path = os.path.join(self.out, "{}.{}".format(name, self.format))
+
+        return WRITERS[self.format](path, fields)
+
+    def export(self, tables):
+        """ returns the number of rows written to each file """
+        os.makedirs(self.out, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as pool:
+            futures = [
+                pool.submit(self.export_funds if table == 'funds' else self.export_list, table)
+                for table in tables
+            ]
+
+            counts = {}
+            for future in futures:
+                counts.update(future.result())
+
+        return counts
+
+    def export_list(self, table):
+        cols = list_columns(table)
+
+        writer = self.writer(table, ['id'] + [field for (_, _, field, _) in cols])
+
+        count = 0
+
+        try:
+            for row in self.api.req_stream(['data', table], StreamDecoder(['data', 'data'])):
+                writer.write([row['I']] + [
+                    format_date(row[key]) if field == 'date' else row[key]
+                    for (_, _, field, key) in cols
+                ])
+
+                count += 1
+        finally:
+            writer.close()
+
+        return {table: count}
+
+    def export_funds(self, table):
+        cols = fund_columns()[1] + [["Units", 10, 'units', 'tr']]
+
+        writers = {
+            'funds': self.writer('funds', ['id'] + [field for (_, _, field, _) in cols]),
+            'fund_transactions': self.writer('fund_transactions', \
+                    ['fund_id', 'date', 'units', 'cost']),
+            'fund_prices': self.writer('fund_prices', ['fund_id', 'time', 'price'])
+        }
+
+        counts = {name: 0 for name in writers}
+
+        decoder = StreamDecoder(['data', 'data'])
+
+        # prices can only be written once we have the times they were cached at; if the
+        # times come after the funds, the prices are spooled to disk by index until then
+        spool = None
+
+        def fund_prices(fund):
+            start = fund.get('prStartIndex', 0)
+
+            return [[fund['I'], start + index, price] \
+                    for (index, price) in enumerate(fund.get('pr', []))]
+
+        def write_price(fund_id, index, price, cache_times):
+            if 0 <= index < len(cache_times):
+                writers['fund_prices'].write([fund_id, format_time(cache_times[index]), price])
+
+                counts['fund_prices'] += 1
+
+        try:
+            for fund in self.api.req_stream(['data', table], decoder, {'history': 1}):
+                transactions = fund.get('tr', [])
+
+                writers['funds'].write([fund['I']] + [
+                    fund_value(fund, field, key) for (_, _, field, key) in cols
+                ])
+                counts['funds'] += 1
+
+                for transaction in transactions:
+                    writers['fund_transactions'].write([fund['I'], \
+                            format_date(transaction['d']), transaction['u'], transaction['c']])
+                    counts['fund_transactions'] += 1
+
+                cache_times = decoder.extra.get(('data', 'cacheTimes'))
+
+                if cache_times is not None:
+                    for row in fund_prices(fund):
+                        write_price(*row, cache_times)
+
+                else:
+                    if spool is None:
+                        spool = tempfile.TemporaryFile('w+')
+
+                    spool.writelines(json.dumps(row) + '\n' for row in fund_prices(fund))
+
+            if spool is not None:
+                cache_times = decoder.extra.get(('data', 'cacheTimes'), [])
+
+                spool.seek(0)
+
+                for line in spool:
+                    write_price(*json.loads(line), cache_times)
+        finally:
+            if spool is not None:
+                spool.close()
+
+            for writer in writers.values():
+                writer.close()
+
+        return counts
+
+def login(api, pin):
+    """ returns an error message, or None if we logged in """
+    try:
+        res = api.req(['user', 'login'], method='post', form={'pin': pin})
+    except BudgetClientAPIError as err:
+        return "API error: {}".format(err)
+
+    if res.get('error') is not False:
+        return "Error: {}".format(res.get('errorText'))
+
+    api.set_token(res['apiKey'], res['uid'])
+
+    return None
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python . export', \
+            description="Exports every table (and fund price histories) to files")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--out', default='budget-export', help="directory to write to")
+    parser.add_argument('--tables', nargs='+', choices=MIRROR_TABLES, default=MIRROR_TABLES)
+    parser.add_argument('--pin', help="PIN to log in with (or set BUDGET_PIN)")
+
+    args = parser.parse_args(argv)
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            parser.error("parquet exports need pyarrow to be installed")
+
+    pin = args.pin or os.environ.get('BUDGET_PIN') or getpass("PIN: ")
+
+    try:
+        pin = int(pin)
+    except ValueError:
+        parser.error("PIN must be numeric")
+
+    api = BudgetClientAPI()
+
+    error = login(api, pin)
+
+    if error is not None:
+        sys.stderr.write(error + "\n")
+        return 1
+
+    try:
+        counts = Exporter(api, args.out, args.format).export(args.tables)
+    except BudgetClientAPIError as err:
+        sys.stderr.write("API error: {}\n".format(err))
+        return 1
+    finally:
+        api.metrics.close()
+
+    for (name, count) in counts.items():
+        print("{}: {} rows".format(name, count))
+
+    return 0
@@ -0,0 +1,87 @@
+"""
+Keeps down the number of requests made at once: identical GETs share a single request,
+and each route only has a few requests in flight at a time
+"""
+
+import json
+import threading
+from concurrent.futures import Future
+
+from app.const import API_ROUTE_CONCURRENCY
+
+def request_key(user, kind, task, query):
+    """
+    identifies a request (kind being how its response is decoded); like cached
+    responses, requests are only shared between sessions of the same user
+    """
+    return user, kind, '/'.join(task), json.dumps(query, sort_keys=True, default=str)
+
+def share(res):
+    """
+    a copy of a response for another caller, so that e.g. popping the rows out of
+    it doesn't affect anyone else; the rows themselves aren't copied
+    """
+    if not isinstance(res, dict):
+        return res
+
+    res = dict(res)
+
+    if isinstance(res.get('data'), dict):
+        res['data'] = dict(res['data'])
+
+    return res
+
+class SingleFlight(object):
+    """
+    runs a call (e.g. a GET) unless an identical one is already running, in which
+    case its result (or error) is waited for and shared instead
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # key -> future of the call which is running
+        self.calls = {}
+
+    def run(self, key, func):
+        """ returns the result of func, and whether it came from another caller's call """
+        with self.lock:
+            future = self.calls.get(key)
+
+            leader = future is None
+
+            if leader:
+                future = Future()
+                self.calls[key] = future
+
+        if not leader:
+            return share(future.result()), True
+
+        try:
+            result = func()
+            future.set_result(result)
+
+            # everyone gets their own copy, even the caller which made the request
+            return share(result), False
+
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+class RouteLimits(object):
+    """ lets at most limit requests to each route run at the same time """
+    def __init__(self, limit=API_ROUTE_CONCURRENCY):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def route(self, route):
+        """ returns the semaphore to hold while making a request to route """
+        with self.lock:
+            if route not in self.semaphores:
+                self.semaphores[route] = threading.BoundedSemaphore(self.limit)
+
+            return self.semaphores[route]
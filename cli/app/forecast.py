@@ -0,0 +1,130 @@
+"""
+Predicts future spending (and so balance) from the overview's monthly cost series
+"""
+
+import numpy as np
+
+from app.const import FORECAST_ROLLING_MONTHS
+
+FORECAST_MODELS = ['mean', 'rolling', 'median', 'seasonal']
+
+class ForecastEngine(object):
+    """
+    works out the out / net / predicted series once per data load;
+    the model used for future months can be changed at runtime
+    """
+    def __init__(self, data, future_cols, model=FORECAST_MODELS[0]):
+        self.future_cols = future_cols
+
+        self.start = data['startYearMonth']
+        end = data['endYearMonth']
+        now = data['currentYear'], data['currentMonth']
+
+        # number of months (inclusive) since the start month
+        self.num_rows = 12 * (end[0] - self.start[0]) + end[1] - self.start[1] + 1
+
+        # months before this index have happened (including the current one)
+        self.future_key = min(self.num_rows, \
+                12 * (now[0] - self.start[0]) + now[1] - self.start[1] + 1)
+
+        self.cost = {
+            key: np.array(values[:self.num_rows], dtype=np.float64)
+            for (key, values) in data['cost'].items()
+        }
+
+        # month of the year (0 = January) of each row
+        self.month_of_year = (self.start[1] - 1 + np.arange(self.num_rows)) % 12
+
+        self.model = model
+        self.series = {}
+
+        self.calculate()
+
+    def set_model(self, model):
+        self.model = model
+        self.calculate()
+
+    def next_model(self):
+        self.set_model(FORECAST_MODELS[(FORECAST_MODELS.index(self.model) + 1) % \
+                len(FORECAST_MODELS)])
+
+    def change_cost(self, key, changes):
+        """
+        adds to the costs of some months, given (year_month, delta) pairs (e.g. after an
+        edit); the forecast is worked out again, as the estimated months depend on every
+        past one. Returns whether any of the months are in the overview
+        """
+        changed = False
+
+        for (year_month, delta) in changes:
+            row = 12 * (year_month[0] - self.start[0]) + year_month[1] - self.start[1]
+
+            if key in self.cost and 0 <= row < self.num_rows:
+                self.cost[key][row] += delta
+                changed = True
+
+        if changed:
+            self.calculate()
+
+        return changed
+
+    def estimate(self, past):
+        """
+        given past spending (one row per column), returns estimated spending for
+        every month (one row per column)
+        """
+        if self.model == 'rolling':
+            return np.repeat(past[:, -FORECAST_ROLLING_MONTHS:].mean(axis=1, keepdims=True), \
+                    self.num_rows, axis=1)
+
+        if self.model == 'median':
+            return np.repeat(np.median(past, axis=1, keepdims=True), self.num_rows, axis=1)
+
+        if self.model == 'seasonal':
+            # average of the same month in previous years, or of all months if there are none
+            past_month = self.month_of_year[:past.shape[1]]
+            counts = np.bincount(past_month, minlength=12)
+
+            totals = np.array([np.bincount(past_month, weights=row, minlength=12) for row in past])
+            overall = past.mean(axis=1, keepdims=True)
+
+            by_month = np.where(counts > 0, totals / np.maximum(counts, 1), overall)
+
+            return by_month[:, self.month_of_year]
+
+        return np.repeat(past.mean(axis=1, keepdims=True), self.num_rows, axis=1)
+
+    def calculate(self):
+        """ calculates future spending data based on past spending """
+        future_key = self.future_key
+
+        actual = np.array([self.cost[col] for col in self.future_cols])
+        estimated = self.estimate(actual[:, :future_key])
+
+        spending = np.where(np.arange(self.num_rows) < future_key, actual, estimated)
+
+        out_with_future = spending.sum(axis=0) + self.cost['bills']
+
+        # net spending
+        net = self.cost['income'] - out_with_future
+
+        # predicted balance, based on future spending predictions
+        num_known = min(future_key + 1, self.num_rows)
+
+        predicted = np.empty(self.num_rows)
+        predicted[:num_known] = self.cost['balance'][np.maximum(0, np.arange(num_known) - 1)] \
+                + net[:num_known]
+
+        # (each future month is truncated before the next is added to it, as it always was)
+        for i in range(num_known, self.num_rows):
+            predicted[i] = int(predicted[i - 1] + net[i])
+
+        self.series = {
+            'out': out_with_future,
+            'net': net,
+            'predicted': predicted
+        }
+
+    def active_row(self):
+        """ index of the current month """
+        return self.future_key - 1
@@ -8,17 +8,17 @@ from curses.textpad import Textbox, rectangle
 from app.const import NC_COLOR_TAB, NC_COLOR_TAB_SEL, \
         BTN_CANCEL_TEXT, BTN_SUBMIT_TEXT, \
         KEYCODE_TAB, KEYCODE_NEWLINE, KEYCODE_RETURN
+from app.compositor import refresh, update
 from app.methods import window_fill_color, alignc, \
         serialise_input, deserialise, \
         ellipsis
-from app.api import BudgetClientAPIError
 
 def draw_button(btn, highlight=False):
     color = curses.color_pair(NC_COLOR_TAB_SEL[0] if highlight else NC_COLOR_TAB[0])
 
-    btn[0].clear()
+    btn[0].erase()
     btn[0].addstr(0, 0, alignc(9, btn[1]), color)
-    btn[0].refresh()
+    refresh(btn[0])
 
 class FormEdit(object):
     """ Displays an interactive form for editing data """
@@ -35,6 +35,7 @@ class FormEdit(object):
         }
 
         self.updated = False
+        self.submitted = None
 
         form_h = min(dim[0], 3 * (3 + len(self.data['fields'])))
         form_w = min(dim[1], 40)
@@ -93,8 +94,6 @@ class FormEdit(object):
 
             self.win['input_values'].append(deserialise(self.data['item'][index], index, width - 1))
 
-            self.win['form_row'][j].refresh()
-
             j += 1
 
         # form buttons
@@ -108,7 +107,7 @@ class FormEdit(object):
         for i in range(len(self.btns)):
             draw_button(self.btns[i], i == 0)
 
-        self.win['form'].refresh()
+        refresh(self.win['form'])
 
     def nav(self, difference):
         # navigate between form elements
@@ -127,6 +126,9 @@ class FormEdit(object):
         if self.form['tab_index'] < num_fields:
             # select a form input
             curses.curs_set(1)
+
+            # the input is drawn by the text box from here on
+            update()
             self.win['input'][self.form['tab_index']].edit()
 
             self.win['input_values'][self.form['tab_index']] = \
@@ -138,9 +140,9 @@ class FormEdit(object):
             draw_button(self.btns[self.form['tab_index'] - num_fields], highlight=True)
 
     def status(self, msg):
-        self.win['statusbar'].clear()
+        self.win['statusbar'].erase()
         self.win['statusbar'].addstr(0, 0, alignc(self.form['w'] - 2, msg))
-        self.win['statusbar'].refresh()
+        refresh(self.win['statusbar'])
 
     def key_input(self, key):
         if key == KEYCODE_TAB:
@@ -159,28 +161,15 @@ class FormEdit(object):
                         data[index] = serialise_input(self.win['input_values'][i], index)
                         i += 1
 
-                    self.status("Loading...")
-
-                    try:
-                        res = self.api.req(['data', self.data['table']], method='put', form=data)
-
-                        if res and res['error'] is False:
-                            self.status("")
-                            self.updated = True
-
-                            self.finished()
-                        else:
-                            raise BudgetClientAPIError(res.errorText)
-
-                    except BudgetClientAPIError as code:
-                        self.status("API error: {}!".format(code))
-
                 except ValueError:
                     self.status("Error: bad data!")
 
-                return False
+                    return False
+
+                # the page queues this up to be sent to the server
+                self.submitted = data
+                self.updated = True
 
             self.finished()
 
         return False
-
@@ -2,19 +2,41 @@
 Main CLI app, called by init script
 """
 import curses
+from time import time
+from importlib import import_module
 from curses.textpad import rectangle
 
 from app.api import BudgetClientAPI
 from app.user import User
-from app.methods import window_color, ellipsis, nav_key
-from app.page_overview import PageOverview
-from app.page_list import PageFunds, PageIncome, PageBills, PageFood, PageGeneral, \
-        PageHoliday, PageSocial
+from app.prefetch import PagePrefetcher
+from app.compositor import refresh, update
+from app.methods import window_color, window_fill_color, ellipsis, nav_key
+from app.metrics import format_metric
+from app.memory import PageMemory
 from app.const import NC_COLOR_BG, NC_COLOR_TAB, NC_COLOR_TAB_SEL, NC_COLOR_UP, \
         NC_COLOR_DOWN, NC_COLOR_UP_SEL, NC_COLOR_DOWN_SEL, \
         NC_COLOR_HEADER, NC_COLOR_STATUS_BAR, \
-        KEY_QUIT, KEY_LOGOUT, KEYCODE_NEWLINE, KEYCODE_RETURN, KEYCODE_TAB, \
-        NAV_SECT_TABS, NAV_SECT_PAGE
+        KEY_QUIT, KEY_LOGOUT, KEY_METRICS, KEY_MEMORY, KEYCODE_NEWLINE, KEYCODE_RETURN, KEYCODE_TAB, \
+        NAV_SECT_TABS, NAV_SECT_PAGE, INPUT_POLL_MS, METRICS_REDRAW
+
+# the class of each page; these (and numpy) take a while to import, so they're
+# loaded in the background while the PIN is typed
+PAGE_CLASSES = {
+    "Overview": ('app.page_overview', 'PageOverview'),
+    "Funds": ('app.page_list', 'PageFunds'),
+    "Income": ('app.page_list', 'PageIncome'),
+    "Bills": ('app.page_list', 'PageBills'),
+    "Food": ('app.page_list', 'PageFood'),
+    "General": ('app.page_list', 'PageGeneral'),
+    "Holiday": ('app.page_list', 'PageHoliday'),
+    "Social": ('app.page_list', 'PageSocial'),
+    "Analysis": ('app.page_analysis', 'PageAnalysis')
+}
+
+def page_class(page):
+    module, name = PAGE_CLASSES[page]
+
+    return getattr(import_module(module), name)
 
 def init_ncurses_colors():
     curses.init_pair(*NC_COLOR_BG)
@@ -30,32 +52,53 @@ class BudgetClient(object):
     def __init__(self):
         self.state = {
             'pages': ["Overview", "Funds", "Income", "Bills", "Food", "General", \
-                "Holiday", "Social"],
+                "Holiday", "Social", "Analysis"],
             'obj': {},
             'current': 0,
-            'statusbar': []
+            'statusbar': [],
+            'overlay': None, # which overlay (metrics or memory) is open
+            'overlay_drawn': 0,
+            'tab_drawn': None, # the tab and status bar text on screen, which are
+            'statusbar_drawn': None # only drawn again if they change
         }
 
         # determines what will happen if navigation keys are pressed
         self.nav_sect = NAV_SECT_TABS
 
         # define windows
-        self.win = {'statusbar': None, 'header': None}
+        self.win = {'statusbar': None, 'header': None, 'overlay': None}
 
         self.scr = None
         self.api = None
         self.user = None
+        self.prefetch = None
+        self.memory = None
 
     def start(self, stdscr):
         """ this is called by the ncurses wrapper """
+        self.setup(stdscr)
+        self.loop()
+
+    def setup(self, stdscr):
+        """ creates what's needed to show the login form """
         self.scr = stdscr
 
         init_ncurses_colors()
 
         self.api = BudgetClientAPI()
         self.user = User(stdscr, self.logged_in, self.api)
+        self.prefetch = PagePrefetcher(self.build_page)
+        self.memory = PageMemory()
 
-        self.loop()
+    def preload(self):
+        """ loads the http session and page classes, so that they're ready after logging in """
+        self.api.connect()
+
+        # open a connection to the server while the PIN is typed
+        self.api.run_async(self.api.warm, self.user.pin_sent)
+
+        for page in self.state['pages']:
+            page_class(page)
 
     def loop(self):
         """ main application loop """
@@ -63,21 +106,75 @@ class BudgetClient(object):
         if self.user.state['uid'] > 0:
             self.logged_in()
         else:
+            self.api.run_async(self.preload)
             self.user.logged_out()
 
-        # catch keyboard input
+        # catch keyboard input, checking on background requests in between key presses
+        self.scr.timeout(INPUT_POLL_MS)
+
         while True:
-            if not self.key_input(self.scr.getch()):
+            self.poll()
+
+            # everything drawn since the last key press goes to the terminal at once
+            update()
+
+            char = self.scr.getch()
+
+            if char != -1 and not self.key_input(char):
                 break
 
+        # don't lose edits which haven't been sent yet
+        self.api.edits.close()
+        self.api.metrics.close()
+
+    def poll(self):
+        """ applies the results of any requests which have finished since the last key press """
+        self.api.poll()
+
+        if self.user.state['uid'] == 0:
+            return
+
+        if self.api.unauthorized:
+            # the saved api key has expired
+            self.logout("Please log in again")
+            return
+
+        if self.state['overlay'] is not None and \
+                time() - self.state['overlay_drawn'] > METRICS_REDRAW:
+            self.gui_overlay()
+
+        page = self.state['pages'][self.state['current']]
+
+        if page not in self.state['obj'] and self.prefetch.ready(page) \
+                and self.nav_sect == NAV_SECT_TABS:
+            # the page we're waiting on just finished loading
+            self.load_page()
+
     def key_input(self, char):
+        page = self.state['obj'].get(self.state['pages'][self.state['current']])
+
+        if page is not None and self.nav_sect == NAV_SECT_PAGE and page.captures_input():
+            page.key_input(char)
+            return True
+
         if char == ord(KEY_QUIT):
             return False # quit the app
 
+        if self.user.state['uid'] == 0:
+            return True # still waiting to log in
+
         if char == ord(KEY_LOGOUT):
             self.logout()
             return True
 
+        if char == ord(KEY_METRICS):
+            self.toggle_overlay('metrics')
+            return True
+
+        if char == ord(KEY_MEMORY):
+            self.toggle_overlay('memory')
+            return True
+
         pass_input = True
 
         d_x, d_y, done_nav = nav_key(char)
@@ -116,22 +213,39 @@ class BudgetClient(object):
         return True
 
     def logged_in(self):
-        self.api.set_token(self.user.state['token'])
+        self.api.set_token(self.user.state['token'], self.user.state['uid'])
+
+        # the page window has to exist before pages can be built
+        self.win['page'] = curses.newwin(curses.LINES - 3, curses.COLS, 2, 0)
+
+        self.prefetch.start(self.state['pages'])
 
         self.draw_gui()
 
-    def logout(self):
+    def logout(self, msg=""):
         """ show cursor """
         curses.curs_set(1)
 
+        self.api.edits.close()
         self.api.set_token()
+        self.prefetch.cancel()
+        self.state['overlay'] = None
         self.state['obj'] = {}
-        self.user.logged_out()
+        self.memory.clear()
+
+        self.user.pin_sent.clear()
+        self.api.run_async(self.api.warm, self.user.pin_sent)
+
+        self.user.logged_out(msg)
 
     def draw_gui(self):
         """ calls other methods to draw the main application window """
-        self.scr.clear()
-        self.scr.refresh()
+        self.scr.erase()
+        refresh(self.scr)
+
+        # the screen was cleared, so these are drawn again from scratch
+        self.win['header'] = None
+        self.win['statusbar'] = None
 
         # hide cursor
         curses.curs_set(0)
@@ -141,8 +255,7 @@ class BudgetClient(object):
         self.gui_page()
 
     def gui_page(self):
-        self.win['page'] = curses.newwin(curses.LINES - 3, curses.COLS, 2, 0)
-        self.win['page'].clear()
+        self.win['page'].erase()
 
         # Select and load first page in list
         self.nav(0, 0, load=True)
@@ -167,14 +280,113 @@ class BudgetClient(object):
             self.win['header'] = window_color(0, 0, curses.COLS, 2, color)
 
             self.win['header'].addstr(0, 0, "Budget", color)
-            self.win['header'].refresh()
+
+            self.state['tab_drawn'] = None
+
+        if self.state['tab_drawn'] == self.state['current']:
+            return
 
         self.gui_tabs(self.win['header'])
 
-        self.win['header'].refresh()
+        refresh(self.win['header'])
+
+        self.state['tab_drawn'] = self.state['current']
+
+    def toggle_overlay(self, overlay):
+        self.state['overlay'] = None if self.state['overlay'] == overlay else overlay
+
+        if self.state['overlay'] is not None:
+            self.gui_overlay()
+            return
+
+        self.win['overlay'] = None
+
+        # show what was under the overlay again
+        page = self.state['obj'].get(self.state['pages'][self.state['current']])
+
+        if page is not None:
+            page.switch_to()
+        else:
+            self.win['page'].erase()
+            refresh(self.win['page'])
+
+    def gui_overlay(self):
+        """ draws the open overlay over the page """
+        color = curses.color_pair(NC_COLOR_TAB[0])
+
+        rows = self.api.metrics.summary() if self.state['overlay'] == 'metrics' \
+                else self.memory.report(self.state['obj'])
+
+        height = min(curses.LINES - 3, len(rows) + 3)
+
+        if self.win['overlay'] is None or self.win['overlay'].getmaxyx()[0] != height:
+            self.win['overlay'] = window_color(0, 2, curses.COLS, height, color)
+        else:
+            window_fill_color(self.win['overlay'], height, curses.COLS, color)
+
+        if self.state['overlay'] == 'metrics':
+            self.gui_metrics(self.win['overlay'], rows, height, color)
+        else:
+            self.gui_memory(self.win['overlay'], rows, height, color)
+
+        refresh(self.win['overlay'])
+
+        self.state['overlay_drawn'] = time()
+
+    def gui_metrics(self, win, metrics, height, color):
+        """ draws the histograms of request and page timings """
+        cols = [["Metric", 16], ["Count", 8], ["p50", 9], ["p90", 9], ["p99", 9], \
+                ["Max", 9], ["Distribution", 14], ["Last", 0]]
+
+        col = 1
+        for (name, width) in cols:
+            win.addstr(0, col, name, color | curses.A_BOLD)
+            col += width
+
+        for (row, (name, histogram)) in enumerate(metrics[:height - 2]):
+            summary = histogram.summary()
+
+            value, fields = histogram.last
+
+            cells = [name, str(summary['count'])] + [
+                format_metric(summary[key], histogram.unit)
+                for key in ['p50', 'p90', 'p99', 'max']
+            ] + [
+                histogram.spark(),
+                "{} {}".format(format_metric(value, histogram.unit), \
+                        ' '.join([str(field) for field in fields.values()]))
+            ]
+
+            col = 1
+            for (text, (_, width)) in zip(cells, cols):
+                win.addstr(row + 1, col, \
+                        ellipsis(text, (width or curses.COLS - col) - 1), color)
+                col += width
+
+    def gui_memory(self, win, pages, height, color):
+        """ draws how much memory each loaded page uses, most recently shown first """
+        cols = [["Page", 16], ["State", 10], ["Size", 0]]
+
+        col = 1
+        for (name, width) in cols:
+            win.addstr(0, col, name, color | curses.A_BOLD)
+            col += width
+
+        for (row, (name, evicted, size)) in enumerate(pages[:height - 3]):
+            cells = [name, "snapshot" if evicted else "loaded", format_metric(size, 'B')]
+
+            col = 1
+            for (text, (_, width)) in zip(cells, cols):
+                win.addstr(row + 1, col, ellipsis(text, (width or curses.COLS - col) - 1), color)
+                col += width
+
+        win.addstr(height - 2, 1, ellipsis("{} of {} used".format( \
+                format_metric(self.memory.total(), 'B'), \
+                format_metric(self.memory.budget, 'B')), curses.COLS - 2), color | curses.A_BOLD)
 
     def set_statusbar(self, items=None):
-        self.state['statusbar'] = [[KEY_QUIT, "quit"], [KEY_LOGOUT, "logout"]] + \
+        self.state['statusbar'] = [[KEY_QUIT, "quit"], [KEY_LOGOUT, "logout"], \
+                [KEY_METRICS, "metrics"], [KEY_MEMORY, "memory"]] + \
                 ([] if items is None else items)
         self.gui_statusbar()
 
@@ -182,24 +394,34 @@ class BudgetClient(object):
         """ draws a status bar at the bottom of the screen """
         color = curses.color_pair(NC_COLOR_STATUS_BAR[0])
 
-        text1 = "Logged in as {}".format(self.user.state['name'])
+        text1 = "Logged in as {}{}".format(self.user.state['name'], \
+                " (offline)" if self.api.offline else "")
 
         text2 = ellipsis(" (" + ', '.join([
             "{}: {}".format(key, item)
             for (key, item) in self.state['statusbar']
-        ]) + ")", curses.COLS - len(text1))
+        ]) + ")", curses.COLS - len(text1) - 1)
 
-        if self.win['statusbar'] is not None:
-            del self.win['statusbar']
+        if self.win['statusbar'] is not None and self.state['statusbar_drawn'] == text1 + text2:
+            return
+
+        if self.win['statusbar'] is None:
+            self.win['statusbar'] = window_color(0, curses.LINES - 1, curses.COLS, 1, color)
+        else:
+            window_fill_color(self.win['statusbar'], 1, curses.COLS, color)
 
-        self.win['statusbar'] = window_color(0, curses.LINES - 1, curses.COLS, 1, color)
         self.win['statusbar'].addstr(0, 0, text1, color)
         self.win['statusbar'].addstr(0, len(text1), text2, color | curses.A_BOLD)
-        self.win['statusbar'].refresh()
+        refresh(self.win['statusbar'])
+
+        self.state['statusbar_drawn'] = text1 + text2
 
     def nav(self, d_x, d_y, load=False):
         """ navigates through selected part of application """
         if self.nav_sect == NAV_SECT_TABS:
+            if d_x != 0 and self.state['pages'][self.state['current']] in self.state['obj']:
+                self.state['obj'][self.state['pages'][self.state['current']]].hide()
+
             self.state['current'] = (self.state['current'] + d_x) % len(self.state['pages'])
 
             self.gui_header()
@@ -207,13 +429,15 @@ class BudgetClient(object):
             page = self.state['pages'][self.state['current']]
 
             if page in self.state['obj']:
-                self.state['obj'][page].switch_to()
-            elif load:
+                self.show_page(page)
+            elif load or self.prefetch.ready(page):
                 self.load_page()
             else:
-                self.win['page'].clear()
-                self.win['page'].addstr(0, 0, "Press enter to load page: {}".format(page))
-                self.win['page'].refresh()
+                self.win['page'].erase()
+                self.win['page'].addstr(0, 0, "Loading page: {} (press enter to wait for it)"\
+                        .format(page) if self.prefetch.pending(page) else \
+                        "Press enter to load page: {}".format(page))
+                refresh(self.win['page'])
 
                 self.set_statusbar()
 
@@ -228,37 +452,26 @@ class BudgetClient(object):
             # load the selected tab's page
             self.load_page()
 
+    def build_page(self, page):
+        """ constructs a page object (this runs on the prefetch thread pool) """
+        if page not in PAGE_CLASSES:
+            return None
+
+        return page_class(page)(self.win['page'], self.api, self.set_statusbar)
+
     def load_page(self):
         page = self.state['pages'][self.state['current']]
 
         if page not in self.state['obj']:
-            if page == "Overview":
-                self.state['obj'][page] = PageOverview(\
-                        self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "Funds":
-                self.state['obj'][page] = PageFunds(self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "Income":
-                self.state['obj'][page] = PageIncome(self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "Bills":
-                self.state['obj'][page] = PageBills(self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "Food":
-                self.state['obj'][page] = PageFood(self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "General":
-                self.state['obj'][page] = PageGeneral(\
-                        self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "Holiday":
-                self.state['obj'][page] = PageHoliday(\
-                        self.win['page'], self.api, self.set_statusbar)
-
-            elif page == "Social":
-                self.state['obj'][page] = PageSocial(self.win['page'], self.api, self.set_statusbar)
+            if self.prefetch.pending(page):
+                self.state['obj'][page] = self.prefetch.get(page)
+            else:
+                self.state['obj'][page] = self.build_page(page)
 
-            self.state['obj'][page].switch_to()
+            self.show_page(page)
 
+    def show_page(self, page):
+        self.state['obj'][page].switch_to()
 
+        # make room for it by evicting the pages which haven't been shown for longest
+        self.memory.shown(page, self.state['obj'])
@@ -0,0 +1,100 @@
+"""
+Works out roughly how much memory pages use, so that the least recently used can be evicted
+"""
+
+import sys
+from types import FunctionType, MethodType, BuiltinFunctionType, ModuleType
+
+from app.const import PAGE_MEMORY_BYTES
+
+# things which belong to the app rather than to any object which refers to them
+SHARED_TYPES = (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType)
+
+def footprint(obj, skip=()):
+    """
+    returns the number of bytes held by obj and everything it refers to, except for
+    the objects in skip (e.g. the api); objects reachable more than once are counted once
+    """
+    seen = set(id(item) for item in skip)
+    stack = [obj]
+    total = 0
+
+    while len(stack) > 0:
+        item = stack.pop()
+
+        if id(item) in seen or isinstance(item, SHARED_TYPES):
+            continue
+
+        seen.add(id(item))
+
+        # (this includes the data of arrays, unless they're a view of another object)
+        total += sys.getsizeof(item)
+
+        if hasattr(item, 'dtype'):
+            if getattr(item, 'base', None) is not None:
+                stack.append(item.base)
+        elif isinstance(item, dict):
+            stack += list(item.keys()) + list(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack += list(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(vars(item))
+
+    return total
+
+class PageMemory(object):
+    """
+    keeps track of how much memory each loaded page uses, and evicts the pages which
+    were shown least recently once they add up to more than the budget
+    """
+    def __init__(self, budget=PAGE_MEMORY_BYTES):
+        self.budget = budget
+
+        # names of the loaded pages, least recently shown first
+        self.recent = []
+        self.sizes = {}
+
+        # (revision, bytes) of each page when it was last measured while loaded, as
+        # walking a page is slow, and its data only changes now and then
+        self.footprints = {}
+
+    def measure(self, name, page):
+        if page.snapshot is not None:
+            self.sizes[name] = sys.getsizeof(page.snapshot)
+            return
+
+        if name not in self.footprints or self.footprints[name][0] != page.revision:
+            self.footprints[name] = page.revision, footprint(page, [page.api, page.win])
+
+        self.sizes[name] = self.footprints[name][1]
+
+    def total(self):
+        return sum(self.sizes[name] for name in self.recent)
+
+    def shown(self, name, pages):
+        """ called when a page is switched to (pages are the loaded page objects) """
+        if name in self.recent:
+            self.recent.remove(name)
+
+        self.recent.append(name)
+
+        self.measure(name, pages[name])
+
+        for other in self.recent[:-1]:
+            if self.total() <= self.budget:
+                break
+
+            if pages[other].evict():
+                self.measure(other, pages[other])
+
+    def report(self, pages):
+        """ returns (name, whether it's evicted, bytes) of each page, most recently shown first """
+        return [
+            (name, pages[name].snapshot is not None, self.sizes[name])
+            for name in reversed(self.recent)
+        ]
+
+    def clear(self):
+        self.recent = []
+        self.sizes = {}
+        self.footprints = {}
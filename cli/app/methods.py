@@ -3,16 +3,16 @@ Extra methods, e.g. to make curses programming less disgusting
 """
 
 import re
+import math
 import curses
 from datetime import datetime
-import numpy as np
 
 from app.const import SYMBOL_CURRENCY
 
 def window_color(pos_x, pos_y, width, height, color):
     """ returns a new window filled with a background colour """
     window = curses.newwin(height, width, pos_y, pos_x)
-    window.clear()
+    window.erase()
 
     return window_fill_color(window, height, width, color)
 
@@ -62,7 +62,7 @@ def format_currency(pence, width=None, align=True, show_pence=True):
 
     text = u"{0[0]}{0[1]}{0[2]:.2f}".format([sign, SYMBOL_CURRENCY, pounds]) \
             if show_pence else \
-            u"{0[0]}{0[1]}{0[2]}".format([sign, SYMBOL_CURRENCY, int(np.round(pounds))])
+            u"{0[0]}{0[1]}{0[2]}".format([sign, SYMBOL_CURRENCY, int(round(pounds))])
 
 
     return alignr(width, text) if align else text
@@ -87,7 +87,7 @@ def ellipsis(text, length, cutoff='[...]'):
 def get_tick_size(min_v, max_v, num_ticks=5):
     minimum = (max_v - min_v) / num_ticks
 
-    magnitude = 10 ** np.floor(np.log10(minimum))
+    magnitude = 10.0 ** math.floor(math.log10(minimum))
 
     res = minimum / magnitude
 
@@ -0,0 +1,126 @@
+"""
+Timings of requests and page phases, kept as rolling histograms (and optionally logged)
+"""
+
+import json
+import math
+import threading
+from bisect import bisect
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter, time
+
+from app.const import METRICS_FILE, METRICS_WINDOW, SPARK_BARS
+
+# histogram buckets: 10us to 10s for timings, 100B to 100MB for sizes (two per decade)
+BUCKETS = {
+    's': [10 ** (exponent / 2) for exponent in range(-10, 3)],
+    'B': [10 ** (exponent / 2) for exponent in range(4, 17)]
+}
+
+class Histogram(object):
+    """ the most recent samples of a metric """
+    def __init__(self, unit='s', size=METRICS_WINDOW):
+        self.unit = unit
+        self.samples = deque(maxlen=size)
+
+        self.count = 0
+        self.last = None
+
+    def add(self, value, fields):
+        self.samples.append(value)
+        self.count += 1
+        self.last = (value, fields)
+
+    def summary(self):
+        values = sorted(self.samples)
+
+        def percentile(fraction):
+            return values[min(len(values) - 1, int(fraction * len(values)))]
+
+        return {
+            'count': self.count,
+            'p50': percentile(0.5),
+            'p90': percentile(0.9),
+            'p99': percentile(0.99),
+            'max': values[-1]
+        }
+
+    def spark(self):
+        """ the distribution of the samples, as a row of bars """
+        edges = BUCKETS[self.unit]
+
+        counts = [0] * (len(edges) - 1)
+        for value in self.samples:
+            counts[min(len(counts) - 1, max(0, bisect(edges, value) - 1))] += 1
+
+        return ''.join([
+            SPARK_BARS[math.ceil(count * (len(SPARK_BARS) - 1) / max(counts))]
+            for count in counts
+        ])
+
+class Metrics(object):
+    """ records samples from any thread; they can be appended to a file as JSON lines """
+    def __init__(self, path=METRICS_FILE):
+        self.path = path
+        self.file = None
+
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, value, unit='s', **fields):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(unit)
+
+            self.histograms[name].add(value, fields)
+
+            if self.path is not None:
+                self.write(dict(fields, time=time(), metric=name, value=value, unit=unit))
+
+    def write(self, sample):
+        try:
+            if self.file is None:
+                self.file = open(self.path, 'a')
+
+            self.file.write(json.dumps(sample) + "\n")
+            self.file.flush()
+        except OSError:
+            # metrics aren't worth crashing over
+            self.path = None
+
+    @contextmanager
+    def timer(self, name, **fields):
+        """ records how long the block takes """
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start, **fields)
+
+    def summary(self):
+        """ returns (name, histogram) pairs, in order of name """
+        with self.lock:
+            return sorted(self.histograms.items())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def format_metric(value, unit):
+    if unit == 'B':
+        for prefix in ['', 'k', 'M']:
+            if value < 1000 or prefix == 'M':
+                return "{:.0f}{}B".format(value, prefix)
+
+            value /= 1000
+
+    if value < 1e-3:
+        return "{:.0f}us".format(value * 1e6)
+
+    if value < 1:
+        return "{:.1f}ms".format(value * 1e3)
+
+    return "{:.2f}s".format(value)
@@ -0,0 +1,253 @@
+"""
+Local SQLite copy of the data the pages show, so that they work without a connection
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from app.const import CACHE_DIR, MIRROR_TABLES
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS rows (
+        tbl TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        date TEXT,
+        item TEXT,
+        category TEXT,
+        cost INTEGER,
+        shop TEXT,
+        body TEXT NOT NULL,
+        PRIMARY KEY (tbl, id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS rows_date ON rows (tbl, date)",
+    "CREATE INDEX IF NOT EXISTS rows_category ON rows (tbl, category)",
+    "CREATE INDEX IF NOT EXISTS rows_shop ON rows (tbl, shop)",
+    # whole responses (e.g. the overview), and everything except the rows of list tables
+    """CREATE TABLE IF NOT EXISTS documents (
+        route TEXT PRIMARY KEY,
+        body TEXT NOT NULL
+    )""",
+    # edits made while offline, waiting to be sent
+    """CREATE TABLE IF NOT EXISTS journal (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tbl TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        fields TEXT NOT NULL,
+        base TEXT,
+        created REAL NOT NULL
+    )"""
+]
+
+# api keys of the category column of each table
+CATEGORY_KEYS = ['k', 'h', 'y']
+
+def dumps(value):
+    """ encodes a value as json, including any arrays in it (e.g. fund prices) """
+    return json.dumps(value, default=lambda array: array.tolist())
+
+def document_key(task, query):
+    """ identifies a response, ignoring the delta sync parameter """
+    return json.dumps(['/'.join(task), sorted(
+        (str(key), str(value)) for (key, value) in (query or {}).items() if key != 'since'
+    )])
+
+def row_values(table, row):
+    date = row.get('d')
+    category = next((row[key] for key in CATEGORY_KEYS if key in row), None)
+
+    return (
+        table, row['I'],
+        "{:04d}-{:02d}-{:02d}".format(*date) if isinstance(date, list) else None,
+        row.get('i'), category, row.get('c'), row.get('s'),
+        dumps(row)
+    )
+
+class LocalMirror(object):
+    """ mirrors api responses into an sqlite database, one per user """
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        self.db = None
+        self.lock = threading.Lock()
+
+    def open(self, user):
+        self.close()
+
+        if user is None:
+            return
+
+        try:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+            db = sqlite3.connect(os.path.join(self.path, "mirror-{}.sqlite".format(user)), \
+                    check_same_thread=False)
+
+            with db:
+                for statement in SCHEMA:
+                    db.execute(statement)
+
+        except (OSError, sqlite3.Error):
+            return
+
+        with self.lock:
+            self.db = db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def is_table(self, task):
+        return len(task) == 2 and task[0] == 'data' and task[1] in MIRROR_TABLES
+
+    def save(self, task, query, data):
+        """ stores a (full or delta) response """
+        if not isinstance(data, dict):
+            return
+
+        # (the mirror can be closed by logging out while a request is finishing)
+        with self.lock:
+            if self.db is None:
+                return
+
+            with self.db:
+                if not self.is_table(task):
+                    self.db.execute("REPLACE INTO documents (route, body) VALUES (?, ?)", \
+                            (document_key(task, query), dumps(data)))
+                    return
+
+                table = task[1]
+
+                if data.get('delta') is True:
+                    self.db.executemany("DELETE FROM rows WHERE tbl = ? AND id = ?", \
+                            [(table, row_id) for row_id in data.get('deleted', [])])
+                else:
+                    self.db.execute("DELETE FROM rows WHERE tbl = ?", (table,))
+
+                self.db.executemany("REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", \
+                        [row_values(table, row) for row in data.get('data', [])])
+
+                meta = {key: value for (key, value) in data.items() \
+                        if key not in ['data', 'deleted', 'delta']}
+
+                self.db.execute("REPLACE INTO documents (route, body) VALUES (?, ?)", \
+                        (document_key(task, query), dumps(meta)))
+
+    def load(self, task, query):
+        """ returns a response as it was last seen (plus any journalled edits), or None """
+        with self.lock:
+            if self.db is None:
+                return None
+
+            doc = self.db.execute("SELECT body FROM documents WHERE route = ?", \
+                    (document_key(task, query),)).fetchone()
+
+            if doc is None:
+                return None
+
+            data = json.loads(doc[0])
+
+            if not self.is_table(task):
+                return data
+
+            rows = [
+                json.loads(body) for (body,) in self.db.execute(
+                    "SELECT body FROM rows WHERE tbl = ? ORDER BY date DESC, id DESC", (task[1],))
+            ]
+
+            edited = {}
+            for (row_id, fields) in self.db.execute( \
+                    "SELECT id, fields FROM journal WHERE tbl = ? ORDER BY seq", (task[1],)):
+                edited.setdefault(row_id, {}).update(json.loads(fields))
+
+        for row in rows:
+            if row['I'] in edited:
+                row.update(edited[row['I']])
+
+        data['data'] = rows
+
+        return data
+
+    def row(self, table, row_id):
+        """ returns a row as the server last sent it """
+        with self.lock:
+            if self.db is None:
+                return None
+
+            found = self.db.execute("SELECT body FROM rows WHERE tbl = ? AND id = ?", \
+                    (table, row_id)).fetchone()
+
+        return None if found is None else json.loads(found[0])
+
+    def apply_edit(self, table, row_id, fields):
+        """ updates a mirrored row with an edit which the server accepted """
+        row = self.row(table, row_id)
+
+        if row is None:
+            return
+
+        row.update(fields)
+
+        with self.lock:
+            if self.db is None:
+                return
+
+            with self.db:
+                self.db.execute("REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", \
+                        row_values(table, row))
+
+    def remove_row(self, table, row_id):
+        """ forgets a row which was deleted on the server """
+        with self.lock:
+            if self.db is None:
+                return
+
+            with self.db:
+                self.db.execute("DELETE FROM rows WHERE tbl = ? AND id = ?", (table, row_id))
+
+    def journal(self, table, row_id, data, fields):
+        """
+        records an edit to be sent when the server can be reached again;
+        returns its sequence number
+        """
+        base = self.row(table, row_id)
+
+        with self.lock:
+            if self.db is None:
+                return None
+
+            with self.db:
+                cursor = self.db.execute( \
+                        "INSERT INTO journal (tbl, id, data, fields, base, created) " \
+                        "VALUES (?, ?, ?, ?, ?, ?)", \
+                        (table, row_id, json.dumps(data), json.dumps(fields), \
+                        None if base is None else json.dumps(base), time.time()))
+
+        return cursor.lastrowid
+
+    def journal_entries(self):
+        with self.lock:
+            if self.db is None:
+                return []
+
+            return [
+                {
+                    'seq': seq, 'table': table, 'id': row_id,
+                    'data': json.loads(data), 'fields': json.loads(fields),
+                    'base': None if base is None else json.loads(base)
+                }
+                for (seq, table, row_id, data, fields, base) in self.db.execute( \
+                        "SELECT seq, tbl, id, data, fields, base FROM journal ORDER BY seq")
+            ]
+
+    def journal_remove(self, seqs):
+        with self.lock:
+            if self.db is None:
+                return
+
+            with self.db:
+                self.db.executemany("DELETE FROM journal WHERE seq = ?", [(seq,) for seq in seqs])
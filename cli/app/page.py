@@ -2,31 +2,105 @@
 Displays interactive data on screen
 """
 
+import zlib
+import pickle
+
 from app.api import BudgetClientAPIError
+from app.compositor import refresh
 
 class Page(object):
     def __init__(self, win, api, set_statusbar=None):
         self.win = win
         self.api = api
 
-        self.statusbar = []
+        if not hasattr(self, 'statusbar'):
+            self.statusbar = []
         self.set_statusbar = set_statusbar
 
         self.nav_active = False
 
+        # whether this is the page currently on screen
+        self.visible = False
+
         self.dim = win.getmaxyx()
 
-        self.data = self.try_get_data()
+        # subwindows are created on the ui thread, the first time the page is shown,
+        # so that page objects can be built in the background
+        self.attached = False
 
-        self.try_draw()
+        self.error = None
+
+        # what's kept of the page's data while it's evicted to save memory
+        self.snapshot = None
+
+        # goes up whenever the page's data changes, so its memory use is only measured then
+        self.revision = 0
+
+        self.data = self.measure('get', self.try_get_data)
+
+    def attach(self):
+        """ create any subwindows needed by the page """
+        self.attached = True
 
     def switch_to(self):
-        self.win.clear()
+        self.restore()
+
+        if not self.attached:
+            self.attach()
+
+        self.visible = True
+
+        self.win.erase()
         self.try_draw()
-        self.win.refresh()
+        refresh(self.win)
 
         self.set_statusbar(self.statusbar)
 
+    def hide(self):
+        """ called when another page is switched to """
+        self.visible = False
+
+    def snapshot_state(self):
+        """ returns what's needed to restore the page after it's evicted (None if it can't be) """
+        return None
+
+    def restore_state(self, state):
+        pass
+
+    def release(self):
+        """ drops the data of an evicted page, and its subwindows """
+        self.attached = False
+
+    def evict(self):
+        """ swaps the page's data for a compressed snapshot; returns whether it was evicted """
+        if self.visible or self.snapshot is not None:
+            return False
+
+        state = self.snapshot_state()
+
+        if state is None:
+            return False
+
+        self.snapshot = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL), 1)
+        self.release()
+
+        return True
+
+    def restore(self):
+        """ builds the page again from its snapshot, if it was evicted """
+        if self.snapshot is None:
+            return
+
+        state = pickle.loads(zlib.decompress(self.snapshot))
+        self.snapshot = None
+
+        self.measure('restore', lambda: self.restore_state(state))
+        self.changed()
+
+    def changed(self):
+        """ called when the page's data is loaded or changes """
+        self.revision += 1
+
     def get_data(self):
         pass
 
@@ -34,7 +108,7 @@ class Page(object):
         try:
             return self.get_data()
         except BudgetClientAPIError as code:
-            self.win.addstr(0, 0, "API error: {}".format(code))
+            self.error = "API error: {}".format(code)
             return None
 
     def draw(self):
@@ -42,9 +116,17 @@ class Page(object):
 
     def try_draw(self):
         if self.data is None:
+            if self.error is not None:
+                self.win.addstr(0, 0, self.error)
+
             return
 
-        self.draw()
+        self.measure('draw', self.draw)
+
+    def measure(self, phase, func):
+        """ calls func, recording how long it took as a metric of this page """
+        with self.api.metrics.timer('page.' + phase, page=type(self).__name__):
+            return func()
 
     def nav(self, d_x, d_y):
         pass
@@ -54,6 +136,9 @@ class Page(object):
         self.nav(0, 0)
         return True
 
+    def captures_input(self):
+        """ whether the page wants every key press (e.g. while typing) """
+        return False
+
     def key_input(self, key):
         pass
-
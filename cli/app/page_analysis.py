@@ -0,0 +1,298 @@
+"""
+Displays spending by table, category, shop etc. per week, month or year, with drill-down
+"""
+
+import curses
+
+from app.const import NC_COLOR_TAB, NC_COLOR_TAB_SEL, \
+        KEY_PIVOT_DIMENSION, KEY_PIVOT_PERIOD, KEY_REFRESH, \
+        KEYCODE_NEWLINE, KEYCODE_RETURN, KEYCODE_ESCAPE, KEYCODES_BACKSPACE
+from app.methods import format_currency, ellipsis, alignr
+from app.compositor import refresh
+from app.store import ListStore
+from app.pivot import PivotTable, PERIODS, period_label
+from app.page_list import CATEGORY_COLUMNS
+from app.page import Page
+
+# the tables which are spending
+SPENDING_TABLES = ['bills', 'food', 'general', 'holiday', 'social']
+
+# what spending can be grouped by besides its table, and the store column of each table
+DIMENSIONS = {
+    'category': {'food': 'category', 'general': 'category'},
+    'shop': {'food': 'shop', 'general': 'shop', 'holiday': 'shop', 'social': 'shop'},
+    'holiday': {'holiday': 'category'},
+    'society': {'social': 'category'}
+}
+
+DIMENSION_ORDER = ['table', 'category', 'shop', 'holiday', 'society']
+
+# widths of the name, period and total columns
+COL_NAME = 20
+COL_PERIOD = 11
+COL_TOTAL = 12
+
+def store_columns(table):
+    """ the text columns kept of a table, and their api keys """
+    if table not in CATEGORY_COLUMNS:
+        return {}
+
+    return {'category': CATEGORY_COLUMNS[table][1], 'shop': 's'}
+
+class PageAnalysis(Page):
+    """ pivots the list tables, which are loaded into a PivotTable once """
+    def __init__(self, win, api, set_statusbar):
+        self.statusbar = [
+            [KEY_PIVOT_DIMENSION, "dimension"],
+            [KEY_PIVOT_PERIOD, "period"],
+            [KEY_REFRESH, "refresh"]
+        ]
+
+        self.colors = {
+            'item': curses.color_pair(NC_COLOR_TAB[0]),
+            'sel': curses.color_pair(NC_COLOR_TAB_SEL[0])
+        }
+
+        self.pivot = {
+            'dimension': 'table',
+            'period': 'month',
+            'filters': [], # the (dimension, code) of each group drilled down into
+            'selected': 0,
+            'scroll': 0 # number of periods scrolled back from the latest
+        }
+
+        # whether the data came from the local mirror, and needs refreshing
+        self.stale = False
+
+        super().__init__(win, api, set_statusbar)
+
+        self.table = self.measure('calculate', self.calculate_data)
+
+        if self.stale:
+            self.api.run_async(self.fetch_data, callback=self.refreshed)
+
+    def get_data(self):
+        # show the local copies straight away, like the other pages
+        mirrored = {table: self.api.req_local(['data', table]) for table in SPENDING_TABLES}
+
+        if all(res is not None for res in mirrored.values()):
+            self.stale = True
+
+            return {table: res['data']['data'] for (table, res) in mirrored.items()}
+
+        return self.fetch_data()
+
+    def fetch_data(self):
+        return {table: self.api.req(['data', table])['data']['data'] for table in SPENDING_TABLES}
+
+    def calculate_data(self):
+        if self.data is None:
+            return None
+
+        # the stores are our copy of the tables from here on, so the api rows can be dropped
+        return PivotTable({
+            table: ListStore.from_rows(self.data.pop(table), store_columns(table))
+            for table in SPENDING_TABLES
+        }, DIMENSIONS)
+
+    def snapshot_state(self):
+        if self.table is None:
+            return None # there's nothing to keep
+
+        # the pivots are quick to work out again
+        self.table.cache = {}
+
+        return self.table
+
+    def restore_state(self, state):
+        self.table = state
+
+    def release(self):
+        self.table = None
+
+        super().release()
+
+    def refreshed(self, res, err):
+        if err is not None or res is None:
+            return
+
+        self.restore()
+
+        # the groups' codes can change, so what's been drilled down into is kept by name
+        filters = [(dimension, self.table.name(dimension, code)) \
+                for (dimension, code) in self.pivot['filters']] if self.table is not None else []
+
+        self.data = res
+        self.table = self.measure('calculate', self.calculate_data)
+        self.changed()
+
+        self.pivot['filters'] = []
+        for (dimension, name) in filters:
+            if name not in self.table.dimensions[dimension].index:
+                break
+
+            self.pivot['filters'].append((dimension, self.table.dimensions[dimension].index[name]))
+
+        self.pivot['selected'] = max(0, min(len(self.result()['groups']) - 1, \
+                self.pivot['selected']))
+
+        if self.visible:
+            self.redraw()
+
+    def result(self):
+        return self.table.pivot(self.pivot['dimension'], self.pivot['period'], \
+                self.pivot['filters'])
+
+    def title(self):
+        text = "Spending by {} per {}".format(self.pivot['dimension'], self.pivot['period'])
+
+        if len(self.pivot['filters']) > 0:
+            text += " in " + ' > '.join([
+                "{}: {}".format(dimension, self.table.name(dimension, code))
+                for (dimension, code) in self.pivot['filters']
+            ])
+
+        return text
+
+    def draw(self):
+        result = self.result()
+
+        num_periods = result['totals'].shape[1]
+        num_shown = min(num_periods, max(1, (self.dim[1] - COL_NAME - COL_TOTAL) // COL_PERIOD))
+
+        self.pivot['scroll'] = max(0, min(num_periods - num_shown, self.pivot['scroll']))
+
+        periods = range(num_periods - self.pivot['scroll'] - num_shown, \
+                num_periods - self.pivot['scroll'])
+
+        self.win.addstr(0, 0, ellipsis(self.title(), self.dim[1] - 1), \
+                self.colors['item'] | curses.A_BOLD)
+
+        # head
+        col = 0
+        self.win.addstr(1, col, self.pivot['dimension'].capitalize(), self.colors['item'])
+        col += COL_NAME
+
+        for period in periods:
+            self.win.addstr(1, col, alignr(COL_PERIOD - 1, period_label( \
+                    self.pivot['period'], result['first'] + period)), self.colors['item'])
+            col += COL_PERIOD
+
+        self.win.addstr(1, col, alignr(COL_TOTAL - 1, "Total"), self.colors['item'])
+
+        if len(result['groups']) == 0:
+            self.win.addstr(2, 0, "No spending", self.colors['item'])
+            return
+
+        # body
+        max_display = self.dim[0] - 2
+        offset = max(0, min(len(result['groups']) - max_display, self.pivot['selected'] - 2))
+
+        for i in range(min(max_display, len(result['groups']) - offset)):
+            j = i + offset
+
+            color = self.colors['sel'] if self.nav_active and j == self.pivot['selected'] \
+                    else self.colors['item']
+
+            self.win.addstr(i + 2, 0, ' ' * (self.dim[1] - 1), color)
+
+            col = 0
+            self.win.addstr(i + 2, col, ellipsis(result['names'][j], COL_NAME - 1), color)
+            col += COL_NAME
+
+            for period in periods:
+                self.win.addstr(i + 2, col, format_currency( \
+                        int(result['totals'][j, period]), COL_PERIOD - 1), color)
+                col += COL_PERIOD
+
+            self.win.addstr(i + 2, col, format_currency(int(result['sums'][j]), COL_TOTAL - 1), \
+                    color | curses.A_BOLD)
+
+    def redraw(self):
+        self.win.erase()
+        self.try_draw()
+        refresh(self.win)
+
+    def dimensions(self):
+        """ the dimensions which haven't been drilled down into """
+        filtered = [dimension for (dimension, _) in self.pivot['filters']]
+
+        return [dimension for dimension in DIMENSION_ORDER if dimension not in filtered]
+
+    def next_dimension(self):
+        dimensions = self.dimensions()
+
+        self.pivot['dimension'] = dimensions[ \
+                (dimensions.index(self.pivot['dimension']) + 1) % len(dimensions)]
+        self.pivot['selected'] = 0
+
+    def drill_down(self):
+        """ shows the selected group, by the next dimension which it has any spending in """
+        result = self.result()
+
+        if len(result['groups']) == 0:
+            return
+
+        self.pivot['filters'].append( \
+                (self.pivot['dimension'], int(result['groups'][self.pivot['selected']])))
+
+        for dimension in self.dimensions():
+            if len(self.table.pivot(dimension, self.pivot['period'], \
+                    self.pivot['filters'])['groups']) > 0:
+                self.pivot['dimension'] = dimension
+                self.pivot['selected'] = 0
+                return
+
+        # there's nothing to break it down by
+        self.pivot['filters'].pop()
+
+    def drill_up(self):
+        if len(self.pivot['filters']) == 0:
+            return
+
+        self.pivot['dimension'], code = self.pivot['filters'].pop()
+
+        groups = self.result()['groups'].tolist()
+
+        self.pivot['selected'] = groups.index(code) if code in groups else 0
+
+    def nav(self, d_x, d_y):
+        if not self.nav_active or self.table is None:
+            return
+
+        self.pivot['selected'] = max(0, min(len(self.result()['groups']) - 1, \
+                self.pivot['selected'] + d_y))
+
+        # right goes forward in time
+        self.pivot['scroll'] = max(0, self.pivot['scroll'] - d_x)
+
+        self.redraw()
+
+    def key_input(self, key):
+        if self.table is None:
+            return True
+
+        if key == ord(KEY_PIVOT_DIMENSION):
+            self.next_dimension()
+
+        elif key == ord(KEY_PIVOT_PERIOD):
+            self.pivot['period'] = PERIODS[(PERIODS.index(self.pivot['period']) + 1) \
+                    % len(PERIODS)]
+            self.pivot['scroll'] = 0
+
+        elif key == ord(KEY_REFRESH):
+            self.api.run_async(self.fetch_data, callback=self.refreshed)
+            return True
+
+        elif self.nav_active and key in [KEYCODE_NEWLINE, KEYCODE_RETURN]:
+            self.drill_down()
+
+        elif self.nav_active and (key == KEYCODE_ESCAPE or key in KEYCODES_BACKSPACE):
+            self.drill_up()
+
+        else:
+            return True
+
+        self.redraw()
+
+        return True
@@ -3,29 +3,82 @@ Classes of pages, all of which inherit from PageList
 """
 import curses
 from curses.textpad import rectangle
+import numpy as np
 from numpy import floor, ceil
 
 from app.const import NC_COLOR_TAB, NC_COLOR_TAB_SEL, \
         NC_COLOR_UP, NC_COLOR_UP_SEL, NC_COLOR_DOWN, NC_COLOR_DOWN_SEL, \
-        KEY_EDIT, KEY_GRAPH, KEYCODE_NEWLINE, KEYCODE_RETURN, \
+        KEY_EDIT, KEY_REFRESH, KEY_SEARCH, KEY_SORT, KEY_SORT_REVERSE, KEY_GROUP, \
+        KEY_GRAPH, KEY_GRAPH_RANGE, KEY_GRAPH_SAMPLING, \
+        GRAPH_RANGES, GRAPH_SAMPLING, KEYCODE_NEWLINE, KEYCODE_RETURN, \
+        KEYCODE_ESCAPE, KEYCODES_BACKSPACE, \
         CORNER_TOP_LEFT, CORNER_TOP_RIGHT, CORNER_BOTTOM_RIGHT, CORNER_BOTTOM_LEFT, \
-        LINE_HORIZONTAL, LINE_VERTICAL
+        LINE_HORIZONTAL, LINE_VERTICAL, SHADE_LIGHT, SYMBOL_SORT_ASC, SYMBOL_SORT_DESC
 
+from app.compositor import refresh
 from app.methods import window_fill_color, \
         serialise, deserialise, \
         format_currency, get_tick_size, \
-        alignr, alignc
-
+        alignr, alignc, ellipsis
+
+from app.sync import apply_delta
+from app.viewport import ListViewport
+from app.store import ListStore, Interned
+from app.sorting import ListOrder, rank_values
+from app.search import SearchIndex
+from app.stream import StreamDecoder
+from app.portfolio import PortfolioHistory, decode_fund
+from app.downsample import lttb, minmax
 from app.form import FormEdit
 from app.page import Page
 
+# heading and api key of the category column of each table which has shops
+CATEGORY_COLUMNS = {
+    'food': ["Category", 'k'],
+    'general': ["Category", 'k'],
+    'holiday': ["Holiday", 'h'],
+    'social': ["Society", 'y']
+}
+
+def list_columns(table):
+    """ the columns (heading, width, field, api key) of a list table """
+    if table not in CATEGORY_COLUMNS:
+        return [
+            ["Date", 9, 'date', 'd'],
+            ["Item", 30, 'item', 'i'],
+            ["Cost", 10, 'cost', 'c']
+        ]
+
+    return [
+        ["Date", 9, 'date', 'd'],
+        ["Item", 25, 'item', 'i'],
+        [CATEGORY_COLUMNS[table][0], 20, 'category', CATEGORY_COLUMNS[table][1]],
+        ["Cost", 10, 'cost', 'c'],
+        ["Shop", 20, 'shop', 's']
+    ]
+
+def fund_columns():
+    """
+    the columns shown, and the columns edited, of the funds table; the units come from
+    the fund's transactions, so they aren't edited here
+    """
+    view_cols = [
+        ["Date", 9, 'date', 'd'],
+        ["Item", 30, 'item', 'i'],
+        ["Cost", 10, 'cost', 'c'],
+        ["Value", 10, 'value', None]
+    ]
+
+    return view_cols, view_cols[:3]
+
 class PageList(Page):
     """ Displays a page of listed data (e.g. food, general, funds) """
     def __init__(self, win, api, set_statusbar, data_name):
         self.data_name = data_name
 
         self.statusbar = [
-            [KEY_EDIT, "edit"]
+            [KEY_EDIT, "edit"],
+            [KEY_REFRESH, "refresh"]
         ]
 
         self.colors = {
@@ -35,10 +88,13 @@ class PageList(Page):
 
         self.list = {
             'list': [],
+            'view': None, # indices of the rows to show, if not all of them
             'selected': 0,
-            'win': win.derwin(0, 0)
+            'win': None
         }
 
+        self.viewport = ListViewport()
+
         self.form = {
             'form': None,
             'open': False
@@ -47,18 +103,278 @@ class PageList(Page):
         if not hasattr(self, 'cols'):
             self.cols = {'view': [], 'edit': []}
 
+        self.sorting = {
+            'column': None, # None means the order the api sends (newest first)
+            'reverse': False,
+            'group': None,
+            'groups': None, # subtotals of the groups being shown
+            'order': ListOrder(lambda: len(self.list['list']), \
+                    self.column_values, self.column_codes)
+        }
+
+        self.statusbar += [
+            [KEY_SORT, "sort"],
+            [KEY_SORT_REVERSE, "reverse"]
+        ]
+
+        if len(self.group_columns()) > 0:
+            self.statusbar.append([KEY_GROUP, "group"])
+
+        # whether the data came from the local mirror, and needs refreshing
+        self.stale = False
+
         super().__init__(win, api, set_statusbar)
 
-        self.list['list'] = self.calculate_data()
+        self.list['list'] = self.measure('calculate', self.calculate_data)
+
+        self.api.events.subscribe('row_replaced', self.row_replaced)
+
+        if self.stale:
+            self.refresh()
+
+    def attach(self):
+        self.list['win'] = self.win.derwin(0, 0)
+
+        super().attach()
+
+    def hide(self):
+        # another page will draw over the list
+        self.viewport.drawn = False
+
+        super().hide()
+
+    def snapshot_state(self):
+        if self.form['open']:
+            return None
+
+        return self.data
+
+    def restore_state(self, state):
+        self.data = state
+        self.recalculate()
+
+    def release(self):
+        self.data = None
+
+        self.list.update({'list': [], 'view': None, 'win': None})
+        self.viewport.invalidate()
+        self.sorting['order'].reset()
+
+        super().release()
+
+    def get_query(self):
+        return None
 
     def get_data(self):
-        res = self.api.req(['data', self.data_name])
+        # show the local copy of the table straight away, and bring it up to date afterwards
+        res = self.api.req_local(['data', self.data_name], self.get_query())
+
+        if res is not None:
+            self.stale = True
+            self.api.sync.received(self.data_name, res['data'])
+
+            return res['data']
+
+        res = self.fetch(self.api.sync.query(self.data_name, full=True, query=self.get_query()))
+
+        self.api.sync.received(self.data_name, res['data'])
 
         return res['data']
 
+    def fetch(self, query):
+        """ downloads the whole table """
+        return self.api.req(['data', self.data_name], query=query)
+
+    def refresh(self):
+        """ fetches rows which have changed since we loaded the table """
+        self.api.req_async(['data', self.data_name], \
+                query=self.api.sync.query(self.data_name, query=self.get_query()), \
+                callback=self.refreshed)
+
+    def refreshed(self, res, err):
+        if err is not None:
+            return
+
+        self.restore()
+
+        if self.api.sync.received(self.data_name, res['data']) and self.data is not None:
+            self.merge_delta(res['data'])
+        else:
+            self.data = res['data']
+            self.recalculate()
+
+        self.list['selected'] = max(0, min(self.num_rows() - 1, self.list['selected']))
+
+        if self.visible and not self.form['open']:
+            self.measure('draw', self.draw)
+            refresh(self.list['win'])
+
     def calculate_data(self):
         pass
 
+    def recalculate(self):
+        self.list['list'] = self.measure('calculate', self.calculate_data)
+        self.update_view()
+
+    def num_rows(self):
+        """ number of rows being shown """
+        if self.list['view'] is None:
+            return len(self.list['list'])
+
+        return len(self.list['view'])
+
+    def row_index(self, j):
+        """ index into the list of the j-th row being shown """
+        if self.list['view'] is None:
+            return j
+
+        return int(self.list['view'][j])
+
+    def sort_columns(self):
+        """ the columns which the list can be sorted by """
+        return [index for (_, _, index, _) in self.cols['view']]
+
+    def group_columns(self):
+        """ the columns which the list can be grouped by """
+        return [index for (_, _, index, _) in self.cols['view'] if index in ['category', 'shop']]
+
+    def column_values(self, column):
+        """ returns an array to sort the list by a column """
+        if column == 'date':
+            return np.array([year * 10000 + month * 100 + date \
+                    for (year, month, date) in (row['date'] for row in self.list['list'])], \
+                    dtype=np.int64)
+
+        values = [row[column] for row in self.list['list']]
+
+        if len(values) > 0 and isinstance(values[0], str):
+            return np.array([value.lower() for value in values])
+
+        return np.array(values)
+
+    def column_codes(self, column):
+        """ returns the distinct values of a text column, and the code of each row """
+        codes = Interned.from_list([row[column] for row in self.list['list']])
+
+        return codes.values, codes.codes
+
+    def filter_rows(self):
+        """ the indices of the rows to show (e.g. search results), or None for all of them """
+        return None
+
+    def show_rows(self):
+        """ sets the view from the filter, sort order and groups """
+        rows = self.filter_rows()
+
+        if self.sorting['column'] is None and not self.sorting['reverse'] \
+                and self.sorting['group'] is None:
+            self.sorting['groups'] = None
+            self.set_view(rows)
+
+            return
+
+        view, self.sorting['groups'] = self.sorting['order'].view(self.sorting['column'], \
+                self.sorting['reverse'], self.sorting['group'], rows)
+
+        self.set_view(view)
+
+    def set_view(self, view):
+        self.list['view'] = view
+        self.list['selected'] = max(0, min(self.num_rows() - 1, self.list['selected']))
+
+        self.viewport.invalidate()
+
+    def update_view(self):
+        """ called when the list changes, to work out which rows to show """
+        self.sorting['order'].reset()
+        self.show_rows()
+        self.changed()
+
+    def merge_delta(self, data):
+        """ merges rows which changed on the server into our copy of the table """
+        self.data = apply_delta(self.data, data)
+        self.recalculate()
+
+    def find_row(self, row_id):
+        """ returns the index of the row with the given id, or None """
+        for (j, item) in enumerate(self.list['list']):
+            if item['id'] == row_id:
+                return j
+
+        return None
+
+    def rollback_edit(self, row_id, values):
+        """ undoes an edit which the server didn't accept """
+        self.restore()
+
+        j = self.find_row(row_id)
+
+        if j is None:
+            return
+
+        self.edit_row(j, values)
+
+        if self.visible and not self.form['open']:
+            self.draw_list()
+            refresh(self.list['win'])
+
+    def row_replaced(self, table, row_id, row):
+        """
+        shows the server's version of a row which an edit made offline conflicted with
+        (row is None if it was deleted on the server)
+        """
+        if table != self.data_name:
+            return
+
+        self.restore()
+
+        j = None if self.data is None else self.find_row(row_id)
+
+        if j is None:
+            return
+
+        if row is None:
+            before = self.row_cost(j)
+
+            self.merge_delta({'data': [], 'deleted': [row_id]})
+
+            self.api.events.publish('cost_changed', table=self.data_name, \
+                    before=before, after=(before[0], 0))
+
+            self.list['selected'] = max(0, min(self.num_rows() - 1, self.list['selected']))
+        else:
+            current = self.list['list'][j]
+
+            self.edit_row(j, [
+                row.get(key, current[index]) for (_, _, index, key) in self.cols['edit']
+            ])
+
+        if self.visible and not self.form['open']:
+            self.draw_list()
+            refresh(self.list['win'])
+
+    def row_cost(self, j):
+        """ the date and cost of row j """
+        row = self.list['list'][j]
+
+        return row['date'], row['cost']
+
+    def edit_row(self, j, values):
+        """ applies an edit, and tells other pages (e.g. the overview) how the cost moved """
+        before = self.row_cost(j)
+
+        self.apply_edit(j, values)
+
+        self.api.events.publish('cost_changed', table=self.data_name, \
+                before=before, after=self.row_cost(j))
+
+    def apply_edit(self, j, values):
+        """ updates row j with values (in the order of the edit columns) """
+        for (i, value) in enumerate(values):
+            self.data['data'][j][self.cols['edit'][i][3]] = value
+
+        self.recalculate()
+
     def draw(self):
         self.draw_list()
 
@@ -71,30 +387,76 @@ class PageList(Page):
 
         self.list['win'].addstr(i + 1, 0, ' ' * self.dim[1], color)
 
-        if len(self.list['list']) <= j:
+        if self.num_rows() <= j:
             return False
 
+        if self.row_index(j) < 0:
+            color |= curses.A_BOLD
+
         col = 0
-        for (_, width, index, _) in self.cols['view']:
-            self.list['win'].addstr(i + 1, col, \
-                    deserialise(self.list['list'][j][index], index, width - 1), color)
+        for (text, (_, width, _, _)) in zip(self.viewport.cells(j, self.format_list_row), \
+                self.cols['view']):
+            self.list['win'].addstr(i + 1, col, text, color)
 
             col += width
 
         return j, col, selected
 
+    def format_list_row(self, j):
+        if self.row_index(j) < 0:
+            return self.format_group_row(-1 - self.row_index(j))
+
+        row = self.list['list'][self.row_index(j)]
+
+        return [
+            deserialise(row[index], index, width - 1)
+            for (_, width, index, _) in self.cols['view']
+        ]
+
+    def format_group_row(self, group):
+        """ the subtotal row shown above each group """
+        groups = self.sorting['groups']
+
+        name = self.list['list'][int(groups['first'][group])][groups['column']]
+
+        cells = []
+        for (_, width, index, _) in self.cols['view']:
+            if index == groups['column']:
+                cells.append(ellipsis(name, width - 1))
+            elif index == 'cost':
+                cells.append(deserialise(int(groups['cost'][group]), index, width - 1))
+            elif index == 'item':
+                cells.append(ellipsis("({} items)".format(groups['count'][group]), width - 1))
+            else:
+                cells.append('')
+
+        return cells
+
+    def list_display(self):
+        """ returns the number of rows which fit on screen, and the first one to show """
+        max_display = self.dim[0] - 2
+        num_display = min(max_display, self.num_rows())
+
+        offset = 0 \
+                if self.num_rows() <= num_display else \
+                max(0, min(self.num_rows() - max_display, \
+                self.list['selected'] - 2)) # for scrolling
+
+        return num_display, offset
+
     def draw_list(self):
-        self.list['win'].clear()
+        self.list['win'].erase()
 
         # draw list of items
-        max_display = self.dim[0] - 2
-        num_display = min(max_display, len(self.data['data']))
+        num_display, offset = self.list_display()
 
         # head
         index_alignr = ['cost', 'value']
 
         col = 0
         for (name, width, index, _) in self.cols['view']:
+            name = self.sort_heading(name, index)
+
             if index in index_alignr:
                 name = alignr(width - 1, name)
 
@@ -102,50 +464,74 @@ class PageList(Page):
             col += width
 
         # body
-        offset = 0 \
-                if len(self.list['list']) <= num_display else \
-                max(0, min(len(self.list['list']) - max_display, \
-                self.list['selected'] - 2)) # for scrolling
-
         for i in range(num_display):
             self.draw_list_row(i, offset)
 
+        self.viewport.set_drawn(offset, self.list['selected'] if self.nav_active else None)
+
+    def sort_heading(self, name, index):
+        """ marks the heading of the column the list is sorted by """
+        if index != self.sorting['column']:
+            return name
+
+        return name + ' ' + (SYMBOL_SORT_DESC if self.sorting['reverse'] else SYMBOL_SORT_ASC)
+
+    def update_list(self):
+        """ redraws only the parts of the list which changed since it was last drawn """
+        num_display, offset = self.list_display()
+
+        if not self.viewport.update(self.list['win'], offset, \
+                self.list['selected'] if self.nav_active else None, \
+                num_display, self.draw_list_row):
+            self.draw_list()
+
     def edit_form_finished(self, data=None):
         """ update data """
         if self.form['form'].updated:
             data = self.form['form'].win['input_values']
 
-            j = self.list['selected']
+            j = self.row_index(self.list['selected'])
+            row = self.list['list'][j]
+
+            original = [row[index] for (_, _, index, _) in self.cols['edit']]
 
-            for i, item in enumerate(data):
-                self.data['data'][j][self.cols['edit'][i][3]] = serialise(item, \
-                        self.cols['edit'][i][2])
+            # show the edit straight away; it's sent to the server in the background
+            self.edit_row(j, [
+                serialise(item, self.cols['edit'][i][2])
+                for (i, item) in enumerate(data)
+            ])
 
-            self.list['list'] = self.calculate_data()
+            row_id = row['id']
+            self.api.edits.push(self.data_name, row_id, self.form['form'].submitted, \
+                    lambda: self.rollback_edit(row_id, original), {
+                        self.cols['edit'][i][3]: serialise(item, self.cols['edit'][i][2])
+                        for (i, item) in enumerate(data)
+                    })
 
-        self.form['form'].win['form'].clear()
-        self.form['form'].win['form'].refresh()
+        self.form['form'].win['form'].erase()
+        refresh(self.form['form'].win['form'])
 
         del self.form['form']
 
         self.draw_list()
-        self.list['win'].refresh()
+        refresh(self.list['win'])
 
         self.form['open'] = False
 
     def nav(self, d_x, d_y):
         if not self.form['open']:
-            self.list['selected'] = min(len(self.list['list']) - 1, max(0, \
+            self.list['selected'] = min(self.num_rows() - 1, max(0, \
                     self.list['selected'] + d_y))
 
-            self.draw()
-            self.list['win'].refresh()
+            self.update_list()
+            refresh(self.list['win'])
 
     def key_input(self, c):
         if self.form['open']:
             return self.form['form'].key_input(c)
 
-        elif c == ord(KEY_EDIT) and self.nav_active:
+        elif c == ord(KEY_EDIT) and self.nav_active and self.num_rows() > 0 \
+                and self.row_index(self.list['selected']) >= 0:
             callback = {
                 'api': self.api,
                 'win': self.win,
@@ -154,51 +540,223 @@ class PageList(Page):
             }
 
             self.form['form'] = FormEdit(callback, \
-                    self.list['list'][self.list['selected']], self.cols['edit'], self.data_name)
+                    self.list['list'][self.row_index(self.list['selected'])], \
+                    self.cols['edit'], self.data_name)
 
             self.form['open'] = True
 
+        elif c == ord(KEY_REFRESH):
+            self.refresh()
+
+        elif c in [ord(KEY_SORT), ord(KEY_SORT_REVERSE), ord(KEY_GROUP)]:
+            self.sort_key(c)
+
         return True
 
-class PageListBasic(PageList):
+    def sort_key(self, c):
+        if c == ord(KEY_SORT):
+            columns = [None] + self.sort_columns()
+            self.sorting['column'] = columns[ \
+                    (columns.index(self.sorting['column']) + 1) % len(columns)]
+
+        elif c == ord(KEY_SORT_REVERSE):
+            self.sorting['reverse'] = not self.sorting['reverse']
+
+        elif c == ord(KEY_GROUP):
+            groups = [None] + self.group_columns()
+            self.sorting['group'] = groups[(groups.index(self.sorting['group']) + 1) % len(groups)]
+
+        self.show_rows()
+
+        if self.visible:
+            self.draw_list()
+            refresh(self.list['win'])
+
+class PageListStore(PageList):
+    """ list page which holds its table in a columnar ListStore, instead of api rows """
+    def __init__(self, win, api, set_statusbar, data_name, store_columns):
+        # text columns of the store, and their api keys
+        self.store_columns = store_columns
+
+        self.search = {
+            'active': False,
+            'index': None, # built the first time a search is made after loading data
+            'results': [] # narrowed down once for each character of the query
+        }
+
+        super().__init__(win, api, set_statusbar, data_name)
+
+        self.statusbar.append([KEY_SEARCH, "search"])
+
+    def calculate_data(self):
+        if self.data is None:
+            # (the error is shown instead)
+            return ListStore.from_rows([], self.store_columns)
+
+        # the store is our copy of the table from here on, so the api rows can be dropped
+        return ListStore.from_rows(self.data.pop('data'), self.store_columns)
+
+    def snapshot_state(self):
+        if self.form['open'] or self.data is None:
+            return None
+
+        # the rows are only kept in the store
+        return self.data, self.list['list']
+
+    def restore_state(self, state):
+        self.data, self.list['list'] = state
+        self.update_view()
+
+    def release(self):
+        self.search['index'] = None
+
+        super().release()
+
+    def merge_delta(self, data):
+        self.list['list'].merge(data['data'], data.get('deleted', []))
+
+        for key in data:
+            if key not in ['data', 'deleted', 'delta']:
+                self.data[key] = data[key]
+
+        self.update_view()
+
+    def find_row(self, row_id):
+        return self.list['list'].find(row_id)
+
+    def apply_edit(self, j, values):
+        for (i, value) in enumerate(values):
+            self.list['list'].set(j, self.cols['edit'][i][2], value)
+
+        self.update_view()
+
+    def update_view(self):
+        if self.search['index'] is not None:
+            if self.search['index'].store is self.list['list']:
+                self.search['index'].update()
+            else:
+                self.search['index'] = None
+
+        if len(self.search['results']) > 0:
+            # run the search again on the new data
+            self.search['results'] = self.run_search(self.search['results'][-1]['query'])
+
+        super().update_view()
+
+    def filter_rows(self):
+        if len(self.search['results']) == 0:
+            return None
+
+        return self.search['results'][-1]['rows']
+
+    def column_values(self, column):
+        store = self.list['list']
+
+        if column == 'date':
+            return store.dates
+
+        if column == 'cost':
+            return store.costs
+
+        return rank_values(store.text[column].values)[store.text[column].codes]
+
+    def column_codes(self, column):
+        return self.list['list'].text[column].values, self.list['list'].text[column].codes
+
+    def captures_input(self):
+        return self.search['active']
+
+    def run_search(self, query):
+        """ searches for each prefix of the query in turn, narrowing down each time """
+        if self.search['index'] is None:
+            self.search['index'] = SearchIndex(self.list['list'])
+
+        results = []
+        for i in range(len(query)):
+            results.append(self.search['index'].search(query[:i + 1], \
+                    results[-1] if len(results) > 0 else None))
+
+        return results
+
+    def search_key(self, c):
+        results = self.search['results']
+
+        if c == KEYCODE_ESCAPE:
+            # stop searching, and show everything
+            self.search['active'] = False
+            self.search['results'] = []
+
+        elif c == KEYCODE_NEWLINE or c == KEYCODE_RETURN:
+            # stop typing, but keep the results
+            self.search['active'] = False
+
+        elif c in KEYCODES_BACKSPACE:
+            self.search['results'] = results[:-1]
+
+        elif 32 <= c < 127:
+            query = (results[-1]['query'] if len(results) > 0 else '') + chr(c)
+
+            if self.search['index'] is None:
+                self.search['index'] = SearchIndex(self.list['list'])
+
+            self.search['results'] = results + [self.search['index'].search(query, \
+                    results[-1] if len(results) > 0 else None)]
+
+        self.show_rows()
+
+        self.draw_list()
+        refresh(self.list['win'])
+
+    def draw_search(self):
+        """ shows the search query on the bottom line of the list """
+        if not self.search['active'] and len(self.search['results']) == 0:
+            return
+
+        query = self.search['results'][-1]['query'] if len(self.search['results']) > 0 else ''
+
+        self.list['win'].move(self.dim[0] - 1, 0)
+        self.list['win'].clrtoeol()
+        self.list['win'].addstr(self.dim[0] - 1, 0, ellipsis("/{} ({} found)".format( \
+                query, self.num_rows()), self.dim[1] - 1), self.colors['item'] | curses.A_BOLD)
+
+    def draw_list(self):
+        super().draw_list()
+        self.draw_search()
+
+    def update_list(self):
+        super().update_list()
+        self.draw_search()
+
+    def key_input(self, c):
+        if self.search['active']:
+            self.search_key(c)
+            return False
+
+        if c == ord(KEY_SEARCH) and self.nav_active and not self.form['open']:
+            self.search['active'] = True
+            self.search_key(-1)
+            return False
+
+        return super().key_input(c)
+
+class PageListBasic(PageListStore):
     def __init__(self, win, api, set_statusbar, page_name):
-        view_cols = [
-            ["Date", 9, 'date', 'd'],
-            ["Item", 30, 'item', 'i'],
-            ["Cost", 10, 'cost', 'c']
-        ]
+        view_cols = list_columns(page_name)
 
         self.cols = {
             'view': view_cols,
             'edit': view_cols
         }
 
-        super().__init__(win, api, set_statusbar, page_name)
+        super().__init__(win, api, set_statusbar, page_name, {'item': 'i'})
 
-    def calculate_data(self):
-        return [{
-            'id':       item['I'],
-            'date':     item['d'],
-            'item':     item['i'],
-            'cost':     item['c']
-        } for item in self.data['data']]
-
-class PageListShop(PageList):
+class PageListShop(PageListStore):
     """ used for things like food, socials etc. """
 
-    def __init__(self, win, api, set_statusbar, page):
-        page_name = page[0]
-
-        col_category = page[1]
-        col_category_json = page[2]
+    def __init__(self, win, api, set_statusbar, page_name):
+        col_category_json = CATEGORY_COLUMNS[page_name][1]
 
-        view_cols = [
-            ["Date", 9, 'date', 'd'],
-            ["Item", 25, 'item', 'i'],
-            [col_category, 20, 'category', col_category_json],
-            ["Cost", 10, 'cost', 'c'],
-            ["Shop", 20, 'shop', 's']
-        ]
+        view_cols = list_columns(page_name)
 
         self.cols = {
             'view': view_cols,
@@ -207,40 +765,32 @@ class PageListShop(PageList):
 
         self.col_category_json = col_category_json
 
-        super().__init__(win, api, set_statusbar, page_name)
-
-    def calculate_data(self):
-        return [{
-            'id':       item['I'],
-            'date':     item['d'],
-            'item':     item['i'],
-            'category': item[self.col_category_json],
-            'cost':     item['c'],
-            'shop':     item['s']
-        } for item in self.data['data']]
+        super().__init__(win, api, set_statusbar, page_name, {
+            'item': 'i',
+            'category': col_category_json,
+            'shop': 's'
+        })
 
 class PageFunds(PageList):
     """ Page displaying funds (with graphs and stuff) """
 
     def __init__(self, win, api, set_statusbar):
-        view_cols = [
-            ["Date", 9, 'date', 'd'],
-            ["Item", 30, 'item', 'i'],
-            ["Cost", 10, 'cost', 'c'],
-            ["Value", 10, 'value', None]
-        ]
-
-        edit_cols = view_cols[:3] + ["Units", 10, 'units', 'u']
+        view_cols, edit_cols = fund_columns()
 
         self.cols = {
             'view': view_cols,
             'edit': edit_cols
         }
 
+        # built from the price history whenever the funds are (re)loaded
+        self.portfolio = None
+
         super().__init__(win, api, set_statusbar, 'funds')
 
         self.statusbar += [
-            [KEY_GRAPH, "graph"]
+            [KEY_GRAPH, "graph"],
+            [KEY_GRAPH_RANGE, "graph range"],
+            [KEY_GRAPH_SAMPLING, "graph sampling"]
         ]
 
         self.colors['up'] = curses.color_pair(NC_COLOR_UP[0])
@@ -252,18 +802,38 @@ class PageFunds(PageList):
         graph_w = self.dim[1] - 5
 
         self.graph = {
-            'win': self.win.derwin(graph_h, graph_w, 3, 2),
+            'win': None,
             'h': graph_h,
             'w': graph_w,
-            'active': False
+            'active': False,
+            'all': True,
+            'range': len(GRAPH_RANGES) - 1,
+            'sampling': 0
         }
 
-    def get_data(self):
-        res = self.api.req(['data', 'funds'], query={'history': 1})
+    def attach(self):
+        self.graph['win'] = self.win.derwin(self.graph['h'], self.graph['w'], 3, 2)
 
-        return res['data']
+        super().attach()
+
+    def release(self):
+        self.portfolio = None
+        self.graph['win'] = None
+
+        super().release()
+
+    def get_query(self):
+        return {'history': 1}
+
+    def fetch(self, query):
+        # the price histories make this response big, so decode it as it downloads
+        return self.api.req_decoded(['data', self.data_name], \
+                StreamDecoder(['data', 'data'], decode_fund), query)
 
     def calculate_data(self):
+        if self.data is None:
+            return []
+
         processed = []
 
         for item in self.data['data']:
@@ -283,16 +853,30 @@ class PageFunds(PageList):
                 'value': units * price
             })
 
+        if self.portfolio is None:
+            self.portfolio = PortfolioHistory(self.data['data'], self.data['cacheTimes'])
+
+        self.portfolio.set_units([item['units'] for item in processed])
+
         return processed
 
+    def refreshed(self, res, err):
+        self.restore()
+
+        if err is None:
+            # prices may have changed along with the funds
+            self.portfolio = None
+
+        super().refreshed(res, err)
+
     def draw_list_row(self, i, offset):
         list_row = super().draw_list_row(i, offset)
 
         if list_row is not False:
             j, col, selected = list_row
 
-            cost = int(self.list['list'][j]['cost'])
-            value = float(self.list['list'][j]['value'])
+            cost = int(self.list['list'][self.row_index(j)]['cost'])
+            value = float(self.list['list'][self.row_index(j)]['value'])
 
             gain = 100 * (value - cost) / cost if cost > 0 else 0
             sign = '-' if gain < 0 else '+'
@@ -304,40 +888,77 @@ class PageFunds(PageList):
 
             self.list['win'].addstr(i + 1, col, gain_text, color_gain)
 
+    def sort_columns(self):
+        return super().sort_columns() + ['gain']
+
+    def column_values(self, column):
+        if column != 'gain':
+            return super().column_values(column)
+
+        cost = np.array([row['cost'] for row in self.list['list']], dtype=float)
+        value = np.array([row['value'] for row in self.list['list']], dtype=float)
+
+        return np.divide(value - cost, cost, out=np.zeros(len(cost)), where=cost > 0)
+
     def draw_list(self):
         if hasattr(self, 'graph'):
             self.graph['active'] = False
 
         super().draw_list()
 
+        col = sum([width for (_, width, _, _) in self.cols['view']])
+        self.list['win'].addstr(0, col, self.sort_heading("Gain", 'gain'), \
+                self.colors['item'] | curses.A_BOLD)
+
     def show_graph(self, graph_all):
         """ fill the window and add a frame """
+        self.viewport.drawn = False
+
         window_fill_color(self.graph['win'], self.graph['h'] - 1, self.graph['w'] - 1, \
                 curses.color_pair(NC_COLOR_TAB[0]))
         rectangle(self.graph['win'], 0, 0, self.graph['h'] - 2, self.graph['w'] - 2)
 
+        self.graph['all'] = graph_all
+
         self.draw_graph(graph_all)
 
     def hide_graph(self):
-        self.graph['win'].clear()
-        self.graph['win'].refresh()
+        self.graph['win'].erase()
+        refresh(self.graph['win'])
 
         self.draw_list()
-        self.list['win'].refresh()
+        refresh(self.list['win'])
+
+    def sample_series(self, values, length):
+        """
+        fits values into the width of the graph; returns the series to draw, and the
+        (low, high) envelope of each point if it stands for more than one value
+        """
+        if len(values) <= length:
+            extra = length - len(values)
+
+            return np.concatenate([np.repeat(values[:1], extra), values]), None
+
+        if GRAPH_SAMPLING[self.graph['sampling']] == 'minmax':
+            last, low, high = minmax(values, length)
+
+            return last, (low, high)
+
+        return values[lttb(values, length)], None
+
+    def get_graph_data(self, graph_all, graph_w, history, series_length):
+        options = "{}, {}".format(GRAPH_RANGES[self.graph['range']][0], \
+                GRAPH_SAMPLING[self.graph['sampling']])
 
-    def get_graph_data(self, graph_all, graph_w, history, extra):
         if graph_all:
-            title = alignc(graph_w - 1, "Portfolio history")
+            title = alignc(graph_w - 1, "Portfolio history ({})".format(options))
 
-            series = [history[0][2]] * extra + [
-                history[i][2]
-                for i in range(len(history))
-            ]
+            series, envelope = self.sample_series(history['total'], series_length)
 
         else:
-            index = self.list['selected']
+            index = self.row_index(self.list['selected'])
 
-            fund_name = self.list['list'][self.list['selected']]['item']
+            fund_name = self.list['list'][index]['item']
 
             if index < 0:
                 # invalid fund
@@ -345,22 +966,19 @@ class PageFunds(PageList):
 
                 return False
             else:
-                title = alignc(graph_w - 1, "Fund: {}".format(fund_name))
+                title = alignc(graph_w - 1, "Fund: {} ({})".format(fund_name, options))
 
-                values = [item for item in history if item[1][index] > 0]
+                values = history['values'][:, index]
+                values = values[values > 0]
 
                 if len(values) == 0:
                     self.graph['win'].addstr(2, 1, "No data.")
 
                     return False
 
-                first_value = values[0][1][index] if len(values[0][1]) > index else 0
-                series = [first_value] * extra + [
-                    values[i][1][index] if len(values[i][1]) > index else 0
-                    for i in range(len(values))
-                ]
+                series, envelope = self.sample_series(values, series_length)
 
-        return title, series
+        return title, series, envelope
 
     def draw_graph_axis(self, graph_w, graph_range, series_height):
         num_ticks = 5
@@ -381,16 +999,29 @@ class PageFunds(PageList):
             self.graph['win'].addstr(val_y + 2, val_x, tick)
 
     def draw_graph_data(self, graph_data, graph):
-        title, series = graph_data
+        title, series, envelope = graph_data
 
         self.graph['win'].addstr(1, 1, title)
 
-        graph_range = [floor(float(min(series)) / 1000) * 1000, \
-                ceil(float(max(series)) / 1000) * 1000]
+        bounds = (series, series) if envelope is None else envelope
+
+        graph_range = [floor(float(bounds[0].min()) / 1000) * 1000, \
+                ceil(float(bounds[1].max()) / 1000) * 1000]
 
         last_yv = None
         series_height = graph['h'] - 3
 
+        if envelope is not None:
+            # shade the range of values behind each point
+            low_y = (series_height * (1 - (envelope[0] - graph_range[0]) / \
+                    (graph_range[1] - graph_range[0]))).astype(int)
+            high_y = (series_height * (1 - (envelope[1] - graph_range[0]) / \
+                    (graph_range[1] - graph_range[0]))).astype(int)
+
+            for i in range(min(len(series), graph['w'] - 2)):
+                for this_y in range(high_y[i], low_y[i] + 1):
+                    self.graph['win'].addstr(this_y + 2, i + 1, SHADE_LIGHT)
+
         # draw line
         for i in range(min(len(series), graph['w'] - 2)):
             val_y = int(series_height * (1 - (float(series[i] - graph_range[0]) / \
@@ -428,51 +1059,57 @@ class PageFunds(PageList):
     def draw_graph(self, graph_all):
         graph = {'h': self.graph['h'] - 2, 'w': self.graph['w'] - 2}
 
-        # fill out all the units values
-        history = {'full': [], 'value': [], 'cut': []}
-
-        history['full'] = [
-                [time, [
-                    [
-                        (fund['pr'][time_key - fund['prStartIndex']]
-                        if time_key - fund['prStartIndex'] < len(fund['pr']) and time_key - fund['prStartIndex'] >= 0
-                        else 0),
-                        self.list['list'][fund_key]['units']
-                    ]
-                    for (fund_key, fund) in enumerate(self.data['data'])
-                ]]
-                for (time_key, time) in enumerate(self.data['cacheTimes'])
-        ]
+        series_length = graph['w'] - 2
 
-        history['value'] = [[time, [fund[0] * fund[1] for fund in funds], \
-                sum([fund[0] * fund[1] for fund in funds])] \
-                for (time, funds) in history['full']]
+        history = None
 
-        series_length = graph['w'] - 2
-        history['cut'] = history['value'][-series_length:]
-        extra = max(0, series_length - len(history['cut']))
+        if self.portfolio is not None:
+            # cut the history down to the selected time range
+            span = GRAPH_RANGES[self.graph['range']][1]
+            start = 0 if span is None or len(self.portfolio.times) == 0 else \
+                    np.searchsorted(self.portfolio.times, self.portfolio.times[-1] - span)
+
+            history = {
+                'values': self.portfolio.values()[start:],
+                'total': self.portfolio.total()[start:]
+            }
 
-        graph_data = self.get_graph_data(graph_all, graph['w'], history['cut'], extra)
+        if history is None or len(history['total']) == 0:
+            self.graph['win'].addstr(2, 1, "No data.")
+            refresh(self.graph['win'])
+            return
+
+        graph_data = self.get_graph_data(graph_all, graph['w'], history, series_length)
 
         ## gather data
         if graph_data is not False:
             # draw the actual graph
             self.draw_graph_data(graph_data, graph)
 
-        self.graph['win'].refresh()
+        refresh(self.graph['win'])
 
     def key_input(self, c):
         do_graph_all = c == ord(KEY_GRAPH)
         do_graph_selected = self.nav_active and (c == KEYCODE_NEWLINE or c == KEYCODE_RETURN)
 
-        if not self.form['open']:
-            if do_graph_all or do_graph_selected:
-                self.graph['active'] = not self.graph['active']
+        if not self.form['open'] and (do_graph_all or do_graph_selected):
+            if self.portfolio is None and not self.graph['active']:
+                return True # the funds didn't load, so there's nothing to graph
+
+            self.graph['active'] = not self.graph['active']
+
+            if self.graph['active']:
+                self.show_graph(do_graph_all)
+            else:
+                self.hide_graph()
+
+        elif self.graph['active'] and c in [ord(KEY_GRAPH_RANGE), ord(KEY_GRAPH_SAMPLING)]:
+            if c == ord(KEY_GRAPH_RANGE):
+                self.graph['range'] = (self.graph['range'] + 1) % len(GRAPH_RANGES)
+            else:
+                self.graph['sampling'] = (self.graph['sampling'] + 1) % len(GRAPH_SAMPLING)
 
-                if self.graph['active']:
-                    self.show_graph(do_graph_all)
-                else:
-                    self.hide_graph()
+            self.show_graph(self.graph['all'])
 
         elif not self.graph['active']:
             return super().key_input(c)
@@ -489,17 +1126,17 @@ class PageBills(PageListBasic):
 
 class PageFood(PageListShop):
     def __init__(self, win, api, set_statusbar):
-        super().__init__(win, api, set_statusbar, ['food', "Category", 'k'])
+        super().__init__(win, api, set_statusbar, 'food')
 
 class PageGeneral(PageListShop):
     def __init__(self, win, api, set_statusbar):
-        super().__init__(win, api, set_statusbar, ['general', "Category", 'k'])
+        super().__init__(win, api, set_statusbar, 'general')
 
 class PageHoliday(PageListShop):
     def __init__(self, win, api, set_statusbar):
-        super().__init__(win, api, set_statusbar, ['holiday', "Holiday", 'h'])
+        super().__init__(win, api, set_statusbar, 'holiday')
 
 class PageSocial(PageListShop):
     def __init__(self, win, api, set_statusbar):
-        super().__init__(win, api, set_statusbar, ['social', "Society", 'y'])
+        super().__init__(win, api, set_statusbar, 'social')
 
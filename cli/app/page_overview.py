@@ -4,10 +4,15 @@ Displays overview financial data (cash flow)
 
 import curses
 
-from app.const import NC_COLOR_TAB, NC_COLOR_TAB_SEL
+from app.const import NC_COLOR_TAB, NC_COLOR_TAB_SEL, KEY_FORECAST
 from app.methods import format_currency, ellipsis, alignr
+from app.compositor import refresh
+from app.forecast import ForecastEngine
 from app.page import Page
 
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", \
+        "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
 class PageOverview(Page):
     """ Page class to display overview data """
     def __init__(self, win, api, set_statusbar):
@@ -22,88 +27,98 @@ class PageOverview(Page):
 
         self.future_cols = ['food', 'general', 'holiday', 'social']
 
+        # whether the data came from the local mirror, and needs refreshing
+        self.stale = False
+
         super().__init__(win, api, set_statusbar)
 
+        self.forecast = self.measure('calculate', self.calculate_data)
+
+        if self.forecast is not None:
+            self.set_forecast_statusbar()
+
+        self.api.events.subscribe('cost_changed', self.cost_changed)
+
+        if self.stale:
+            self.api.req_async(['data', 'overview'], callback=self.refreshed)
+
     def get_data(self):
+        # show the local copy straight away, like the list pages
+        res = self.api.req_local(['data', 'overview'])
+
+        if res is not None:
+            self.stale = True
+
+            return res['data']
+
         res = self.api.req(['data', 'overview'])
 
         return res['data']
 
-    def calculate_data(self):
-        """ calculates future spending data based on past averages """
+    def refreshed(self, res, err):
+        if err is not None:
+            return
 
-        # calculate table values
-        year_month_start = self.data['startYearMonth']
-        year_month_end = self.data['endYearMonth']
-        year_month_now = self.data['currentYear'], self.data['currentMonth']
+        model = self.forecast.model if self.forecast is not None else None
 
-        # number of months (inclusive) since the start month
-        num_rows = 12 * (year_month_end[0] - year_month_start[0]) + \
-                year_month_end[1] - year_month_start[1] + 1
+        self.data = res['data']
+        self.forecast = self.measure('calculate', self.calculate_data)
+        self.changed()
 
-        months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", \
-                "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+        if model is not None and model != self.forecast.model:
+            self.forecast.set_model(model)
 
-        # calculate futures based on averages
-        future_key = 12 * (year_month_now[0] - year_month_start[0]) + \
-                year_month_now[1] - year_month_start[1] + 1
+        self.set_forecast_statusbar()
 
-        average = [
-            sum([self.data['cost'][col][i] for i in range(future_key)]) / future_key
-            for col in self.future_cols
-        ]
+        if self.visible:
+            self.switch_to()
 
-        out_with_future = [
-            sum([self.data['cost'][col][i] if i < future_key else average[index] \
-                    for (index, col) in enumerate(self.future_cols)]) \
-                    + self.data['cost']['bills'][i]
-            for i in range(num_rows)
-        ]
+    def calculate_data(self):
+        """ calculates future spending data based on past averages (once per data load) """
+        if self.data is None:
+            return None
 
-        # net spending
-        net = [
-            self.data['cost']['income'][i] - out_with_future[i]
-            for i in range(num_rows)
-        ]
+        return ForecastEngine(self.data, self.future_cols)
 
-        # calculate predicted balance based on future spending predictions
-        predicted = [
-            self.data['cost']['balance'][max(0, i - 1)] + net[i]
-            for i in range(future_key + 1)
-        ]
-        for i in range(future_key + 1, num_rows):
-            predicted.append(int(predicted[i - 1] + net[i]))
-
-        rows = [
-            [
-                "{}-{}".format(months[(year_month_start[1] - 1 + i) % 12], \
-                        (year_month_start[0] + (i - 1 + year_month_start[1]) // 12) % 1000),
-                format_currency(self.data['cost']['income'][i], self.cols[1][1] - 1),
-                format_currency(out_with_future[i], self.cols[2][1] - 1),
-                format_currency(net[i], self.cols[3][1] - 1),
-                format_currency(predicted[i], self.cols[4][1] - 1),
-                format_currency(self.data['cost']['balance'][i], self.cols[5][1] - 1)
-            ]
-            for i in range(num_rows)
-        ]
+    def cost_changed(self, table, before, after):
+        """ moves an edited row's cost from its old month to its new one """
+        if self.forecast is None:
+            return
 
-        return rows, year_month_start, year_month_now
+        (date_before, cost_before), (date_after, cost_after) = before, after
 
-    def draw(self):
-        rows, year_month_start, year_month_now = self.calculate_data()
+        if self.forecast.change_cost(table, [(date_before, -cost_before), \
+                (date_after, cost_after)]) and self.visible:
+            self.win.erase()
+            self.try_draw()
+            refresh(self.win)
 
+    def format_row(self, i):
+        """ formats a single row of the table """
+        year_month_start = self.data['startYearMonth']
+
+        return [
+            "{}-{}".format(MONTHS[(year_month_start[1] - 1 + i) % 12], \
+                    (year_month_start[0] + (i - 1 + year_month_start[1]) // 12) % 1000),
+            format_currency(self.forecast.cost['income'][i], self.cols[1][1] - 1),
+            format_currency(self.forecast.series['out'][i], self.cols[2][1] - 1),
+            format_currency(self.forecast.series['net'][i], self.cols[3][1] - 1),
+            format_currency(self.forecast.series['predicted'][i], self.cols[4][1] - 1),
+            format_currency(self.forecast.cost['balance'][i], self.cols[5][1] - 1)
+        ]
+
+    def draw(self):
         colors = [
             curses.color_pair(NC_COLOR_TAB[0]), # inactive
             curses.color_pair(NC_COLOR_TAB_SEL[0]) # active
         ]
 
         num = {
-            'rows': len(rows),
-            'disp': min(self.dim[0], len(rows))
+            'rows': self.forecast.num_rows,
+            'disp': min(self.dim[0], self.forecast.num_rows)
         }
 
-        active_row = 12 * (year_month_now[0] - year_month_start[0]) + \
-                year_month_now[1] - year_month_start[1]
+        active_row = self.forecast.active_row()
 
         # draw all the rows and columns
         for i in range(num['disp']):
@@ -126,13 +141,24 @@ class PageOverview(Page):
                     self.win.addstr(i, 0, ' ' * self.dim[1], color)
 
                 col = 0
-                j = 0
-                for (j, (col_name, col_width)) in enumerate(self.cols):
-                    self.win.addstr(i, col, ellipsis(rows[row][j], col_width), \
+                for (j, (text, (_, col_width))) in enumerate(zip(self.format_row(row), self.cols)):
+                    self.win.addstr(i, col, ellipsis(text, col_width), \
                             color | curses.A_BOLD if j == 5 else color)
 
                     col += col_width
 
+    def set_forecast_statusbar(self):
+        self.statusbar = [[KEY_FORECAST, "forecast ({})".format(self.forecast.model)]]
+
+    def key_input(self, key):
+        if key == ord(KEY_FORECAST) and self.forecast is not None:
+            self.forecast.next_model()
+            self.set_forecast_statusbar()
+
+            self.switch_to()
+
+        return True
+
     def set_nav_active(self, status):
         return False # this page can't be active
 
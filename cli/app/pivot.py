@@ -0,0 +1,137 @@
+"""
+Totals of spending across list tables, by a dimension (e.g. category) and period
+"""
+
+import numpy as np
+
+from app.store import Interned
+
+PERIODS = ['week', 'month', 'year']
+
+def period_bins(dates, period):
+    """ returns the number of the period each date is in, counting from 1970 """
+    if period == 'week':
+        # weeks start on a monday, and 1970-01-01 was a thursday
+        return (dates.astype(np.int64) + 3) // 7
+
+    if period == 'month':
+        return dates.astype('datetime64[M]').astype(np.int64)
+
+    return dates.astype('datetime64[Y]').astype(np.int64)
+
+def period_label(period, number):
+    number = int(number)
+
+    if period == 'week':
+        return str(np.datetime64(number * 7 - 3, 'D'))
+
+    if period == 'month':
+        return str(np.datetime64(number, 'M'))
+
+    return str(1970 + number)
+
+class PivotTable(object):
+    """
+    the rows of several list stores, with a code for each row in each dimension and
+    a bin for each period (both worked out once), so that each pivot is a bincount
+    """
+    def __init__(self, stores, dimensions):
+        tables = list(stores.keys())
+        lengths = [len(store) for store in stores.values()]
+
+        self.dates = np.concatenate([np.zeros(0, dtype='datetime64[D]')] + \
+                [store.dates for store in stores.values()])
+        self.costs = np.concatenate([np.zeros(0, dtype=np.int64)] + \
+                [store.costs for store in stores.values()])
+
+        # rows of tables which don't have a dimension have the code -1 in it
+        self.dimensions = {
+            'table': Interned(tables, np.repeat(np.arange(len(tables), dtype=np.int32), lengths))
+        }
+
+        for (name, columns) in dimensions.items():
+            column = Interned()
+
+            codes = [np.full(len(store), -1, dtype=np.int32) for store in stores.values()]
+
+            for (index, (table, store)) in enumerate(stores.items()):
+                if table in columns:
+                    text = store.text[columns[table]]
+
+                    # codes of the store's own column, in the combined column
+                    remap = np.array([column.code(value) for value in text.values], \
+                            dtype=np.int32)
+
+                    codes[index] = remap[text.codes]
+
+            column.codes = np.concatenate([np.zeros(0, dtype=np.int32)] + codes)
+
+            self.dimensions[name] = column
+
+        self.cache = {}
+
+    def cached(self, key, calculate):
+        if key not in self.cache:
+            self.cache[key] = calculate()
+
+        return self.cache[key]
+
+    def periods(self, period):
+        """ returns the bin of each row, counting from the first period, and the first period """
+        def calculate():
+            bins = period_bins(self.dates, period)
+
+            first = int(bins.min()) if len(bins) > 0 else 0
+
+            return bins - first, first
+
+        return self.cached(('periods', period), calculate)
+
+    def rows(self, filters):
+        """ returns which rows have every (dimension, code) in filters """
+        def calculate():
+            if len(filters) == 0:
+                return np.ones(len(self.costs), dtype=bool)
+
+            return self.rows(filters[:-1]) & \
+                    (self.dimensions[filters[-1][0]].codes == filters[-1][1])
+
+        return self.cached(('rows', tuple(filters)), calculate)
+
+    def pivot(self, dimension, period, filters=()):
+        """
+        returns the total of each group of the dimension in each period, for the rows
+        matching filters; groups are in order of their total, largest first
+        """
+        def calculate():
+            bins, first = self.periods(period)
+            codes = self.dimensions[dimension].codes
+
+            num_periods = int(bins.max()) + 1 if len(bins) > 0 else 0
+            num_groups = len(self.dimensions[dimension].values)
+
+            rows = self.rows(filters) & (codes >= 0)
+
+            totals = np.rint(np.bincount(codes[rows].astype(np.int64) * num_periods + bins[rows], \
+                    weights=self.costs[rows], minlength=num_groups * num_periods)) \
+                    .astype(np.int64).reshape(num_groups, num_periods)
+
+            sums = totals.sum(axis=1)
+
+            groups = np.flatnonzero(np.bincount(codes[rows], minlength=num_groups) > 0)
+            groups = groups[np.argsort(-sums[groups], kind='stable')]
+
+            return {
+                'dimension': dimension,
+                'period': period,
+                'first': first,
+                'groups': groups,
+                'names': [self.dimensions[dimension].values[group] for group in groups],
+                'totals': totals[groups],
+                'sums': sums[groups]
+            }
+
+        return self.cached(('pivot', dimension, period, tuple(filters)), calculate)
+
+    def name(self, dimension, code):
+        return self.dimensions[dimension].values[code]
@@ -0,0 +1,68 @@
+"""
+Price and value history of a portfolio of funds, held as dense arrays
+"""
+
+import re
+import json
+import numpy as np
+
+# the price list of a fund, which is by far the biggest part of it
+PRICES = re.compile(r'"pr"\s*:\s*\[([^\]]*)\]')
+
+def decode_fund(text):
+    """ decodes a fund from the funds response, parsing its prices straight into an array """
+    found = PRICES.search(text)
+
+    if found is None:
+        return json.loads(text)
+
+    fund = json.loads(text[:found.start(1)] + text[found.end(1):])
+    fund['pr'] = np.fromstring(found.group(1), sep=',') \
+            if found.group(1).strip() else np.zeros(0)
+
+    return fund
+
+class PortfolioHistory(object):
+    """
+    a (times x funds) matrix of prices, built once when the funds data loads;
+    values are derived from it with the current units of each fund
+    """
+    def __init__(self, funds, cache_times):
+        self.times = np.asarray(cache_times, dtype=np.float64)
+
+        self.prices = np.zeros((len(self.times), len(funds)))
+
+        for (key, fund) in enumerate(funds):
+            prices = np.asarray(fund.get('pr', []), dtype=np.float64)
+            start = fund.get('prStartIndex', 0)
+
+            # prices start at the fund's start index and run until they (or the times) stop
+            skip = max(0, -start)
+            end = min(len(self.times), start + len(prices))
+
+            if end > start + skip:
+                self.prices[start + skip:end, key] = prices[skip:end - start]
+
+        self.units = np.zeros(len(funds))
+        self.cache = {}
+
+    def set_units(self, units):
+        units = np.asarray(units, dtype=np.float64)
+
+        if not np.array_equal(units, self.units):
+            self.units = units
+            self.cache = {}
+
+    def values(self):
+        """ value of each fund at each time """
+        if 'values' not in self.cache:
+            self.cache['values'] = self.prices * self.units
+
+        return self.cache['values']
+
+    def total(self):
+        """ value of the whole portfolio at each time """
+        if 'total' not in self.cache:
+            self.cache['total'] = self.prices @ self.units
+
+        return self.cache['total']
@@ -0,0 +1,42 @@
+"""
+Builds page objects in the background, so that switching tabs doesn't wait on the API
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app.const import PREFETCH_WORKERS
+
+class PagePrefetcher(object):
+    """ runs a page factory for each page on a thread pool """
+    def __init__(self, factory, max_workers=PREFETCH_WORKERS):
+        self.factory = factory
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+
+    def start(self, pages):
+        """ start building every page which isn't already being built """
+        for page in pages:
+            if page not in self.futures:
+                self.futures[page] = self.pool.submit(self.factory, page)
+
+    def pending(self, page):
+        return page in self.futures
+
+    def ready(self, page):
+        return page in self.futures and self.futures[page].done()
+
+    def get(self, page):
+        """ returns the built page object (waiting for it if necessary) """
+        future = self.futures.pop(page, None)
+
+        if future is None:
+            return None
+
+        return future.result()
+
+    def cancel(self):
+        """ forget about any pages being built, e.g. on logout """
+        for future in self.futures.values():
+            future.cancel()
+
+        self.futures = {}
@@ -0,0 +1,60 @@
+"""
+Keeps the api key between runs, in a file which only the user can read
+"""
+
+import os
+import json
+import stat
+from time import time
+
+from app.const import LOGIN_FILE, LOGIN_MAX_AGE
+
+def load_login(path=LOGIN_FILE):
+    """ returns the saved uid, name and token, or None if they're missing or expired """
+    try:
+        if os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            # someone else could have read (or written) it
+            forget_login(path)
+            return None
+
+        with open(path, 'r') as login_file:
+            saved = json.load(login_file)
+
+        if saved['expires'] > time():
+            return {'uid': saved['uid'], 'name': saved['name'], 'token': saved['token']}
+
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    forget_login(path)
+
+    return None
+
+def save_login(state, path=LOGIN_FILE, max_age=LOGIN_MAX_AGE):
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+
+        # written to a new file which is created without permissions for anyone else
+        temp_path = "{}.{}".format(path, os.getpid())
+
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(descriptor, 0o600)
+
+        with os.fdopen(descriptor, 'w') as login_file:
+            json.dump({
+                'uid': state['uid'],
+                'name': state['name'],
+                'token': state['token'],
+                'expires': time() + max_age
+            }, login_file)
+
+        os.replace(temp_path, path)
+
+    except OSError:
+        pass # we'll just have to log in next time
+
+def forget_login(path=LOGIN_FILE):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
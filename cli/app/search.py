@@ -0,0 +1,88 @@
+"""
+Searches the text columns of a list store as the user types
+"""
+
+import numpy as np
+
+from app.const import SEARCH_NGRAM
+
+def ngrams(text, size=SEARCH_NGRAM):
+    return set(text[i:i + size] for i in range(len(text) - size + 1))
+
+class SearchIndex(object):
+    """
+    n-gram index over the distinct values of each text column of a ListStore;
+    since values are interned, this is much smaller than the number of rows
+    """
+    def __init__(self, store, fields=('item', 'category', 'shop')):
+        self.store = store
+        self.fields = [field for field in fields if field in store.text]
+
+        self.lower = {field: [] for field in self.fields}
+        self.grams = {field: {} for field in self.fields}
+
+        self.update()
+
+    def update(self):
+        """ indexes values which were added to the store (e.g. by edits) since the last update """
+        for field in self.fields:
+            values = self.store.text[field].values
+            lower = self.lower[field]
+
+            for code in range(len(lower), len(values)):
+                value = values[code].lower()
+                lower.append(value)
+
+                for gram in ngrams(value):
+                    self.grams[field].setdefault(gram, set()).add(code)
+
+    def candidates(self, field, query):
+        """ codes of values which might contain the query """
+        grams = ngrams(query)
+
+        if len(grams) == 0:
+            return range(len(self.lower[field]))
+
+        found = None
+        for gram in grams:
+            codes = self.grams[field].get(gram, set())
+            found = codes if found is None else found & codes
+
+            if len(found) == 0:
+                break
+
+        return found
+
+    def match(self, field, query, codes=None):
+        """ returns the codes of values which contain the query, out of codes if given """
+        if codes is None:
+            codes = self.candidates(field, query)
+
+        lower = self.lower[field]
+
+        return np.array([code for code in codes if query in lower[code]], dtype=np.int64)
+
+    def search(self, query, previous=None):
+        """
+        returns a search result: the matching codes of each field and the matching rows.
+        If the query extends the previous one, only its results are narrowed down
+        """
+        query = query.lower()
+
+        narrow = previous is not None and query.startswith(previous['query'])
+
+        codes = {
+            field: self.match(field, query, previous['codes'][field] if narrow else None)
+            for field in self.fields
+        }
+
+        rows = previous['rows'] if narrow else np.arange(len(self.store))
+
+        mask = np.zeros(len(rows), dtype=bool)
+        for field in self.fields:
+            lookup = np.zeros(len(self.lower[field]), dtype=bool)
+            lookup[codes[field]] = True
+
+            mask |= lookup[self.store.text[field].codes[rows]]
+
+        return {'query': query, 'codes': codes, 'rows': rows[mask]}
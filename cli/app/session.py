@@ -0,0 +1,85 @@
+"""
+The http session used to talk to the server; requests is slow to import, so this
+module is only loaded once it's needed (or in the background while the PIN is typed)
+"""
+
+import threading
+from time import perf_counter
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.const import API_TIMEOUT
+
+# time spent making new connections during the request which each thread is sending
+SETUP = threading.local()
+
+def timed_pool(pool_class, metrics):
+    """
+    a connection pool class whose new connections record how long they took to make:
+    the DNS lookup and TCP connection, then (for https) the TLS handshake
+    """
+    class TimedConnection(pool_class.ConnectionCls):
+        def _new_conn(self):
+            start = perf_counter()
+
+            try:
+                return super()._new_conn()
+            finally:
+                self.connect_time = perf_counter() - start
+
+                metrics.record('api.connect', self.connect_time, host=self.host)
+
+        def connect(self):
+            self.connect_time = 0
+            start = perf_counter()
+
+            try:
+                super().connect()
+            finally:
+                setup = perf_counter() - start
+
+                SETUP.seconds = getattr(SETUP, 'seconds', 0) + setup
+
+            if pool_class.scheme == 'https':
+                metrics.record('api.tls', setup - self.connect_time, host=self.host)
+
+    return type(pool_class.__name__, (pool_class,), {'ConnectionCls': TimedConnection})
+
+class TimedAdapter(HTTPAdapter):
+    """
+    records the time taken to connect to the server, and stops requests from waiting
+    forever for a server which isn't answering
+    """
+    def __init__(self, metrics, timeout=API_TIMEOUT):
+        self.metrics = metrics
+        self.timeout = timeout
+
+        super().__init__()
+
+    def send(self, request, timeout=None, **kwargs):
+        SETUP.seconds = 0
+
+        # (requests has no default timeout of its own)
+        res = super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+        # so that the time to the first byte can leave out connecting
+        res.connection_setup = SETUP.seconds
+
+        return res
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': timed_pool(HTTPConnectionPool, self.metrics),
+            'https': timed_pool(HTTPSConnectionPool, self.metrics)
+        }
+
+def new_session(metrics):
+    session = requests.Session()
+    session.mount('http://', TimedAdapter(metrics))
+    session.mount('https://', TimedAdapter(metrics))
+
+    return session
@@ -0,0 +1,112 @@
+"""
+Orders list pages by a column, optionally grouped by another column with subtotals
+"""
+
+import numpy as np
+
+def rank_values(values):
+    """ returns the alphabetical rank of each of a list of (distinct) strings """
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[sorted(range(len(values)), key=lambda code: values[code].lower())] = \
+            np.arange(len(values))
+
+    return rank
+
+class ListOrder(object):
+    """
+    sort permutations and group boundaries of a list; each is worked out once
+    (by argsort) and kept until the list changes, so flipping between orders is cheap
+    """
+    def __init__(self, num_rows, column_values, column_codes):
+        # number of rows in the list
+        self.num_rows = num_rows
+        # returns an array to sort the list by a column
+        self.column_values = column_values
+        # returns the distinct values of a text column, and the code of each row
+        self.column_codes = column_codes
+
+        self.cache = {}
+
+    def reset(self):
+        """ called when the list changes """
+        self.cache = {}
+
+    def cached(self, key, calculate):
+        if key not in self.cache:
+            self.cache[key] = calculate()
+
+        return self.cache[key]
+
+    def permutation(self, column, reverse=False):
+        """ the rows in order of a column, or in list order if column is None """
+        def calculate():
+            if reverse:
+                return self.permutation(column, False)[::-1]
+
+            if column is None:
+                return np.arange(self.num_rows())
+
+            return np.argsort(self.column_values(column), kind='stable')
+
+        return self.cached(('sort', column, reverse), calculate)
+
+    def group_keys(self, group):
+        """ the alphabetical rank of each row's value of the group column """
+        def calculate():
+            values, codes = self.column_codes(group)
+
+            return rank_values(values)[codes]
+
+        return self.cached(('keys', group), calculate)
+
+    def grouped(self, column, reverse, group):
+        """ the rows in order of a column, within groups if group isn't None """
+        def calculate():
+            order = self.permutation(column, reverse)
+
+            if group is None:
+                return order
+
+            return order[np.argsort(self.group_keys(group)[order], kind='stable')]
+
+        return self.cached(('group', column, reverse, group), calculate)
+
+    def view(self, column, reverse, group, rows=None):
+        """
+        returns the indices of the rows to show (only those in rows, if given), and
+        a dict of the groups. Each group is shown after a subtotal row, which is
+        given in the view as -1 - (the index of the group)
+        """
+        if rows is None:
+            return self.cached(('view', column, reverse, group), \
+                    lambda: self.calculate_view(column, reverse, group, None))
+
+        return self.calculate_view(column, reverse, group, rows)
+
+    def calculate_view(self, column, reverse, group, rows):
+        order = self.grouped(column, reverse, group)
+
+        if rows is not None:
+            # filter the order instead of sorting the rows again
+            keep = np.zeros(len(order), dtype=bool)
+            keep[rows] = True
+
+            order = order[keep[order]]
+
+        if group is None:
+            return order, None
+
+        keys = self.group_keys(group)[order]
+
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) \
+                if len(order) > 0 else np.zeros(0, dtype=np.int64)
+
+        groups = {
+            'column': group,
+            'first': order[starts],
+            'count': np.diff(np.append(starts, len(order))),
+            'cost': np.add.reduceat(self.column_values('cost')[order], starts) \
+                    if len(order) > 0 else np.zeros(0, dtype=np.int64)
+        }
+
+        return np.insert(order, starts, -1 - np.arange(len(starts))), groups
@@ -0,0 +1,167 @@
+"""
+Columnar storage for list tables (e.g. food), so that each row doesn't need its own dict
+"""
+
+import numpy as np
+
+def dates_from_ymd(ymd):
+    """ converts an (n, 3) array of [year, month, date] to datetime64 """
+    ymd = np.asarray(ymd, dtype=np.int64).reshape(-1, 3)
+
+    months = ((ymd[:, 0] - 1970) * 12 + ymd[:, 1] - 1).astype('datetime64[M]')
+
+    return months.astype('datetime64[D]') + (ymd[:, 2] - 1)
+
+def ymd_from_date(date):
+    """ converts a datetime64 to [year, month, date] """
+    value = date.astype(object)
+
+    return [value.year, value.month, value.day]
+
+class Interned(object):
+    """ a column of strings, stored as codes into a list of the distinct values """
+    def __init__(self, values=None, codes=None, index=None):
+        self.values = [] if values is None else values
+        self.index = {value: code for (code, value) in enumerate(self.values)} \
+                if index is None else index
+        self.codes = np.zeros(0, dtype=np.int32) if codes is None else codes
+
+    @classmethod
+    def from_list(cls, items):
+        column = cls()
+        column.codes = np.fromiter((column.code(item) for item in items), \
+                dtype=np.int32, count=len(items))
+
+        return column
+
+    def code(self, value):
+        """ returns the code of a value, adding it to the distinct values if it's new """
+        value = str(value)
+
+        try:
+            return self.index[value]
+        except KeyError:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+
+            return self.index[value]
+
+    def __getitem__(self, j):
+        return self.values[self.codes[j]]
+
+    def __setitem__(self, j, value):
+        self.codes[j] = self.code(value)
+
+    def take(self, order):
+        return Interned(self.values, self.codes[order], self.index)
+
+    def append(self, items):
+        return Interned(self.values, np.concatenate([ \
+                self.codes, np.array([self.code(item) for item in items], dtype=np.int32)]), \
+                self.index)
+
+class ListStore(object):
+    """
+    a list table held as numpy arrays of ids, dates and costs, plus an interned
+    column for each text field; rows are kept in api order (newest first)
+    """
+    def __init__(self, columns, ids=None, dates=None, costs=None, text=None):
+        # maps text column names (e.g. 'shop') to their api keys (e.g. 's')
+        self.columns = columns
+
+        self.ids = np.zeros(0, dtype=np.int64) if ids is None else ids
+        self.dates = np.zeros(0, dtype='datetime64[D]') if dates is None else dates
+        self.costs = np.zeros(0, dtype=np.int64) if costs is None else costs
+
+        self.text = {name: Interned() for name in columns} if text is None else text
+
+    @classmethod
+    def from_rows(cls, rows, columns):
+        """ builds a store from api rows """
+        num = len(rows)
+
+        return cls(
+            columns,
+            ids=np.fromiter((row['I'] for row in rows), dtype=np.int64, count=num),
+            dates=dates_from_ymd([row['d'] for row in rows]),
+            costs=np.fromiter((row['c'] for row in rows), dtype=np.int64, count=num),
+            text={
+                name: Interned.from_list([row[key] for row in rows])
+                for (name, key) in columns.items()
+            }
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, j):
+        """ returns a row in the same shape the pages used to build from the api """
+        row = {
+            'id': int(self.ids[j]),
+            'date': ymd_from_date(self.dates[j]),
+            'cost': int(self.costs[j])
+        }
+
+        for (name, column) in self.text.items():
+            row[name] = column[j]
+
+        return row
+
+    def find(self, row_id):
+        """ returns the index of the row with the given id, or None """
+        found = np.flatnonzero(self.ids == row_id)
+
+        return int(found[0]) if len(found) > 0 else None
+
+    def set(self, j, key, value):
+        """ updates a single field of a row """
+        if key == 'date':
+            self.dates[j] = dates_from_ymd(value)[0]
+        elif key == 'cost':
+            self.costs[j] = value
+        elif key in self.text:
+            self.text[key][j] = value
+
+    def take(self, order):
+        """ reorders (or filters) the rows in place """
+        self.ids = self.ids[order]
+        self.dates = self.dates[order]
+        self.costs = self.costs[order]
+        self.text = {name: column.take(order) for (name, column) in self.text.items()}
+
+    def merge(self, changed, deleted):
+        """ merges changed (added or updated) api rows and deleted ids into the store """
+        position = {row_id: j for (j, row_id) in enumerate(self.ids.tolist())}
+
+        added = []
+        for row in changed:
+            j = position.get(row['I'])
+
+            if j is None:
+                added.append(row)
+                continue
+
+            self.set(j, 'date', row['d'])
+            self.set(j, 'cost', row['c'])
+
+            for (name, key) in self.columns.items():
+                self.set(j, name, row[key])
+
+        keep = np.ones(len(self), dtype=bool)
+        keep[[position[row_id] for row_id in deleted if row_id in position]] = False
+
+        self.take(keep)
+
+        if len(added) > 0:
+            self.ids = np.concatenate([self.ids, \
+                    np.array([row['I'] for row in added], dtype=np.int64)])
+            self.dates = np.concatenate([self.dates, dates_from_ymd([row['d'] for row in added])])
+            self.costs = np.concatenate([self.costs, \
+                    np.array([row['c'] for row in added], dtype=np.int64)])
+            self.text = {
+                name: column.append([row[self.columns[name]] for row in added])
+                for (name, column) in self.text.items()
+            }
+
+        # newest first, as the api sends them
+        self.take(np.lexsort((self.ids, self.dates))[::-1])
@@ -0,0 +1,169 @@
+"""
+Decodes large JSON responses as they download, one item of a list at a time
+"""
+
+import re
+import json
+import codecs
+
+# a (possibly unfinished) string, or a character which opens or closes something
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*(?:(?P<close>")|\\?\Z)|[\[\]{},:]')
+
+# inside an item we only need to know where it ends
+NESTED_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*(?:(?P<close>")|\\?\Z)|[\[\]{}]')
+
+class StreamDecoder(object):
+    """
+    decodes a JSON document from chunks of bytes, yielding each item of the array
+    at path (e.g. ['data', 'data']) as soon as all of it has arrived; other values
+    along the path (e.g. data.total) are decoded whole, into extra. Items are decoded
+    from their text by decode_item (e.g. straight into arrays)
+    """
+    def __init__(self, path, decode_item=json.loads):
+        self.path = list(path)
+        self.decode_item = decode_item
+        self.extra = {}
+
+        self.text = ''
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+
+        # where to carry on scanning the text from
+        self.pos = 0
+
+        # the open objects and arrays along the path, and the current key of each object
+        self.stack = []
+        self.expect_key = False
+
+        # the value being collected: where it starts, the depth it's at, and its key
+        self.start = None
+        self.depth = None
+        self.key = None
+        self.nested = 0
+
+        # items completed by the current chunk
+        self.items = []
+
+    def document(self, items):
+        """ puts the document back together, with the given items at the path """
+        document = {}
+
+        for (keys, value) in list(self.extra.items()) + [(tuple(self.path), items)]:
+            parent = document
+            for key in keys[:-1]:
+                parent = parent.setdefault(key, {})
+
+            parent[keys[-1]] = value
+
+        return document
+
+    def keys(self):
+        return [frame['key'] for frame in self.stack if frame['type'] == '{']
+
+    def decode(self, chunks):
+        """ yields the items of the array as they arrive """
+        for chunk in chunks:
+            for item in self.feed(self.utf8.decode(chunk)):
+                yield item
+
+        for item in self.feed(self.utf8.decode(b'', final=True)):
+            yield item
+
+    def feed(self, text):
+        self.text += text
+        self.items = []
+
+        while True:
+            token = (NESTED_TOKEN if self.nested > 0 else TOKEN).search(self.text, self.pos)
+
+            if token is None:
+                self.pos = len(self.text)
+                break
+
+            value = token.group()
+
+            if value[0] == '"' and token.group('close') is None:
+                # the rest of the string hasn't arrived yet
+                self.pos = token.start()
+                break
+
+            self.pos = token.end()
+
+            self.token(value, token.start(), token.end())
+
+        # drop what we're done with
+        keep = self.pos if self.start is None else min(self.start, self.pos)
+
+        if self.start is not None:
+            self.start -= keep
+
+        self.text = self.text[keep:]
+        self.pos -= keep
+
+        return self.items
+
+    def token(self, value, start, end):
+        if self.nested > 0:
+            if value in '[{':
+                self.nested += 1
+            elif value in ']}':
+                self.nested -= 1
+
+            return
+
+        if self.start is not None and len(self.stack) == self.depth:
+            if value in ',]}':
+                self.collected(value, start, end)
+            elif value in '[{':
+                self.nested = 1
+
+            return
+
+        if value == '{':
+            self.stack.append({'type': '{', 'key': None})
+            self.expect_key = True
+
+        elif value == '[':
+            self.stack.append({'type': '[', 'key': None})
+
+            if self.keys() == self.path:
+                self.collect(end, None)
+
+        elif value in ']}':
+            self.stack.pop()
+
+        elif value == ',':
+            self.expect_key = len(self.stack) > 0 and self.stack[-1]['type'] == '{'
+
+        elif value == ':':
+            keys = self.keys()
+
+            if keys != self.path[:len(keys)]:
+                # a value which isn't on the path, so it's decoded whole
+                self.collect(end, tuple(keys))
+
+        elif self.expect_key:
+            self.stack[-1]['key'] = json.loads(value)
+            self.expect_key = False
+
+    def collect(self, start, key):
+        self.start = start
+        self.depth = len(self.stack)
+        self.key = key
+
+    def collected(self, value, start, end):
+        text = self.text[self.start:start].strip()
+
+        if self.key is None:
+            # an item of the array
+            if len(text) > 0:
+                self.items.append(self.decode_item(text))
+
+            self.start = end if value == ',' else None
+        else:
+            self.extra[self.key] = json.loads(text)
+            self.start = None
+
+        if value in ']}':
+            self.stack.pop()
+        else:
+            self.expect_key = self.stack[-1]['type'] == '{'
@@ -0,0 +1,62 @@
+"""
+Keeps track of which revision of each table we hold, so that refreshes only fetch changes
+"""
+
+import threading
+
+def merge_rows(rows, changed, deleted):
+    """ merges changed (added or updated) and deleted rows into a list of rows """
+    by_id = {row['I']: row for row in rows}
+
+    for row_id in deleted:
+        by_id.pop(row_id, None)
+
+    for row in changed:
+        by_id[row['I']] = row
+
+    # the api sends rows newest first
+    return sorted(by_id.values(), key=lambda row: (row['d'], row['I']), reverse=True)
+
+class TableSync(object):
+    """
+    remembers the last revision seen of each table; if the server doesn't send revisions,
+    every fetch is a full one
+    """
+    def __init__(self):
+        self.revisions = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.revisions = {}
+
+    def query(self, table, full=False, query=None):
+        """ returns the query to send, asking only for changes if we know our revision """
+        query = {} if query is None else dict(query)
+
+        with self.lock:
+            if not full and table in self.revisions:
+                query['since'] = self.revisions[table]
+
+        return query
+
+    def received(self, table, data):
+        """ records the revision of a response; returns True if it only contains changes """
+        with self.lock:
+            if 'revision' not in data:
+                self.revisions.pop(table, None)
+                return False
+
+            self.revisions[table] = data['revision']
+
+        return data.get('delta', False) is True
+
+def apply_delta(current, data):
+    """ updates a held table response with a delta response """
+    current['data'] = merge_rows(current['data'], data['data'], data.get('deleted', []))
+
+    for key in data:
+        if key not in ['data', 'deleted', 'delta']:
+            current[key] = data[key]
+
+    return current
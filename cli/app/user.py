@@ -3,10 +3,13 @@ Handles user logins
 """
 
 import curses
+import threading
 from curses.textpad import Textbox, rectangle
 
+from app.compositor import refresh, update
+from app.methods import ellipsis
 from app.const import LOGIN_FORM_WIDTH, LOGIN_FORM_HEIGHT, LOGIN_FORM_TITLE
-from app.api import BudgetClientAPIError
+from app.saved_login import load_login, save_login, forget_login
 
 class User(object):
     """ handles user object and logging in """
@@ -23,63 +26,83 @@ class User(object):
 
         self.api = api
 
+        # set once the PIN has been sent, so that the connection needn't be kept warm
+        self.pin_sent = threading.Event()
+
+        # the api key from last time, which is checked by the first requests made with it
+        saved = load_login()
+
+        if saved is not None:
+            self.state.update(saved)
+
     def display_result(self, msg):
-        self.win['result'].clear()
-        self.win['result'].addstr(0, 0, msg)
-        self.win['result'].refresh()
+        self.win['result'].erase()
+
+        # (e.g. connection errors are longer than the form is wide)
+        self.win['result'].addstr(0, 0, ellipsis(msg, self.win['result'].getmaxyx()[1] - 1))
+        refresh(self.win['result'])
 
     def build_login_form(self):
-        self.scr.clear()
+        self.scr.erase()
 
         # box around pin input
         rectangle(self.scr, 2, 1, 4, 7)
-        self.scr.refresh()
+        refresh(self.scr)
 
         self.win['title'] = curses.newwin(1, self.form['width'], 1, 1)
         self.win['pin'] = curses.newwin(1, 5, 3, 2)
         self.win['result'] = curses.newwin(1, self.form['width'] - 8, 3, 9)
 
         # login form title
-        self.win['title'].clear()
+        self.win['title'].erase()
         self.win['title'].addstr(0, 0, LOGIN_FORM_TITLE)
-        self.win['title'].refresh()
+        refresh(self.win['title'])
 
     def display_login_form(self, msg=""):
         self.display_result(msg)
 
-        self.win['pin'].clear()
+        self.win['pin'].erase()
         pin_input = Textbox(self.win['pin'])
+
+        # the text box draws the pin from here on
+        update()
         pin_input.edit()
-        self.win['pin'].refresh()
+        refresh(self.win['pin'])
 
         pin = pin_input.gather().strip(' ')
 
-        login_status = False
-
         try:
             pin_num = int(pin)
-            login_status = self.login(pin_num)
+        except ValueError:
+            self.display_login_form("PIN must be numeric")
+            return
 
-            if login_status is True:
-                self.logged_in()
+        self.login(pin_num)
 
-            elif login_status is False:
-                self.display_login_form("Bad PIN")
+    def login(self, pin):
+        """ sends the login request; the main loop keeps running while we wait """
+        self.display_result("Waiting...")
 
-            else:
-                self.display_login_form("Unknown error")
+        self.pin_sent.set()
 
-        except ValueError as err:
-            self.display_login_form("PIN must be numeric")
+        self.api.req_async(['user', 'login'], method='post', form={'pin': pin}, \
+                callback=self.login_response)
 
-    def login(self, pin):
-        self.display_result("Waiting...")
+    def login_response(self, res, err):
+        login_status = self.set_login(res, err)
 
-        try:
-            res = self.api.req(['user', 'login'], method='post', form={'pin': pin})
+        if login_status is True:
+            self.logged_in()
 
-        except BudgetClientAPIError as code:
-            self.display_result("Error: {}".format(code))
+        elif login_status is False:
+            self.display_login_form("Bad PIN")
+
+        else:
+            self.display_login_form("Unknown error")
+
+    def set_login(self, res, err):
+        if err is not None:
+            self.display_result("Error: {}".format(err))
             return False
 
         try:
@@ -94,13 +117,17 @@ class User(object):
         except KeyError:
             return None
 
+        save_login(self.state)
+
         return True
 
-    def logged_out(self):
+    def logged_out(self, msg=""):
+        forget_login()
+
         self.state['uid'] = 0
         self.state['name'] = None
         self.state['token'] = None
 
         self.build_login_form()
-        self.display_login_form()
+        self.display_login_form(msg)
 
@@ -0,0 +1,80 @@
+"""
+Keeps track of what a list window is showing, so that moving through a long list
+only redraws the rows which changed
+"""
+
+from collections import OrderedDict
+
+from app.const import ROW_CACHE_SIZE
+
+class ListViewport(object):
+    """ caches formatted rows, and scrolls the window instead of redrawing it """
+    def __init__(self, cache_size=ROW_CACHE_SIZE):
+        self.rows = OrderedDict()
+        self.cache_size = cache_size
+
+        # what's currently on screen
+        self.drawn = False
+        self.offset = 0
+        self.selected = None
+
+    def cells(self, j, format_row):
+        """ returns the formatted cells of row j, formatting them if they aren't cached """
+        cells = self.rows.pop(j, None)
+
+        if cells is None:
+            cells = format_row(j)
+
+        self.rows[j] = cells
+
+        if len(self.rows) > self.cache_size:
+            self.rows.popitem(last=False)
+
+        return cells
+
+    def invalidate(self):
+        """ the list data changed, so everything has to be formatted and drawn again """
+        self.rows.clear()
+        self.drawn = False
+
+    def set_drawn(self, offset, selected):
+        self.drawn = True
+        self.offset = offset
+        self.selected = selected
+
+    def update(self, win, offset, selected, num_display, draw_row):
+        """
+        brings the window up to date with a new offset and selection;
+        returns False if the list has to be drawn from scratch instead
+        """
+        if not self.drawn:
+            return False
+
+        diff = offset - self.offset
+
+        if abs(diff) > 1:
+            return False
+
+        if diff == 1:
+            # scroll down: everything moves up one line, and a new row appears at the bottom
+            win.move(1, 0)
+            win.deleteln()
+
+            draw_row(num_display - 1, offset)
+
+        elif diff == -1:
+            # scroll up: a new row appears at the top; clear the row pushed off the bottom
+            win.move(1, 0)
+            win.insertln()
+            win.move(num_display + 1, 0)
+            win.clrtoeol()
+
+            draw_row(0, offset)
+
+        for j in set([self.selected, selected]):
+            if j is not None and 0 <= j - offset < num_display:
+                draw_row(j - offset, offset)
+
+        self.set_drawn(offset, selected)
+
+        return True
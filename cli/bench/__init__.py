@@ -0,0 +1,3 @@
+"""
+Benchmarks of the client's data and drawing code, run headless against a stub server
+"""
@@ -0,0 +1,80 @@
+"""
+Runs the benchmarks: python -m bench [--years N] [--funds M] [--only NAME]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+from bench.data import BenchData
+from bench.stub_server import StubServer
+from bench import fake_curses, runner
+from bench.startup import measure_startup, check_startup, STARTUP_BUDGET
+from bench.terminal import measure_terminal, measure_first_data, LATENCY
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench', description=__doc__.strip())
+    parser.add_argument('--years', type=int, default=10, help="years of data to generate")
+    parser.add_argument('--funds', type=int, default=20, help="number of funds to generate")
+    parser.add_argument('--repeat', type=int, default=10, help="times to run each benchmark")
+    parser.add_argument('--only', help="only run benchmarks whose names contain this")
+    parser.add_argument('--label', help="note to keep with the results (e.g. what changed)")
+    parser.add_argument('--results', default=os.path.join(os.path.dirname(__file__), \
+            'results.jsonl'), help="file which the results of each run are added to")
+    parser.add_argument('--formats', help="binary encodings the app asks for " \
+            "(e.g. msgpack, or json for none)")
+    parser.add_argument('--no-save', action='store_true', help="don't keep the results")
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET, \
+            help="longest the app may take to show the login form (s)")
+
+    args = parser.parse_args()
+
+    server = StubServer(BenchData(years=args.years, funds=args.funds)).start()
+
+    # the app reads these when it's imported
+    os.environ['WEB_URL'] = server.url()
+    os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='budget-bench-')
+
+    if args.formats is not None:
+        os.environ['API_FORMATS'] = args.formats
+
+    win = fake_curses.install()
+
+    from bench.cases import build_cases
+
+    params = {'years': args.years, 'funds': args.funds}
+
+    if args.formats is not None:
+        params['formats'] = args.formats
+
+    run = runner.run_benchmarks(build_cases(win, server.data), params, \
+            repeat=args.repeat, only=args.only, label=args.label)
+
+    startup_ok = True
+
+    if args.only is None or args.only in 'startup.login_prompt':
+        startup = measure_startup(dict(os.environ), args.repeat)
+        run['results']['startup.login_prompt'] = startup
+
+        startup_ok = check_startup(startup, args.startup_budget)
+
+    if args.only is None or args.only in 'tty.bytes_per_key':
+        run['results']['tty.bytes_per_key'] = measure_terminal(dict(os.environ))
+
+    if args.only is None or args.only in 'startup.first_data':
+        # a small amount of data, from a server which is some way away
+        remote = StubServer(BenchData(years=1, funds=1), latency=LATENCY).start()
+
+        run['results'].update(measure_first_data(dict(os.environ, WEB_URL=remote.url()), \
+                min(args.repeat, 5)))
+
+    runner.report(run, runner.previous_run(runner.load_runs(args.results), params))
+
+    if not args.no_save:
+        runner.save_run(args.results, run)
+
+    return 0 if startup_ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+The benchmarks: data processing, drawing and requests of each kind of page
+"""
+
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.api import BudgetClientAPI
+from app.cache import ResponseCache
+from app.methods import format_currency, deserialise
+from app.page_overview import PageOverview
+from app.page_list import PageIncome, PageFood, PageFunds
+from app.page_analysis import PageAnalysis
+
+def no_statusbar(items=None):
+    pass
+
+def list_cases(name, page):
+    """ benchmarks of a list page which keeps its rows in a store """
+    rows = page.api.req(['data', page.data_name])['data']['data']
+
+    def restore_rows():
+        # calculate_data takes the api rows from the data
+        page.data['data'] = rows
+
+    def unsorted():
+        page.viewport.invalidate()
+        page.sorting.update({'column': None, 'reverse': False, 'group': None})
+        page.show_rows()
+
+    def sort_reset():
+        page.sorting['order'].reset()
+        page.sorting.update({'column': 'cost', 'reverse': False, 'group': 'category'})
+
+    return [
+        ["{}.calculate_data".format(name), restore_rows, page.calculate_data],
+        ["{}.draw_list".format(name), unsorted, page.draw_list],
+        ["{}.show_rows[grouped]".format(name), sort_reset, page.show_rows]
+    ]
+
+def build_cases(win, data):
+    api = BudgetClientAPI()
+
+    overview = PageOverview(win, api, no_statusbar)
+    income = PageIncome(win, api, no_statusbar)
+    food = PageFood(win, api, no_statusbar)
+    funds = PageFunds(win, api, no_statusbar)
+    analysis = PageAnalysis(win, api, no_statusbar)
+
+    for page in [overview, income, food, funds, analysis]:
+        page.switch_to()
+
+    def reset_portfolio():
+        funds.portfolio = None
+
+    def reset_history():
+        # the fund values and total are worked out again on the next draw
+        funds.portfolio.cache = {}
+
+    costs = food.list['list'].costs.tolist()
+    dates = [food.list['list'][j]['date'] for j in range(min(len(food.list['list']), 5000))]
+
+    def format_costs():
+        for cost in costs:
+            format_currency(cost, 10)
+
+    def deserialise_dates():
+        for ymd in dates:
+            deserialise(ymd, 'date', 9)
+
+    def empty_cache():
+        api.cache = ResponseCache(tempfile.mkdtemp(prefix='budget-bench-'))
+
+    def request_food():
+        api.req(['data', 'food'])
+
+    def request_food_together():
+        # e.g. pages refreshed at the same time, which each need the same table
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: request_food(), range(4)))
+
+    def request_funds():
+        funds.fetch(funds.get_query())
+
+    def request_funds_whole():
+        api.req(['data', 'funds'], query=funds.get_query())
+
+    def edit_food():
+        # moves the newest row between two months, which the overview follows
+        row = food.list['list'][0]
+        food.edit_row(0, [[2019, 3 - row['date'][1] % 2, 1], row['item'], row['category'], \
+                row['cost'], row['shop']])
+
+    def evict(page):
+        def setup():
+            page.hide()
+            page.evict()
+
+        return setup
+
+    def reset_pivots():
+        analysis.table.cache = {}
+
+    def pivot(dimension, period):
+        return lambda: analysis.table.pivot(dimension, period)
+
+    cases = [
+        ["overview.calculate_data", None, overview.calculate_data],
+        ["overview.draw", None, overview.draw]
+    ]
+
+    cases += [case for case in list_cases('income', income) if 'grouped' not in case[0]]
+    cases += list_cases('food', food)
+    cases += [
+        ["food.edit_row", None, edit_food],
+        ["food.switch_to[evicted]", evict(food), food.switch_to]
+    ]
+
+    cases += [
+        ["funds.calculate_data", reset_portfolio, funds.calculate_data],
+        ["funds.draw_graph[all]", reset_history, lambda: funds.draw_graph(True)],
+        ["funds.draw_graph[cached]", None, lambda: funds.draw_graph(True)],
+        ["funds.switch_to[evicted]", evict(funds), funds.switch_to],
+        ["analysis.pivot[shop,week]", reset_pivots, pivot('shop', 'week')],
+        ["analysis.pivot[category,month]", reset_pivots, pivot('category', 'month')],
+        ["analysis.pivot[cached]", None, pivot('category', 'month')],
+        ["analysis.draw", None, analysis.draw],
+        ["methods.format_currency[{}]".format(len(costs)), None, format_costs],
+        ["methods.deserialise[date,{}]".format(len(dates)), None, deserialise_dates],
+        ["api.req[food,download]", empty_cache, request_food],
+        ["api.req[food,revalidate]", None, request_food],
+        ["api.req[food,download,4 at once]", empty_cache, request_food_together],
+        ["api.req[funds,download]", empty_cache, request_funds_whole],
+        ["funds.fetch[download]", empty_cache, request_funds],
+        ["funds.fetch[revalidate]", None, request_funds]
+    ]
+
+    return cases
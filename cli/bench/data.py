@@ -0,0 +1,123 @@
+"""
+Synthetic API responses, shaped like the ones the server sends
+"""
+
+import random
+from datetime import date, timedelta
+
+ITEMS = ["Bread", "Milk", "Eggs", "Coffee", "Apples", "Rice", "Pasta", "Cheese", \
+        "Train ticket", "Lunch", "Books", "Cinema", "Shoes", "Petrol", "Flowers"]
+CATEGORIES = ["Groceries", "Snacks", "Transport", "Eating out", "Clothes", "Home", \
+        "Leisure", "Gifts", "Health", "Fuel"]
+SHOPS = ["Tesco", "Sainsbury's", "Waitrose", "Aldi", "Lidl", "Co-op", "Boots", \
+        "Amazon", "Local shop", "Market"]
+
+# the category column of each list table
+CATEGORY_KEYS = {'food': 'k', 'general': 'k', 'holiday': 'h', 'social': 'y'}
+
+# the cost series of the overview
+OVERVIEW_KEYS = ['income', 'bills', 'food', 'general', 'holiday', 'social', 'balance', 'funds']
+
+class BenchData(object):
+    """ generates each table for a number of years up to a fixed date, from a seed """
+    def __init__(self, years=10, funds=20, rows_per_day=3, prices_per_day=4, seed=1):
+        self.years = years
+        self.num_funds = funds
+        self.rows_per_day = rows_per_day
+        self.prices_per_day = prices_per_day
+        self.seed = seed
+
+        self.end = date(2020, 1, 1)
+        self.days = 365 * years
+
+    def random(self, name):
+        return random.Random("{}-{}".format(self.seed, name))
+
+    def list_rows(self, table):
+        """ rows of a list table, newest first """
+        rand = self.random(table)
+
+        rows_per_day = self.rows_per_day if table in CATEGORY_KEYS else 1.0 / 30
+
+        num_rows = int(self.days * rows_per_day)
+
+        rows = []
+        for row_id in range(num_rows):
+            day = self.end - timedelta(days=int(row_id / rows_per_day))
+
+            row = {
+                'I': row_id + 1,
+                'd': [day.year, day.month, day.day],
+                'i': "{} {}".format(rand.choice(ITEMS), rand.randint(1, 50)),
+                'c': rand.randint(50, 20000)
+            }
+
+            if table in CATEGORY_KEYS:
+                row[CATEGORY_KEYS[table]] = rand.choice(CATEGORIES)
+                row['s'] = rand.choice(SHOPS)
+
+            rows.append(row)
+
+        return {'data': rows, 'total': sum(row['c'] for row in rows)}
+
+    def funds(self):
+        """ funds, with transactions and a price history from when each was bought """
+        rand = self.random('funds')
+
+        num_times = self.days * self.prices_per_day
+        start_time = 1262304000 # 2010-01-01
+
+        cache_times = [start_time + t * 86400 // self.prices_per_day for t in range(num_times)]
+
+        funds = []
+        for fund_id in range(self.num_funds):
+            start = rand.randint(0, num_times // 2)
+
+            price = rand.uniform(50, 500)
+            prices = []
+            for _ in range(num_times - start):
+                price *= 1 + rand.gauss(0.0001, 0.01)
+                prices.append(round(price, 2))
+
+            units = rand.uniform(10, 1000)
+
+            funds.append({
+                'I': fund_id + 1,
+                'd': [2010, 1, 1],
+                'i': "Fund {}".format(fund_id + 1),
+                'c': int(units * prices[0] * 100),
+                'tr': [{'d': [2010, 1, 1], 'u': units, 'c': int(units * prices[0] * 100)}],
+                'pr': prices,
+                'prStartIndex': start
+            })
+
+        return {'data': funds, 'cacheTimes': cache_times, 'total': 0}
+
+    def overview(self):
+        """ monthly cost series """
+        rand = self.random('overview')
+
+        num_months = 12 * self.years
+
+        start_year = self.end.year - self.years
+
+        return {
+            'startYearMonth': [start_year, 1],
+            'endYearMonth': [self.end.year - 1, 12],
+            'currentYear': self.end.year - 1,
+            'currentMonth': 6,
+            'cost': {
+                key: [rand.randint(10000, 500000) for _ in range(num_months)]
+                for key in OVERVIEW_KEYS
+            }
+        }
+
+    def table(self, name):
+        """ the data of the response to data/<name> """
+        if name == 'overview':
+            return self.overview()
+
+        if name == 'funds':
+            return self.funds()
+
+        return self.list_rows(name)
@@ -0,0 +1,48 @@
+"""
+Stand-ins for the parts of curses which need a terminal, so that pages can be drawn headless
+"""
+
+import curses
+
+class FakeWindow(object):
+    """ a window which counts the calls made to it instead of drawing anything """
+    def __init__(self, height, width):
+        self.dim = (height, width)
+        self.calls = 0
+
+    def getmaxyx(self):
+        return self.dim
+
+    def derwin(self, *args):
+        # derwin(y, x) or derwin(height, width, y, x); zero sizes mean the rest of the window
+        if len(args) == 2:
+            return FakeWindow(*self.dim)
+
+        return FakeWindow(args[0] or self.dim[0], args[1] or self.dim[1])
+
+    def getch(self):
+        return -1
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls += 1
+
+        return call
+
+def install(lines=50, cols=160):
+    """ replaces the curses functions used by the app """
+    curses.newwin = lambda height, width, pos_y=0, pos_x=0: FakeWindow(height, width)
+    curses.color_pair = lambda num: num << 8
+    curses.init_pair = lambda *args: None
+    curses.curs_set = lambda visibility: None
+    curses.doupdate = lambda: None
+
+    curses.LINES = lines
+    curses.COLS = cols
+
+    # these are only defined once the screen has been initialised
+    for name in ['ACS_VLINE', 'ACS_HLINE', 'ACS_ULCORNER', 'ACS_URCORNER', \
+            'ACS_LRCORNER', 'ACS_LLCORNER']:
+        setattr(curses, name, ord('+'))
+
+    return FakeWindow(lines - 3, cols)
@@ -0,0 +1,118 @@
+"""
+Times benchmarks, and keeps the results of each run so that versions can be compared
+"""
+
+import os
+import sys
+import json
+import subprocess
+from time import perf_counter
+from datetime import datetime
+
+# a benchmark this much slower than the last run counts as a regression
+REGRESSION_RATIO = 1.1
+
+def measure(func, setup=None, repeat=5):
+    """ times func (after calling setup, untimed) repeat times; returns the timings in s """
+    times = []
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+
+    times.sort()
+
+    return {
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'repeat': repeat
+    }
+
+def version():
+    """ the commit being benchmarked, if we're in a git checkout """
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], \
+                cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_runs(path):
+    try:
+        with open(path) as results:
+            return [json.loads(line) for line in results if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def save_run(path, run):
+    with open(path, 'a') as results:
+        results.write(json.dumps(run, sort_keys=True) + "\n")
+
+def previous_run(runs, params):
+    """ the last run with the same parameters (so that the timings are comparable) """
+    for run in reversed(runs):
+        if run['params'] == params:
+            return run
+
+    return None
+
+def format_value(value, unit='s'):
+    if unit == 'B':
+        return "{:8.0f}B ".format(value)
+
+    return format_time(value)
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return "{:8.1f}us".format(seconds * 1e6)
+
+    if seconds < 1:
+        return "{:8.2f}ms".format(seconds * 1e3)
+
+    return "{:8.3f}s ".format(seconds)
+
+def report(run, previous, out=sys.stdout):
+    """ prints the results of a run, compared with the previous one """
+    if previous is not None:
+        out.write("compared with {} ({})\n".format(previous['version'], previous['time']))
+
+    width = max([len(name) for name in run['results']] + [10])
+
+    for (name, result) in run['results'].items():
+        unit = result.get('unit', 's')
+
+        line = "{}  {}  (median {})".format(name.ljust(width), \
+                format_value(result['min'], unit), format_value(result['median'], unit).strip())
+
+        if previous is not None and name in previous['results']:
+            # the fastest run is the least affected by whatever else the machine is doing
+            ratio = result['min'] / previous['results'][name]['min']
+
+            line += "  {:+6.1f}%".format(100 * (ratio - 1))
+
+            if ratio > REGRESSION_RATIO:
+                line += "  slower" if unit == 's' else "  bigger"
+
+        out.write(line + "\n")
+
+def run_benchmarks(cases, params, repeat=10, only=None, label=None):
+    """ runs each (name, setup, func) case whose name contains only (if given) """
+    results = {}
+
+    for (name, setup, func) in cases:
+        if only is not None and only not in name:
+            continue
+
+        results[name] = measure(func, setup, repeat)
+
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'version': version(),
+        'label': label,
+        'python': sys.version.split()[0],
+        'params': params,
+        'results': results
+    }
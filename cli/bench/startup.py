@@ -0,0 +1,68 @@
+"""
+Times how long a fresh interpreter takes to get to the login form
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+# the app's imports and setup should take less than this (s), not counting python itself
+STARTUP_BUDGET = 0.1
+
+# these are slow to import, so they should only load once the login form is up
+DEFERRED_MODULES = ['numpy', 'requests', 'urllib3', 'app.page_list', 'app.page_overview', \
+        'app.page_analysis']
+
+PROMPT_SCRIPT = """
+import sys, json
+from time import perf_counter
+start = perf_counter()
+
+from bench import fake_curses
+scr = fake_curses.install()
+
+from app.main import BudgetClient
+client = BudgetClient()
+client.setup(scr)
+client.user.build_login_form()
+
+print(json.dumps({
+    'seconds': perf_counter() - start,
+    'loaded': [name for name in sys.argv[1:] if name in sys.modules]
+}))
+"""
+
+def time_to_prompt(env):
+    """ runs the app up to the login form in a new process """
+    output = subprocess.check_output([sys.executable, '-c', PROMPT_SCRIPT] + DEFERRED_MODULES, \
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env)
+
+    return json.loads(output.decode('utf-8'))
+
+def measure_startup(env, repeat=5):
+    runs = [time_to_prompt(env) for _ in range(repeat)]
+
+    times = sorted([run['seconds'] for run in runs])
+
+    return {
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'repeat': repeat,
+        'loaded': sorted(set(name for run in runs for name in run['loaded']))
+    }
+
+def check_startup(result, budget=STARTUP_BUDGET, out=sys.stdout):
+    """ reports whether startup is within the budget; returns False if it isn't """
+    ok = True
+
+    if result['min'] > budget:
+        out.write("startup took {:.1f}ms, over the budget of {:.1f}ms\n".format( \
+                result['min'] * 1e3, budget * 1e3))
+        ok = False
+
+    if len(result['loaded']) > 0:
+        out.write("loaded before the login form: {}\n".format(', '.join(result['loaded'])))
+        ok = False
+
+    return ok
@@ -0,0 +1,200 @@
+"""
+A local stand-in for the budget API, which serves synthetic data with ETags
+(as JSON, or MessagePack, and compressed if the client asks)
+"""
+
+import sys
+import json
+import time
+import gzip
+import hashlib
+from importlib import import_module
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse
+
+API_PREFIX = "/api/v3/"
+
+def installed(module):
+    try:
+        return import_module(module)
+    except ImportError:
+        return None
+
+def encode(data, content_type):
+    if content_type == 'application/msgpack':
+        return installed('msgpack').packb(data, use_bin_type=True)
+
+    return json.dumps(data).encode('utf-8')
+
+def compress(body, encoding):
+    if encoding == 'zstd':
+        return installed('zstandard').ZstdCompressor().compress(body)
+
+    if encoding == 'gzip':
+        return gzip.compress(body, 6)
+
+    return body
+
+def negotiate(accept, accept_encoding):
+    """ picks the content type and encoding of a response, from the request headers """
+    content_type = 'application/msgpack' \
+            if 'application/msgpack' in accept and installed('msgpack') else 'application/json'
+
+    encodings = [encoding.split(';')[0].strip() for encoding in accept_encoding.split(',')]
+
+    encoding = next((encoding for encoding in ['zstd', 'gzip'] if encoding in encodings \
+            and (encoding != 'zstd' or installed('zstandard'))), None)
+
+    return content_type, encoding
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, data, latency=0):
+        self.data = data
+
+        # round trip time to pretend the network has (s); new connections take two
+        # (for tcp and tls), and each response one
+        self.latency = latency
+
+        # requests with a different key are refused (those without one are let through,
+        # so that the benchmarks don't have to log in)
+        self.api_key = "bench"
+
+        # response bodies are encoded once, the first time they're requested
+        self.bodies = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        # bytes of response bodies sent
+        self.sent = 0
+
+        super().__init__(('127.0.0.1', 0), StubHandler)
+
+    def body(self, route, content_type='application/json', encoding=None):
+        """ returns the encoded response to a route, and its ETag """
+        key = (route, content_type, encoding)
+
+        with self.lock:
+            if key not in self.bodies:
+                task = route.split('/')
+
+                if len(task) != 2 or task[0] != 'data':
+                    return None, None
+
+                body = encode({'error': False, 'data': self.data.table(task[1])}, content_type)
+
+                # each representation has its own ETag
+                self.bodies[key] = compress(body, encoding), '"{}-{}-{}"'.format( \
+                        hashlib.sha1(body).hexdigest(), content_type.split('/')[1], encoding)
+
+            return self.bodies[key]
+
+    def handle_error(self, request, client_address):
+        # the app is often stopped halfway through a response
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def url(self):
+        return "http://{}:{}".format(*self.server_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+        return self
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        time.sleep(2 * self.server.latency)
+
+        super().setup()
+
+    def authorised(self):
+        return self.headers.get('Authorization') in [None, '', self.server.api_key]
+
+    def route(self):
+        path = urlparse(self.path).path
+
+        return path[len(API_PREFIX):] if path.startswith(API_PREFIX) else None
+
+    def send(self, status, body=b'', headers=None):
+        time.sleep(self.server.latency)
+
+        self.send_response(status)
+
+        for (key, value) in (headers or {}).items():
+            self.send_header(key, value)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+        self.server.sent += len(body)
+
+    def do_GET(self):
+        self.server.hits += 1
+
+        if not self.authorised():
+            self.send(401)
+            return
+
+        content_type, encoding = negotiate(self.headers.get('Accept', ''), \
+                self.headers.get('Accept-Encoding', ''))
+
+        body, etag = self.server.body(self.route(), content_type, encoding)
+
+        headers = {'ETag': etag, 'Vary': 'Accept, Accept-Encoding'}
+
+        if body is None:
+            self.send(404)
+        elif self.headers.get('If-None-Match') == etag:
+            self.send(304, headers=headers)
+        else:
+            headers['Content-Type'] = content_type
+
+            if encoding is not None:
+                headers['Content-Encoding'] = encoding
+
+            self.send(200, body, headers)
+
+    def do_POST(self):
+        self.server.hits += 1
+
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.route() != 'user/login':
+            self.send(404)
+            return
+
+        self.send(200, json.dumps({
+            'error': False,
+            'uid': 1,
+            'name': "bench",
+            'apiKey': self.server.api_key
+        }).encode('utf-8'), {'Content-Type': 'application/json'})
+
+    def do_HEAD(self):
+        self.send(200)
+
+    def do_PATCH(self):
+        self.server.hits += 1
+
+        form = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) \
+                .decode('utf-8'))
+
+        if not self.authorised():
+            self.send(401)
+            return
+
+        self.send(200, json.dumps({
+            'error': False,
+            'data': [{'error': False} for _ in form.get('list', [])]
+        }).encode('utf-8'), {'Content-Type': 'application/json'})
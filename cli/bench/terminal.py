@@ -0,0 +1,166 @@
+"""
+Runs the app in a pseudo terminal, to count the bytes it writes for each key press
+(which is what makes it slow over ssh), and to time how long it takes to show data
+"""
+
+import os
+import sys
+import time
+import select
+import signal
+import struct
+import termios
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from fcntl import ioctl
+
+# size of the terminal the app is run in
+TERMINAL_SIZE = (40, 120)
+
+# switch tabs, move around a list, sort and group it, and go back to the tabs
+KEYS = list('llll') + ['\t'] + list('jjjjjjjjjj') + list('ovkkk') + ['\t'] + list('hl')
+
+# output stops for this long once a key press has been drawn (s)
+QUIET = 0.3
+
+# round trip time of the server which the app is timed against (s)
+LATENCY = 0.05
+
+# written by the app once the overview (the first page) has its data
+FIRST_DATA = b"Balance"
+
+def read_until_quiet(master, quiet=QUIET, limit=20):
+    """ returns what the app writes until it stops writing for quiet seconds """
+    output = b''
+    end = time.time() + limit
+
+    while time.time() < end:
+        ready, _, _ = select.select([master], [], [], quiet)
+
+        if len(ready) == 0:
+            break
+
+        try:
+            chunk = os.read(master, 65536)
+        except OSError:
+            break
+
+        if len(chunk) == 0:
+            break
+
+        output += chunk
+
+    return output
+
+@contextmanager
+def run_app(env):
+    """ starts the app in a new pseudo terminal, yielding the terminal's master end """
+    master, slave = os.openpty()
+
+    ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', TERMINAL_SIZE[0], TERMINAL_SIZE[1], 0, 0))
+
+    app = subprocess.Popen([sys.executable, '.'], stdin=slave, stdout=slave, stderr=slave, \
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), \
+            env=dict(env, TERM='xterm-256color'), start_new_session=True)
+
+    os.close(slave)
+
+    try:
+        yield master
+    finally:
+        app.send_signal(signal.SIGTERM)
+        app.wait()
+        os.close(master)
+
+def read_until(master, text, limit=20):
+    """ waits for the app to write text, returning whether it did """
+    output = b''
+    end = time.time() + limit
+
+    while time.time() < end and text not in output:
+        ready, _, _ = select.select([master], [], [], end - time.time())
+
+        if len(ready) == 0:
+            break
+
+        try:
+            output += os.read(master, 65536)
+        except OSError:
+            break
+
+    return text in output
+
+def login_file():
+    """ somewhere new for the app to save its login to """
+    return os.path.join(tempfile.mkdtemp(prefix='budget-bench-'), 'login.json')
+
+def bytes_per_key(env, keys=KEYS, pin='1234'):
+    """ runs the app in a pseudo terminal, returning the bytes written after each key """
+    with run_app(dict(env, LOGIN_FILE=login_file())) as master:
+        read_until_quiet(master, 1)
+
+        # log in, and wait for every page to load
+        os.write(master, (pin + "\n").encode('utf-8'))
+        read_until_quiet(master, 2)
+
+        written = []
+        for key in keys:
+            os.write(master, key.encode('utf-8'))
+            written.append(len(read_until_quiet(master)))
+
+        return written
+
+def time_to_data(env, saved, pin='1234', typing=1.0):
+    """
+    returns how long the app takes to show the overview; from launch if the login was
+    saved, otherwise from the PIN being sent (after typing it for a while)
+    """
+    with run_app(env) as master:
+        start = time.time()
+
+        if not saved:
+            read_until(master, b"PIN")
+            time.sleep(typing)
+
+            start = time.time()
+            os.write(master, (pin + "\n").encode('utf-8'))
+
+        if not read_until(master, FIRST_DATA):
+            raise RuntimeError("the app didn't show any data")
+
+        return time.time() - start
+
+def measure_first_data(env, repeat=5):
+    """
+    times logging in and getting data with nothing cached, then starting again with
+    the login (and data) which that saved, against a server with some latency
+    """
+    results = {'pin': [], 'saved login': []}
+
+    for _ in range(repeat):
+        path = login_file()
+        run_env = dict(env, LOGIN_FILE=path, CACHE_DIR=os.path.dirname(path))
+
+        results['pin'].append(time_to_data(run_env, False))
+        results['saved login'].append(time_to_data(run_env, True))
+
+    return {
+        "startup.first_data[{}]".format(name): {
+            'min': min(times),
+            'median': sorted(times)[len(times) // 2],
+            'repeat': repeat
+        }
+        for (name, times) in results.items()
+    }
+
+def measure_terminal(env):
+    """ like runner.measure, but min holds the mean number of bytes (which is compared) """
+    written = bytes_per_key(env)
+
+    return {
+        'min': sum(written) / len(written),
+        'median': sorted(written)[len(written) // 2],
+        'repeat': len(written),
+        'unit': 'B'
+    }
@@ -0,0 +1,20 @@
+"""
+Tests of the client, which run against the stub server used by the benchmarks;
+run them from this directory with python -m unittest
+"""
+
+import os
+import tempfile
+
+from bench import fake_curses
+from bench.data import BenchData
+from bench.stub_server import StubServer
+
+# the app reads these when it's imported, so there's one server for all of the tests
+SERVER = StubServer(BenchData(years=1, funds=2)).start()
+
+os.environ['WEB_URL'] = SERVER.url()
+os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='budget-test-')
+os.environ['LOGIN_FILE'] = os.path.join(os.environ['CACHE_DIR'], 'login.json')
+
+WIN = fake_curses.install()
@@ -0,0 +1,57 @@
+"""
+Errors from requests made in the background
+"""
+
+import time
+import unittest
+
+from tests import SERVER
+
+from app.api import BudgetClientAPI
+from app.errors import BudgetClientAPIError
+
+def poll_until(api, results, limit=5):
+    end = time.time() + limit
+
+    while len(results) == 0 and time.time() < end:
+        api.poll()
+        time.sleep(0.01)
+
+class TestErrors(unittest.TestCase):
+    def setUp(self):
+        self.api = BudgetClientAPI()
+        self.api.set_token(SERVER.api_key, 'errors')
+
+    def test_bad_body(self):
+        with self.assertRaises(BudgetClientAPIError):
+            self.api.decode('data/food', b'{"data": ', 'application/json')
+
+        with self.assertRaises(BudgetClientAPIError):
+            self.api.decode('data/food', b'\xc1', 'application/msgpack')
+
+    def test_callback_error(self):
+        """ anything raised in the background is given to the callback """
+        results = []
+
+        def fail():
+            raise KeyError('cost')
+
+        self.api.run_async(fail, callback=lambda res, err: results.append((res, err)))
+
+        poll_until(self.api, results)
+
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0][0])
+        self.assertIsInstance(results[0][1], KeyError)
+
+    def test_request_error(self):
+        results = []
+
+        self.api.req_async(['missing'], callback=lambda res, err: results.append(err))
+
+        poll_until(self.api, results)
+
+        self.assertIsInstance(results[0], BudgetClientAPIError)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Sending edits, and journalling them while offline
+"""
+
+import time
+import unittest
+
+from tests import SERVER, WIN
+
+from app.api import BudgetClientAPI
+from app.page_list import PageFood
+
+class TestEditQueue(unittest.TestCase):
+    def setUp(self):
+        self.api = BudgetClientAPI()
+        self.api.set_token(SERVER.api_key, 'edits-{}'.format(self.id()))
+
+        self.rows = self.api.req(['data', 'food'])['data']['data']
+        self.rolled_back = []
+
+    def push(self, row, item):
+        self.api.edits.push('food', row['I'], {'id': row['I'], 'item': item}, \
+                lambda: self.rolled_back.append(row['I']), {'i': item})
+
+    def test_close_sends(self):
+        self.push(self.rows[0], 'Renamed')
+
+        hits = SERVER.hits
+        self.api.edits.close()
+
+        self.assertEqual(SERVER.hits - hits, 1)
+        self.assertEqual(self.api.edits.size(), 0)
+        self.assertEqual(self.api.mirror.row('food', self.rows[0]['I'])['i'], 'Renamed')
+        self.assertEqual(self.rolled_back, [])
+
+    def test_close_doesnt_replay(self):
+        """ edits journalled while offline are left for next time when quitting """
+        self.api.mirror.journal('food', self.rows[1]['I'], {'id': self.rows[1]['I']}, {'i': 'x'})
+
+        # a replay is due, while an edit is being sent
+        self.api.edits.last_replay = 0
+        self.push(self.rows[0], 'Renamed')
+
+        hits = SERVER.hits
+        start = time.time()
+
+        self.api.edits.close()
+
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(SERVER.hits - hits, 1)
+        self.assertEqual(len(self.api.mirror.journal_entries()), 1)
+
+    def test_replay_conflict(self):
+        """ an edit made offline gives way to the server's row if that changed since """
+        page = PageFood(WIN, self.api, lambda items=None: None)
+
+        # (it's shown from the mirror, so let it finish refreshing from the server first)
+        future, callback = self.api.completed.get(timeout=5)
+        callback(future.result(), None)
+
+        row = self.rows[0]
+        j = page.find_row(row['I'])
+
+        # the row was 'Old' when we went offline, and has been changed on the server since
+        self.api.mirror.apply_edit('food', row['I'], {'i': 'Old'})
+        self.api.mirror.journal('food', row['I'], {'id': row['I'], 'item': 'Offline'}, \
+                {'i': 'Offline'})
+
+        page.edit_row(j, ['Offline' if index == 'item' else page.list['list'][j][index] \
+                for (_, _, index, _) in page.cols['edit']])
+
+        self.api.edits.replay()
+
+        end = time.time() + 5
+        while self.api.edits.future is not None and time.time() < end:
+            self.api.poll()
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.api.edits.conflicts), 1)
+        self.assertEqual(self.api.mirror.journal_entries(), [])
+        self.assertEqual(self.api.mirror.row('food', row['I'])['i'], row['i'])
+        self.assertEqual(page.list['list'][page.find_row(row['I'])]['item'], row['i'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Content negotiation with the server: each encoding decodes to the same document
+"""
+
+import json
+import unittest
+
+from tests import SERVER
+
+from app.api import BudgetClientAPI
+from app.const import API_URL
+from app.encoding import Negotiator, installed
+
+ROUTE = 'data/food'
+
+class TestNegotiation(unittest.TestCase):
+    def setUp(self):
+        self.api = BudgetClientAPI()
+        self.api.set_token(SERVER.api_key, 'negotiation')
+
+        # the document as the server builds it, before it's encoded
+        self.expected = json.loads(json.dumps({'error': False, 'data': SERVER.data.table('food')}))
+
+    def use(self, negotiator):
+        self.api.negotiator = negotiator
+        self.api.session.headers.update(negotiator.headers())
+
+    def fetch(self, headers=None):
+        """ returns the content type and encoding the server picked, and the decoded body """
+        res = self.api.session.get("{}/{}".format(API_URL, ROUTE), headers=headers)
+
+        self.assertEqual(res.status_code, 200)
+
+        content_type = res.headers.get('Content-Type')
+
+        return content_type, res.headers.get('Content-Encoding'), \
+                self.api.decode(ROUTE, self.api.body(res), content_type)
+
+    def assert_negotiated(self, content_type, encoding):
+        self.assertEqual(self.fetch(), (content_type, encoding, self.expected))
+
+        # (and through the app's own requests, which revalidate what they've cached)
+        for _ in range(2):
+            self.assertEqual(self.api.req_remote(ROUTE.split('/'), 'get', {}, None), \
+                    self.expected)
+
+    @unittest.skipUnless(installed('msgpack') and installed('zstandard'), \
+            "needs msgpack and zstandard")
+    def test_msgpack_zstd(self):
+        self.use(Negotiator(['msgpack']))
+
+        self.assert_negotiated('application/msgpack', 'zstd')
+
+    @unittest.skipUnless(installed('msgpack'), "needs msgpack")
+    def test_msgpack_gzip(self):
+        negotiator = Negotiator(['msgpack'])
+        # (as if zstandard weren't installed)
+        negotiator.zstd = False
+
+        self.use(negotiator)
+
+        self.assert_negotiated('application/msgpack', 'gzip')
+
+    def test_json(self):
+        negotiator = Negotiator([])
+        negotiator.zstd = False
+
+        self.use(negotiator)
+
+        self.assert_negotiated('application/json', 'gzip')
+
+    def test_fallback(self):
+        """ the server sends plain JSON if it can't give us anything we asked for """
+        self.use(Negotiator(['msgpack']))
+
+        self.assertEqual(self.fetch({
+            'Accept': 'application/cbor, application/json;q=0.9',
+            'Accept-Encoding': 'br'
+        }), ('application/json', None, self.expected))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Exporting tables to files
+"""
+
+import os
+import csv
+import tempfile
+import unittest
+
+from tests import SERVER
+
+from app.api import BudgetClientAPI
+from app.export import Exporter, format_time
+
+def read_csv(path):
+    with open(path, newline='') as file:
+        return list(csv.reader(file))[1:]
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.api = BudgetClientAPI()
+        self.api.set_token(SERVER.api_key, 'export')
+
+        self.out = tempfile.mkdtemp(prefix='budget-export-')
+
+    def test_fund_prices(self):
+        """ the prices are written with the times they were cached at """
+        # (the stub sends the cache times after the funds, so the prices have to wait)
+        doc = self.api.req(['data', 'funds'], query={'history': 1})['data']
+
+        expected = [
+            [str(fund['I']), format_time(doc['cacheTimes'][fund['prStartIndex'] + index]), \
+                    str(price)]
+            for fund in doc['data']
+            for (index, price) in enumerate(fund['pr'])
+        ]
+
+        counts = Exporter(self.api, self.out, 'csv').export(['funds'])
+
+        self.assertEqual(counts['funds'], len(doc['data']))
+        self.assertEqual(counts['fund_prices'], len(expected))
+        self.assertEqual(read_csv(os.path.join(self.out, 'fund_prices.csv')), expected)
+
+if __name__ == '__main__':
+    unittest.main()
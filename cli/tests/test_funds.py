@@ -0,0 +1,61 @@
+"""
+The funds page, and its graph
+"""
+
+import unittest
+
+from tests import SERVER, WIN
+
+from app.api import BudgetClientAPI
+from app.const import KEY_GRAPH
+from app.page_list import PageFunds
+
+def no_statusbar(items=None):
+    pass
+
+class TestFunds(unittest.TestCase):
+    def load_page(self, token, user):
+        api = BudgetClientAPI()
+        api.set_token(token, user)
+
+        page = PageFunds(WIN, api, no_statusbar)
+        page.attach()
+
+        return page
+
+    def test_edit(self):
+        """ every field which can be edited shows on the page straight away """
+        page = self.load_page(SERVER.api_key, 'funds-edit')
+
+        values = [[2020, 2, 3], 'Renamed', 123]
+        self.assertEqual(len(page.cols['edit']), len(values))
+
+        page.edit_row(0, values)
+
+        row = page.list['list'][0]
+        self.assertEqual([row[index] for (_, _, index, _) in page.cols['edit']], values)
+
+    def test_graph(self):
+        page = self.load_page(SERVER.api_key, 'funds')
+
+        page.key_input(ord(KEY_GRAPH))
+        self.assertTrue(page.graph['active'])
+
+        page.key_input(ord(KEY_GRAPH))
+        self.assertFalse(page.graph['active'])
+
+    def test_graph_not_loaded(self):
+        """ there's nothing to graph if the funds couldn't be loaded """
+        page = self.load_page('refused', 'funds-not-loaded')
+
+        self.assertIsNone(page.portfolio)
+
+        page.key_input(ord(KEY_GRAPH))
+        self.assertFalse(page.graph['active'])
+
+        # (e.g. the page was evicted while the graph was open)
+        page.graph['active'] = True
+        page.show_graph(True)
+
+if __name__ == '__main__':
+    unittest.main()
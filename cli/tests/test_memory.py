@@ -0,0 +1,85 @@
+"""
+Evicting pages to snapshots, and bringing them back
+"""
+
+import unittest
+
+from tests import SERVER, WIN
+
+from app.api import BudgetClientAPI
+from app.memory import PageMemory
+from app.page_overview import PageOverview
+from app.page_list import PageFood, PageFunds
+from app.page_analysis import PageAnalysis
+
+def no_statusbar(items=None):
+    pass
+
+PAGES = {'overview': PageOverview, 'food': PageFood, 'funds': PageFunds, \
+        'analysis': PageAnalysis}
+
+class TestEviction(unittest.TestCase):
+    def load_pages(self, token, user):
+        api = BudgetClientAPI()
+        api.set_token(token, user)
+
+        return {name: page_class(WIN, api, no_statusbar) for (name, page_class) in PAGES.items()}
+
+    def test_evict_restore(self):
+        pages = self.load_pages(SERVER.api_key, 'evict')
+
+        rows = len(pages['food'].list['list'])
+        sums = pages['analysis'].result()['sums'].tolist()
+
+        memory = PageMemory(budget=0)
+
+        for name in ['food', 'funds', 'analysis', 'overview']:
+            memory.shown(name, pages)
+
+        for name in ['food', 'funds', 'analysis']:
+            self.assertIsNotNone(pages[name].snapshot, name)
+
+        for name in ['food', 'funds', 'analysis']:
+            pages[name].switch_to()
+            pages[name].hide()
+
+        self.assertEqual(len(pages['food'].list['list']), rows)
+        self.assertEqual(pages['analysis'].result()['sums'].tolist(), sums)
+
+    def test_evict_not_loaded(self):
+        # the server refuses the key, and there's nothing mirrored to fall back on
+        pages = self.load_pages('refused', 'not-loaded')
+
+        for page in pages.values():
+            self.assertIsNone(page.data)
+
+        memory = PageMemory(budget=0)
+
+        for name in ['food', 'funds', 'analysis', 'overview']:
+            memory.shown(name, pages)
+
+        for page in pages.values():
+            self.assertIsNone(page.snapshot)
+
+    def test_footprint_reused(self):
+        """ pages are only measured again when their data has changed """
+        pages = self.load_pages(SERVER.api_key, 'footprint')
+
+        memory = PageMemory()
+
+        memory.shown('food', pages)
+        measured = memory.footprints['food']
+
+        memory.shown('funds', pages)
+        memory.shown('food', pages)
+
+        self.assertIs(memory.footprints['food'], measured)
+
+        pages['food'].merge_delta({'data': [], 'deleted': [pages['food'].list['list'][0]['id']]})
+        memory.shown('food', pages)
+
+        self.assertIsNot(memory.footprints['food'], measured)
+        self.assertLess(memory.sizes['food'], measured[1])
+
+if __name__ == '__main__':
+    unittest.main()